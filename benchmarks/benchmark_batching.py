@@ -0,0 +1,61 @@
+# Copyright (c) stefan6419846. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+
+"""
+Compare analyzing a synthetic tree of many small files with and without grouping
+the files into batches.
+
+Usage: python benchmarks/benchmark_batching.py [FILE_COUNT [JOB_COUNT]]
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from license_tools import retrieval
+from license_tools.scanner import Scanner
+
+
+def create_tree(directory: Path, file_count: int) -> None:
+    for index in range(file_count):
+        package = directory / f"package{index // 100}"
+        package.mkdir(parents=True, exist_ok=True)
+        if index % 2:
+            package.joinpath(f"header{index}.h").write_text(f"#define VALUE_{index} {index}\n")
+        else:
+            package.joinpath(f"module{index}.py").write_text(f"from . import module{index - 2}\n")
+
+
+def measure(name: str, directory: Path, scanner: Scanner, maximum_count: int) -> float:
+    retrieval.BATCH_MAXIMUM_COUNT = maximum_count
+    start = time.perf_counter()
+    count = sum(1 for _ in retrieval.run_on_directory(str(directory), scanner=scanner))
+    duration = time.perf_counter() - start
+    print(f"{name:>10}: {duration:8.2f} s ({duration / count * 1000:.2f} ms per file)")
+    return duration
+
+
+def main() -> None:
+    file_count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    job_count = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    maximum_count = retrieval.BATCH_MAXIMUM_COUNT
+    with TemporaryDirectory() as tempdir, Scanner(job_count=job_count) as scanner:
+        # Use separate trees, as some ScanCode results are cached per path.
+        directories = {name: Path(tempdir) / name for name in ["warmup", "single", "batched"]}
+        create_tree(directories["warmup"], 50 * job_count)
+        create_tree(directories["single"], file_count)
+        create_tree(directories["batched"], file_count)
+        print(f"{file_count} files, {job_count} jobs")
+        # Start the workers and load the license index before measuring anything.
+        measure("warmup", directories["warmup"], scanner, maximum_count=1)
+        single = measure("single", directories["single"], scanner, maximum_count=1)
+        batched = measure("batched", directories["batched"], scanner, maximum_count=maximum_count)
+        print(f"{'speedup':>10}: {single / batched:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
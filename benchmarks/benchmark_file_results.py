@@ -0,0 +1,78 @@
+# Copyright (c) stefan6419846. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+
+"""
+Compare the combined single-pass detection of `FileResults` against calling the
+ScanCode API functions one after another.
+
+Usage: python benchmarks/benchmark_file_results.py [FILE_OR_DIRECTORY ...]
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+from pathlib import Path
+
+from scancode import api  # type: ignore[import-untyped]
+
+from license_tools.tools.scancode_tools import FileResults
+from license_tools.utils.path_utils import get_files_from_directory
+
+
+def get_paths(arguments: list[str]) -> list[Path]:
+    if not arguments:
+        arguments = [str(Path(__file__).parent.parent / "license_tools")]
+    paths = []
+    for argument in arguments:
+        path = Path(argument)
+        if path.is_dir():
+            paths.extend(file_path for file_path, _ in get_files_from_directory(path))
+        else:
+            paths.append(path)
+    return paths
+
+
+def run_sequential(paths: list[Path]) -> None:
+    for path in paths:
+        path_str = str(path)
+        api.get_copyrights(path_str)
+        api.get_emails(path_str)
+        api.get_urls(path_str)
+        api.get_licenses(path_str)
+        api.get_file_info(path_str)
+
+
+def run_combined(paths: list[Path]) -> None:
+    for path in paths:
+        FileResults(
+            path=path, short_path=path.name, retrieve_licenses=True, retrieve_copyrights=True,
+            retrieve_emails=True, retrieve_urls=True, retrieve_file_info=True,
+        )
+
+
+def measure(name: str, paths: list[Path], rounds: int = 5) -> float:
+    function = globals()[f"run_{name}"]
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        function(paths)
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+    print(f"{name:>10}: {best:.3f} s ({best / len(paths) * 1000:.2f} ms per file)")
+    return best
+
+
+def main() -> None:
+    paths = get_paths(sys.argv[1:])
+    print(f"{len(paths)} files")
+    # Load the license index before measuring anything.
+    run_sequential(paths[:1])
+    sequential = measure("sequential", paths)
+    combined = measure("combined", paths)
+    print(f"{'speedup':>10}: {sequential / combined:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
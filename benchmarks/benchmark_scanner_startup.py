@@ -0,0 +1,67 @@
+# Copyright (c) stefan6419846. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+
+"""
+Compare the startup time and memory usage of the `spawn` and `fork` start methods
+of the `Scanner` worker pool.
+
+Each mode runs in a separate interpreter, thus the license index is never loaded
+beforehand. The memory usage is read from `/proc`, thus this only works on Linux.
+The proportional set size (PSS) accounts for pages shared between the processes,
+while the resident set size (RSS) counts them once per process.
+
+Usage: python benchmarks/benchmark_scanner_startup.py [JOB_COUNT]
+"""
+
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+import time
+
+
+def get_memory(pid: int) -> tuple[int, int]:
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as fd:
+        for line in fd:
+            key, _, value = line.partition(":")
+            if key in {"Rss", "Pss"}:
+                values[key] = int(value.split()[0]) * 1024
+    return values["Rss"], values["Pss"]
+
+
+def wait_and_get_pid(delay: float) -> int:
+    # Keep each worker busy for a moment, thus every worker receives a task.
+    time.sleep(delay)
+    return os.getpid()
+
+
+def run_mode(start_method: str, job_count: int) -> None:
+    from license_tools.scanner import Scanner
+
+    start = time.perf_counter()
+    with Scanner(job_count=job_count, start_method=start_method) as scanner:  # type: ignore[arg-type]
+        pids = set(scanner.map(wait_and_get_pid, [dict(delay=0.5)] * job_count * 2))
+        duration = time.perf_counter() - start
+        memory = [get_memory(pid) for pid in [os.getpid(), *pids]]
+    rss = sum(value for value, _ in memory)
+    pss = sum(value for _, value in memory)
+    print(
+        f"{start_method:>6}: {duration:6.2f} s startup, {len(pids)} workers, "
+        f"{rss / 1024 ** 3:6.2f} GiB RSS, {pss / 1024 ** 3:6.2f} GiB PSS"
+    )
+
+
+def main() -> None:
+    if len(sys.argv) > 2:
+        run_mode(start_method=sys.argv[1], job_count=int(sys.argv[2]))
+        return
+    job_count = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    for start_method in ["spawn", "fork"]:
+        subprocess.run([sys.executable, __file__, start_method, str(job_count)], check=True)
+
+
+if __name__ == "__main__":
+    main()
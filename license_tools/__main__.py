@@ -21,6 +21,21 @@ def log_level_type(value: str | int) -> int:
     return cast(int, getattr(logging, value.upper()))
 
 
+def job_count_type(value: str) -> int | str:
+    """
+    Verify a job count, which is either a positive integer or `auto`.
+
+    :param value: The value to validate/convert.
+    :return: The corresponding integer value or `auto`.
+    """
+    if value == "auto":
+        return value
+    job_count = int(value)
+    if job_count < 1:
+        raise ValueError(value)
+    return job_count
+
+
 def configure_logging(level: int) -> None:
     """
     Configure the logging for the application.
@@ -55,6 +70,19 @@ def main() -> None:
     source_group.add_argument(
         "--url", action="store", type=str, help="Download URL to use."
     )
+    source_group.add_argument(
+        "--batch",
+        action="store",
+        type=str,
+        nargs="+",
+        help="Python package specifications, package archive files or package archive URLs to work on. Reports the results per package.",
+    )
+    source_group.add_argument(
+        "--requirements",
+        action="store",
+        type=str,
+        help="Requirements file with the Python packages to work on. Reports the results per package.",
+    )
 
     parser.add_argument(
         "--index-url",
@@ -71,14 +99,134 @@ def main() -> None:
         required=False,
         help="Prefer/download the sdist over wheels on PyPI.",
     )
+    parser.add_argument(
+        "--parallel-downloads",
+        action="store",
+        type=int,
+        required=False,
+        default=4,
+        help="Maximum number of packages to download at once for `--batch` and `--requirements`.",
+    )
 
     parser.add_argument(
         "--jobs",
         action="store",
-        type=int,
+        type=job_count_type,
         required=False,
         default=4,
-        help="Parallel jobs to use.",
+        help=(
+            "Parallel jobs to use. `auto` derives the number from the CPU quota and the memory limit of the cgroup "
+            "and the memory usage of a worker after loading the license index, measured with a single worker first. Defaults to 4."
+        ),
+    )
+    parser.add_argument(
+        "--adaptive-jobs",
+        action="store_true",
+        required=False,
+        default=False,
+        help=(
+            "Reduce the number of worker processes while the memory usage gets close to the limit "
+            "and increase it again up to `--jobs` if there is enough memory left. The workers are replaced "
+            "by a pool of the new size once the running tasks are done."
+        ),
+    )
+
+    parser.add_argument(
+        "--coordinator",
+        type=str,
+        required=False,
+        default=None,
+        help=(
+            "Distribute the analysis to the workers connecting to the given address, either `host:port` or the path of a Unix socket. "
+            "The workers share the key set in the LICENSE_TOOLS_AUTHKEY environment variable. "
+            "`--jobs` sets the number of tasks to keep scheduled."
+        ),
+    )
+    parser.add_argument(
+        "--worker",
+        type=str,
+        required=False,
+        default=None,
+        help=(
+            "Instead of analyzing a source, run `--jobs` worker processes for the coordinator at the given address, "
+            "either `host:port` or the path of a Unix socket."
+        ),
+    )
+    parser.add_argument(
+        "--serve",
+        type=str,
+        required=False,
+        default=None,
+        help=(
+            "Instead of analyzing a source, run a server at the given address, either `host:port` or the path of a Unix socket. "
+            "It keeps the license index and `--jobs` workers loaded and accepts analysis jobs via `POST /scan`, "
+            "streaming the results as JSON Lines."
+        ),
+    )
+
+    parser.add_argument(
+        "--cache-directory",
+        type=str,
+        required=False,
+        default=None,
+        help="Directory to cache the ScanCode results in for unchanged file contents. Disabled by default.",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        required=False,
+        default=512,
+        help="Maximum size of the result cache in MiB. Defaults to 512.",
+    )
+    parser.add_argument(
+        "--manifest",
+        type=str,
+        required=False,
+        default=None,
+        help="File to record the results per file in. Unchanged files are not analyzed again on the next run. Disabled by default.",
+    )
+    parser.add_argument(
+        "--journal",
+        type=str,
+        required=False,
+        default=None,
+        help="File to log the completed work in, allowing to resume an interrupted run. Disabled by default.",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        required=False,
+        default=False,
+        help="Continue the run logged in the journal instead of starting from scratch.",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        required=False,
+        default=False,
+        help="Display the results while the analysis is still running and do not keep them. Uses a fixed width for the file names.",
+    )
+    parser.add_argument(
+        "--summary-only",
+        action="store_true",
+        required=False,
+        default=False,
+        help="Only display the number of files per license. Reduces the memory usage for large inputs.",
+    )
+    parser.add_argument(
+        "--jsonl",
+        type=str,
+        required=False,
+        default=None,
+        help="File to write the results to as JSON Lines, one object per file. Disabled by default.",
+    )
+    parser.add_argument(
+        "--jsonl-compression",
+        type=str,
+        choices=["gzip", "zstd"],
+        required=False,
+        default=None,
+        help="Compression to use for the JSON Lines file. `zstd` requires the `zstandard` package. Disabled by default.",
     )
 
     parser.add_argument(
@@ -145,6 +293,92 @@ def main() -> None:
         help="Retrieve image metadata.",
     )
 
+    parser.add_argument(
+        "--scan-policy",
+        type=str,
+        required=False,
+        default=None,
+        help=(
+            "Decide per file whether to analyze it completely, only its header, only its metadata or to skip it. "
+            "Either `default` for the built-in rules or the path of a TOML file with the rules."
+        ),
+    )
+    parser.add_argument(
+        "--header-only",
+        action="store_true",
+        required=False,
+        default=False,
+        help=(
+            "Only analyze the header window of source files, where license headers usually are, instead of the complete files. "
+            "The results are marked as partial."
+        ),
+    )
+    parser.add_argument(
+        "--header-lines",
+        type=int,
+        required=False,
+        default=None,
+        help="Number of lines at the beginning of the file inside the header window.",
+    )
+    parser.add_argument(
+        "--header-size",
+        type=int,
+        required=False,
+        default=None,
+        help="Number of kibi-characters at the beginning of the file inside the header window.",
+    )
+    parser.add_argument(
+        "--footer-lines",
+        type=int,
+        required=False,
+        default=None,
+        help="Number of lines at the end of the file to add to the header window.",
+    )
+    parser.add_argument(
+        "--comments-only",
+        action="store_true",
+        required=False,
+        default=False,
+        help=(
+            "Only run the license matching on the comments and docstrings of source files in Python, C/C++, Rust, JavaScript, Java "
+            "and shell, ignoring license-like text inside the code. Copyrights, e-mails and URLs are retrieved from the whole text."
+        ),
+    )
+    parser.add_argument(
+        "--spdx-fast-path",
+        action="store_true",
+        required=False,
+        default=False,
+        help=(
+            "Build the license information from the SPDX-License-Identifier tags of the files instead of running the license matching. "
+            "Files without tags or with unknown identifiers are matched as usual."
+        ),
+    )
+    parser.add_argument(
+        "--verify-spdx-tags",
+        action="store_true",
+        required=False,
+        default=False,
+        help="Run the license matching for files with SPDX tags as well and warn about tags which disagree with it.",
+    )
+    parser.add_argument(
+        "--reuse-metadata",
+        action="store_true",
+        required=False,
+        default=False,
+        help=(
+            "Record the licenses and copyrights declared by REUSE.toml, .reuse/dep5 and machine-readable debian/copyright files "
+            "inside the analyzed directories for the files they cover."
+        ),
+    )
+    parser.add_argument(
+        "--trust-reuse-metadata",
+        action="store_true",
+        required=False,
+        default=False,
+        help="Use the licenses declared by the REUSE metadata for the covered files instead of analyzing them.",
+    )
+
     parser.add_argument(
         "--cargo-lock-download",
         action="store_true",
@@ -178,6 +412,22 @@ def main() -> None:
     arguments = parser.parse_args()
     configure_logging(level=arguments.log_level)
 
+    if arguments.resume and not arguments.journal:
+        parser.error("--resume requires --journal.")
+
+    if arguments.jobs == "auto":
+        from license_tools.scanner import measure_worker_memory
+        from license_tools.utils import resource_utils
+        arguments.jobs = resource_utils.get_auto_job_count(worker_memory=measure_worker_memory())
+
+    scanner = None
+    if arguments.adaptive_jobs:
+        if arguments.coordinator or arguments.worker or arguments.serve:
+            parser.error("Adaptive jobs are only supported for local analysis runs.")
+        from license_tools.scanner import Scanner
+        from license_tools.utils.resource_utils import MemoryController
+        scanner = Scanner(job_count=arguments.jobs, controller=MemoryController(maximum=arguments.jobs))
+
     if arguments.cargo_lock_download:
         from license_tools.tools import cargo_tools
         return cargo_tools.download_from_lock_file(
@@ -185,26 +435,121 @@ def main() -> None:
             target_directory=arguments.target_directory
         )
 
+    if arguments.worker:
+        from license_tools import distributed
+        return distributed.run_workers(
+            address=distributed.parse_address(arguments.worker),
+            authkey=distributed.get_authkey(),
+            job_count=arguments.jobs,
+        )
+
+    if arguments.serve:
+        from license_tools import distributed, server
+        return server.serve(
+            address=distributed.parse_address(arguments.serve),
+            job_count=arguments.jobs,
+            cache_directory=arguments.cache_directory,
+            cache_size=arguments.cache_size * 1024 * 1024,
+        )
+
+    policy = None
+    if (
+            arguments.scan_policy or arguments.header_only or arguments.comments_only or arguments.spdx_fast_path or arguments.verify_spdx_tags
+            or arguments.reuse_metadata or arguments.trust_reuse_metadata
+    ):
+        from license_tools.policy import load_policy, ScanPolicy
+        policy = load_policy(arguments.scan_policy) if arguments.scan_policy else ScanPolicy(rules=())
+        policy = policy.with_header_window(
+            line_count=arguments.header_lines,
+            size=arguments.header_size * 1024 if arguments.header_size is not None else None,
+            tail_line_count=arguments.footer_lines,
+        )
+        if arguments.header_only:
+            policy = policy.with_source_code_headers()
+        if arguments.comments_only:
+            policy = policy.with_comments_only()
+        if arguments.spdx_fast_path or arguments.verify_spdx_tags:
+            policy = policy.with_spdx_fast_path(verify=arguments.verify_spdx_tags)
+        if arguments.reuse_metadata or arguments.trust_reuse_metadata:
+            policy = policy.with_reuse_metadata(trust=arguments.trust_reuse_metadata)
+    elif arguments.header_lines is not None or arguments.header_size is not None or arguments.footer_lines is not None:
+        parser.error("The header window options require `--scan-policy` or `--header-only`.")
+
     from license_tools import retrieval
-    retrieval.run(
-        directory=arguments.directory,
-        file_path=arguments.file,
-        archive_path=arguments.archive,
-        package_definition=arguments.package,
-        download_url=arguments.url,
-        index_url=arguments.index_url,
-        prefer_sdist=arguments.prefer_sdist,
-        job_count=arguments.jobs,
-        retrieve_copyrights=arguments.retrieve_copyrights,
-        retrieve_emails=arguments.retrieve_emails,
-        retrieve_file_info=arguments.retrieve_file_info,
-        retrieve_urls=arguments.retrieve_urls,
-        retrieve_ldd_data=arguments.retrieve_ldd_data,
-        retrieve_font_data=arguments.retrieve_font_data,
-        retrieve_python_metadata=arguments.retrieve_python_metadata,
-        retrieve_cargo_metadata=arguments.retrieve_cargo_metadata,
-        retrieve_image_metadata=arguments.retrieve_image_metadata,
-    )
+    if arguments.batch or arguments.requirements:
+        if arguments.manifest or arguments.journal:
+            parser.error("The manifest and the journal are not supported for multiple packages.")
+        if arguments.coordinator:
+            parser.error("Distributing the analysis is not supported for multiple packages.")
+        try:
+            retrieval.run_batch(
+                sources=arguments.batch,
+                requirements_path=arguments.requirements,
+                index_url=arguments.index_url,
+                prefer_sdist=arguments.prefer_sdist,
+                job_count=arguments.jobs,
+                retrieve_copyrights=arguments.retrieve_copyrights,
+                retrieve_emails=arguments.retrieve_emails,
+                retrieve_file_info=arguments.retrieve_file_info,
+                retrieve_urls=arguments.retrieve_urls,
+                retrieve_ldd_data=arguments.retrieve_ldd_data,
+                retrieve_font_data=arguments.retrieve_font_data,
+                retrieve_python_metadata=arguments.retrieve_python_metadata,
+                retrieve_cargo_metadata=arguments.retrieve_cargo_metadata,
+                retrieve_image_metadata=arguments.retrieve_image_metadata,
+                cache_directory=arguments.cache_directory,
+                cache_size=arguments.cache_size * 1024 * 1024,
+                scanner=scanner,
+                policy=policy,
+                download_count=arguments.parallel_downloads,
+            )
+        finally:
+            if scanner is not None:
+                scanner.close()
+        return
+    if arguments.coordinator:
+        if arguments.cache_directory or arguments.manifest or arguments.journal:
+            parser.error("The cache, the manifest and the journal are not supported when distributing the analysis.")
+        from license_tools import distributed
+        scanner = distributed.DistributedScanner(
+            address=distributed.parse_address(arguments.coordinator),
+            authkey=distributed.get_authkey(),
+            job_count=arguments.jobs,
+        )
+    try:
+        retrieval.run(
+            directory=arguments.directory,
+            file_path=arguments.file,
+            archive_path=arguments.archive,
+            package_definition=arguments.package,
+            download_url=arguments.url,
+            index_url=arguments.index_url,
+            prefer_sdist=arguments.prefer_sdist,
+            job_count=arguments.jobs,
+            retrieve_copyrights=arguments.retrieve_copyrights,
+            retrieve_emails=arguments.retrieve_emails,
+            retrieve_file_info=arguments.retrieve_file_info,
+            retrieve_urls=arguments.retrieve_urls,
+            retrieve_ldd_data=arguments.retrieve_ldd_data,
+            retrieve_font_data=arguments.retrieve_font_data,
+            retrieve_python_metadata=arguments.retrieve_python_metadata,
+            retrieve_cargo_metadata=arguments.retrieve_cargo_metadata,
+            retrieve_image_metadata=arguments.retrieve_image_metadata,
+            cache_directory=arguments.cache_directory,
+            cache_size=arguments.cache_size * 1024 * 1024,
+            manifest_path=arguments.manifest,
+            journal_path=arguments.journal,
+            resume=arguments.resume,
+            streaming=arguments.stream,
+            summary_only=arguments.summary_only,
+            jsonl_path=arguments.jsonl,
+            jsonl_compression=arguments.jsonl_compression,
+            scanner=scanner,
+            policy=policy,
+        )
+    finally:
+        if scanner is not None:
+            scanner.close()
 
 
 if __name__ == "__main__":
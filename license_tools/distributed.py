@@ -0,0 +1,358 @@
+# Copyright (c) stefan6419846. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+
+"""
+Distribute the analysis to worker processes on other hosts.
+
+The coordinator walks the sources and extracts the archives itself, while the workers
+connect to it over TCP or a Unix socket, receive batches of files including their
+contents and send back the results. Both sides authenticate each other using a shared
+key. As the messages are pickled, only run workers and coordinators you trust.
+"""
+
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Executor, Future
+from dataclasses import dataclass, field
+from multiprocessing.connection import Client, Connection, Listener
+from typing import Any, Callable, TypeVar, Union
+
+from license_tools.scanner import initialize_worker, Scanner
+
+
+logger = logging.getLogger(__name__)
+del logging
+
+
+_T = TypeVar("_T")
+
+ADDRESS_TYPE = Union[str, tuple[str, int]]
+
+AUTHKEY_ENVIRONMENT_VARIABLE = "LICENSE_TOOLS_AUTHKEY"
+"""
+Environment variable to read the shared authentication key from.
+"""
+
+MAXIMUM_ATTEMPTS = 3
+"""
+Maximum number of workers to send a task to before giving up, in case the workers
+lose their connection while running it.
+"""
+
+
+def parse_address(value: str) -> ADDRESS_TYPE:
+    """
+    Convert the given address to the format used by the connections.
+
+    :param value: Either `host:port` for TCP or the path of a Unix socket.
+    :return: The host and port for TCP, otherwise the unchanged socket path.
+    """
+    host, separator, port = value.rpartition(":")
+    if separator and host and port.isdigit():
+        # Allow IPv6 addresses like `[::1]:8000`.
+        return host.strip("[]"), int(port)
+    return value
+
+
+def get_authkey(value: str | None = None) -> bytes:
+    """
+    Get the shared authentication key.
+
+    :param value: The key to use. Falls back to the `LICENSE_TOOLS_AUTHKEY` environment variable.
+    :return: The encoded key.
+    """
+    value = value or os.environ.get(AUTHKEY_ENVIRONMENT_VARIABLE)
+    if not value:
+        raise ValueError(f"No authentication key set. Use the {AUTHKEY_ENVIRONMENT_VARIABLE} environment variable.")
+    return value.encode("utf-8")
+
+
+@dataclass
+class _Task:
+    """
+    Single function call to run on a worker.
+    """
+
+    future: Future[Any]
+    function: Callable[..., Any]
+    args: tuple[Any, ...]
+    kwargs: dict[str, Any]
+    attempts: int = field(default=0)
+
+
+class Coordinator(Executor):
+    """
+    Executor sending the tasks to the connected workers.
+
+    Each worker runs one task at a time and receives the next one as soon as it sent
+    back the result, thus faster hosts get more work. Workers can connect and disconnect
+    at any time. Tasks of lost workers are sent to the remaining ones.
+    """
+
+    def __init__(self, address: ADDRESS_TYPE, authkey: bytes) -> None:
+        """
+        :param address: The address to listen on. Use port 0 to select a free port.
+        :param authkey: The key shared with the workers.
+        """
+        self._authkey = authkey
+        self._listener = Listener(address=address, authkey=authkey)
+        self._tasks: queue.SimpleQueue[_Task | None] = queue.SimpleQueue()
+        self._shutdown = False
+        self._lock = threading.Lock()
+        self._threads: list[threading.Thread] = []
+        self._accept_thread = threading.Thread(target=self._accept, name="license-tools-coordinator", daemon=True)
+        self._accept_thread.start()
+        logger.info("Waiting for workers on %s.", self.address)
+
+    @property
+    def address(self) -> ADDRESS_TYPE:
+        """
+        The address the coordinator is listening on.
+        """
+        return self._listener.address  # type: ignore[no-any-return]
+
+    @property
+    def worker_count(self) -> int:
+        """
+        The number of currently connected workers.
+        """
+        with self._lock:
+            return sum(thread.is_alive() for thread in self._threads)
+
+    def _accept(self) -> None:
+        """
+        Accept new worker connections until the coordinator is shut down.
+        """
+        while True:
+            try:
+                connection = self._listener.accept()
+            except (OSError, multiprocessing.AuthenticationError) as exception:
+                if self._shutdown:
+                    return
+                logger.warning("Rejected worker connection: %s", exception)
+                continue
+            with self._lock:
+                if self._shutdown:
+                    connection.close()
+                    return
+                thread = threading.Thread(target=self._serve, args=(connection,), name="license-tools-worker-connection", daemon=True)
+                self._threads.append(thread)
+                thread.start()
+
+    def _serve(self, connection: Connection) -> None:
+        """
+        Send the pending tasks to the given worker one after another.
+
+        :param connection: The connection to the worker.
+        """
+        with connection:
+            while True:
+                task = self._tasks.get()
+                if task is None:
+                    # Let the other connections stop as well.
+                    self._tasks.put(None)
+                    try:
+                        connection.send(None)
+                    except OSError:
+                        pass
+                    return
+                if task.attempts == 0 and not task.future.set_running_or_notify_cancel():
+                    continue
+                task.attempts += 1
+                try:
+                    connection.send((task.function, task.args, task.kwargs))
+                except OSError as exception:
+                    self._retry(task=task, exception=exception)
+                    return
+                except Exception as exception:
+                    # Pickling failed, thus nothing has been sent.
+                    task.future.set_exception(exception)
+                    continue
+                try:
+                    success, value = connection.recv()
+                except (EOFError, OSError) as exception:
+                    self._retry(task=task, exception=exception)
+                    return
+                except Exception as exception:
+                    task.future.set_exception(exception)
+                    continue
+                if success:
+                    task.future.set_result(value)
+                else:
+                    task.future.set_exception(value)
+
+    def _retry(self, task: _Task, exception: BaseException) -> None:
+        """
+        Handle a lost worker connection while running the given task.
+
+        :param task: The task which did not complete.
+        :param exception: The connection error.
+        """
+        if task.attempts >= MAXIMUM_ATTEMPTS:
+            task.future.set_exception(ConnectionError(f"Lost the worker connection {task.attempts} times: {exception}"))
+            return
+        logger.warning("Lost worker connection, sending the task to another worker: %s", exception)
+        self._tasks.put(task)
+
+    def submit(self, fn: Callable[..., _T], /, *args: Any, **kwargs: Any) -> Future[_T]:
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+            future: Future[_T] = Future()
+            self._tasks.put(_Task(future=future, function=fn, args=args, kwargs=kwargs))
+            return future
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        with self._lock:
+            if self._shutdown:
+                return
+            self._shutdown = True
+            threads = list(self._threads)
+        if cancel_futures:
+            while True:
+                try:
+                    task = self._tasks.get_nowait()
+                except queue.Empty:
+                    break
+                if task is not None:
+                    task.future.cancel()
+        # Queued after the pending tasks, thus the workers complete them beforehand.
+        self._tasks.put(None)
+        try:
+            # Wake up the thread waiting for new connections.
+            Client(address=self.address, authkey=self._authkey).close()
+        except OSError:
+            pass
+        self._accept_thread.join()
+        self._listener.close()
+        if wait:
+            for thread in threads:
+                thread.join()
+
+
+class DistributedScanner(Scanner):
+    """
+    Worker pool using the worker processes connecting to this host.
+
+    Start the workers using :func:`~run_workers`, for example with the `--worker` option
+    of the command line interface. Results caches, manifests and journals are not supported,
+    as the workers do not have access to the files of the coordinator.
+    """
+
+    remote = True
+
+    def __init__(self, address: ADDRESS_TYPE, authkey: bytes, job_count: int = 4) -> None:
+        """
+        :param address: The address to listen on for workers.
+        :param authkey: The key shared with the workers.
+        :param job_count: The number of tasks to keep scheduled. Should be about the
+                          number of worker processes.
+        """
+        super().__init__(job_count=job_count, preload_index=False)
+        self.address = address
+        self.authkey = authkey
+
+    def _create_executor(self) -> Executor:
+        return Coordinator(address=self.address, authkey=self.authkey)
+
+
+def _connect(address: ADDRESS_TYPE, authkey: bytes, timeout: float) -> Connection:
+    """
+    Connect to the coordinator, waiting for it to start if required.
+
+    :param address: The address of the coordinator.
+    :param authkey: The key shared with the coordinator.
+    :param timeout: The maximum number of seconds to wait for the coordinator.
+    :return: The established connection.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return Client(address=address, authkey=authkey)
+        except (ConnectionRefusedError, FileNotFoundError):
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(1)
+
+
+def run_worker(address: ADDRESS_TYPE, authkey: bytes, timeout: float = 60) -> int:
+    """
+    Run the tasks of the coordinator inside the current process until it shuts down.
+
+    :param address: The address of the coordinator.
+    :param authkey: The key shared with the coordinator.
+    :param timeout: The maximum number of seconds to wait for the coordinator to start.
+    :return: The number of completed tasks.
+    """
+    count = 0
+    with _connect(address=address, authkey=authkey, timeout=timeout) as connection:
+        while True:
+            try:
+                task = connection.recv()
+            except EOFError:
+                break
+            if task is None:
+                break
+            function, args, kwargs = task
+            try:
+                result = (True, function(*args, **kwargs))
+            except Exception as exception:
+                result = (False, exception)
+            try:
+                connection.send(result)
+            except (EOFError, OSError):
+                break
+            except Exception as exception:
+                # The result or the exception could not be pickled.
+                connection.send((False, RuntimeError(f"Could not send the result: {exception!r}")))
+            count += 1
+    logger.info("Completed %d tasks for %s.", count, address)
+    return count
+
+
+def _run_worker_process(address: ADDRESS_TYPE, authkey: bytes, preload_index: bool, timeout: float) -> None:
+    """
+    Entry point of the spawned worker processes.
+
+    :param address: The address of the coordinator.
+    :param authkey: The key shared with the coordinator.
+    :param preload_index: Whether to load the license index before connecting.
+    :param timeout: The maximum number of seconds to wait for the coordinator to start.
+    """
+    initialize_worker(preload_index=preload_index)
+    run_worker(address=address, authkey=authkey, timeout=timeout)
+
+
+def run_workers(
+    address: ADDRESS_TYPE, authkey: bytes, job_count: int = 4, preload_index: bool = True, timeout: float = 60
+) -> None:
+    """
+    Start the given number of worker processes for the coordinator and wait for them to finish.
+
+    :param address: The address of the coordinator.
+    :param authkey: The key shared with the coordinator.
+    :param job_count: The number of worker processes to start. With a job count of 1,
+                      the tasks run inside the current process.
+    :param preload_index: Whether to load the license index before connecting.
+    :param timeout: The maximum number of seconds to wait for the coordinator to start.
+    """
+    if job_count == 1:
+        initialize_worker(preload_index=preload_index, register_cleanup=False)
+        run_worker(address=address, authkey=authkey, timeout=timeout)
+        return
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=_run_worker_process, args=(address, authkey, preload_index, timeout), daemon=False)
+        for _ in range(job_count)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
@@ -0,0 +1,444 @@
+# Copyright (c) stefan6419846. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+
+"""
+Decide how to analyze each file, based upon its name, its type and its size.
+
+A policy consists of rules, of which the first matching one decides about the action:
+
+* `full`: Run all requested detectors on the whole file. The default if no rule matches.
+* `header`: Only run the detectors on the header window, where license headers usually are.
+* `metadata`: Only run the additional analyses like the image metadata, but no detectors.
+* `skip`: Do not analyze the file at all.
+
+Policies can be loaded from TOML files::
+
+    header_line_count = 50
+    header_size = 16384
+    footer_line_count = 10
+    comments_only = true
+    spdx_fast_path = true
+    reuse_metadata = true
+
+    [[rule]]
+    action = "skip"
+    reason = "Compiled Python bytecode"
+    suffixes = [".pyc"]
+
+    [[rule]]
+    action = "header"
+    reason = "Large data file"
+    suffixes = [".json", ".csv"]
+    minimum_size = 1048576
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import fnmatch
+import functools
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import Any, Literal
+
+import tomli
+
+from license_tools.tools.scancode_tools import TextWindow
+from license_tools.utils import file_type_utils
+
+
+POLICY_ACTION_TYPE = Literal["full", "header", "metadata", "skip"]
+
+POLICY_ACTIONS = ("full", "header", "metadata", "skip")
+
+DEFAULT_HEADER_LINE_COUNT = 50
+"""
+Number of lines at the beginning of the file to analyze for the `header` action.
+"""
+
+DEFAULT_HEADER_SIZE = 16 * 1024
+"""
+Number of characters at the beginning of the file to analyze for the `header` action.
+"""
+
+MINIFIED_SAMPLE_SIZE = 64 * 1024
+"""
+Number of bytes to read for detecting minified or generated files.
+"""
+
+MINIFIED_LINE_LENGTH = 500
+"""
+Minimum average line length of minified files.
+"""
+
+GENERATED_MARKERS = (b"@generated", b"do not edit", b"code generated by", b"automatically generated")
+"""
+Lowercase markers at the beginning of generated files.
+"""
+
+
+def is_minified_or_generated(path: Path) -> bool:
+    """
+    Check whether the given file looks minified or generated.
+
+    :param path: The file to check.
+    :return: True if the file name, a marker at the beginning or very long lines indicate
+             a minified or generated file, False otherwise.
+    """
+    name = path.name.lower()
+    if ".min." in name:
+        return True
+    try:
+        with open(path, mode="rb") as fd:
+            sample = fd.read(MINIFIED_SAMPLE_SIZE)
+    except OSError:
+        return False
+    if b"\0" in sample:
+        # Binary file.
+        return False
+    beginning = sample[:2048].lower()
+    if any(marker in beginning for marker in GENERATED_MARKERS):
+        return True
+    line_count = sample.count(b"\n") + 1
+    return len(sample) >= 4096 and len(sample) / line_count >= MINIFIED_LINE_LENGTH
+
+
+class _FileFacts:
+    """
+    Properties of a single file, which are determined on first use only.
+    """
+
+    def __init__(self, path: Path) -> None:
+        """
+        :param path: The file to describe.
+        """
+        self.path = path
+        self.name = path.name.lower()
+
+    @functools.cached_property
+    def size(self) -> int:
+        try:
+            return self.path.stat().st_size
+        except OSError:
+            return 0
+
+    @functools.cached_property
+    def mime_type(self) -> str:
+        return file_type_utils.get_file_type(self.path).mime_type
+
+    @functools.cached_property
+    def is_source(self) -> bool:
+        return file_type_utils.get_file_type(self.path).is_source
+
+    @functools.cached_property
+    def minified_or_generated(self) -> bool:
+        return is_minified_or_generated(self.path)
+
+
+@dataclass(frozen=True)
+class PolicyRule:
+    """
+    Single rule of a scan policy. All given conditions have to match.
+    """
+
+    action: POLICY_ACTION_TYPE
+    """
+    The action to use for matching files.
+    """
+
+    reason: str
+    """
+    Human-readable reason for the action, which is recorded on the results.
+    """
+
+    suffixes: tuple[str, ...] = ()
+    """
+    Case-insensitive file name endings, like `.pyc` or `.min.js`.
+    """
+
+    names: tuple[str, ...] = ()
+    """
+    Case-sensitive glob patterns for the file name, like `*.lock`.
+    """
+
+    mime_types: tuple[str, ...] = ()
+    """
+    Prefixes of the MIME type determined by libmagic, like `image/`.
+    """
+
+    minimum_size: int | None = None
+    """
+    The minimum file size in bytes.
+    """
+
+    minified_or_generated: bool | None = None
+    """
+    Whether the file has to look minified or generated, see :func:`~is_minified_or_generated`.
+    """
+
+    source_code: bool | None = None
+    """
+    Whether the file has to be recognized as source code.
+    """
+
+    def __post_init__(self) -> None:
+        if self.action not in POLICY_ACTIONS:
+            raise ValueError(f"Unsupported policy action: {self.action}")
+
+    def matches(self, facts: _FileFacts) -> bool:
+        """
+        Check whether the rule applies to the given file. The cheap conditions are checked first.
+
+        :param facts: The file to check.
+        :return: True if all conditions match, False otherwise.
+        """
+        if self.suffixes and not facts.name.endswith(tuple(suffix.lower() for suffix in self.suffixes)):
+            return False
+        if self.names and not any(fnmatch.fnmatchcase(facts.path.name, pattern) for pattern in self.names):
+            return False
+        if self.minimum_size is not None and facts.size < self.minimum_size:
+            return False
+        if self.mime_types and not facts.mime_type.startswith(self.mime_types):
+            return False
+        if self.source_code is not None and facts.is_source != self.source_code:
+            return False
+        if self.minified_or_generated is not None and facts.minified_or_generated != self.minified_or_generated:
+            return False
+        return True
+
+
+@dataclass(frozen=True)
+class PolicyDecision:
+    """
+    How to analyze a single file.
+    """
+
+    action: POLICY_ACTION_TYPE
+    """
+    The action to use.
+    """
+
+    reason: str | None = None
+    """
+    The reason of the matching rule, `None` if no rule matched.
+    """
+
+
+DEFAULT_RULES = (
+    PolicyRule(action="skip", reason="Compiled Python bytecode", suffixes=(".pyc", ".pyo")),
+    PolicyRule(
+        action="skip",
+        reason="Lock file",
+        names=(
+            "Cargo.lock", "composer.lock", "Gemfile.lock", "package-lock.json", "Pipfile.lock",
+            "pnpm-lock.yaml", "poetry.lock", "uv.lock", "yarn.lock",
+        ),
+    ),
+    # Vector graphics are text files, which might contain license comments.
+    PolicyRule(action="full", reason="Vector graphics", suffixes=(".svg",)),
+    PolicyRule(action="metadata", reason="Image", mime_types=("image/",)),
+    PolicyRule(
+        action="header",
+        reason="Minified or generated file",
+        suffixes=(".js", ".mjs", ".cjs", ".css", ".json", ".map"),
+        minified_or_generated=True,
+    ),
+    PolicyRule(
+        action="header",
+        reason="Large data file",
+        suffixes=(".csv", ".json", ".jsonl", ".ndjson", ".tsv", ".xml", ".yaml", ".yml"),
+        minimum_size=1024 * 1024,
+    ),
+)
+"""
+Rules of the default policy.
+"""
+
+SOURCE_CODE_HEADER_RULE = PolicyRule(action="header", reason="Source file", source_code=True)
+"""
+Rule to only analyze the header window of source files, see :meth:`ScanPolicy.with_source_code_headers`.
+"""
+
+DEFAULT_HEADER_WINDOW = TextWindow(line_count=DEFAULT_HEADER_LINE_COUNT, size=DEFAULT_HEADER_SIZE)
+"""
+Part of the file to analyze for the `header` action by default.
+"""
+
+
+@dataclass(frozen=True)
+class ScanPolicy:
+    """
+    Ordered set of rules to decide how to analyze each file.
+    """
+
+    rules: tuple[PolicyRule, ...] = DEFAULT_RULES
+    """
+    The rules, of which the first matching one applies.
+    """
+
+    header_window: TextWindow = DEFAULT_HEADER_WINDOW
+    """
+    The part of the file to analyze for the `header` action.
+    """
+
+    comments_only: bool = False
+    """
+    Whether to only run the license matching on the comments and docstrings of supported
+    source files for the `full` and `header` actions, see :mod:`license_tools.utils.comment_utils`.
+    The copyrights, e-mail addresses and URLs are still retrieved from the whole text.
+    """
+
+    spdx_fast_path: bool = False
+    """
+    Whether to build the license information from the `SPDX-License-Identifier` tags of
+    the files instead of running the license matching, see :meth:`~license_tools.tools.scancode_tools.Licenses.from_spdx_tags`.
+    Files without tags are matched as usual.
+    """
+
+    verify_spdx_tags: bool = False
+    """
+    Whether to run the license matching for files with SPDX tags as well, reporting the
+    matcher results and warning about tags which disagree with them.
+    """
+
+    reuse_metadata: bool = False
+    """
+    Whether to record the declarations of `REUSE.toml`, `.reuse/dep5` and machine-readable
+    `debian/copyright` files inside the analyzed directories for the files they cover,
+    see :mod:`license_tools.utils.reuse_utils`.
+    """
+
+    trust_reuse_metadata: bool = False
+    """
+    Whether to use the declared licenses for the covered files instead of analyzing them.
+    Declarations with the `override` precedence are always used this way, declarations
+    without a license never.
+    """
+
+    def decide(self, path: Path) -> PolicyDecision:
+        """
+        Decide how to analyze the given file.
+
+        :param path: The file to analyze.
+        :return: The action of the first matching rule, a full analysis if no rule matches.
+        """
+        facts = _FileFacts(path)
+        for rule in self.rules:
+            if rule.matches(facts):
+                return PolicyDecision(action=rule.action, reason=rule.reason)
+        return PolicyDecision(action="full")
+
+    def with_source_code_headers(self) -> ScanPolicy:
+        """
+        Only analyze the header window of the source files which are not covered by the
+        existing rules.
+
+        :return: The extended policy.
+        """
+        return dataclasses.replace(self, rules=self.rules + (SOURCE_CODE_HEADER_RULE,))
+
+    def with_comments_only(self) -> ScanPolicy:
+        """
+        Only run the license matching on the comments and docstrings of supported source files.
+
+        :return: The changed policy.
+        """
+        return dataclasses.replace(self, comments_only=True)
+
+    def with_spdx_fast_path(self, verify: bool = False) -> ScanPolicy:
+        """
+        Build the license information from the SPDX tags of the files, if there are any.
+
+        :param verify: Whether to run the license matching for tagged files as well.
+        :return: The changed policy.
+        """
+        return dataclasses.replace(self, spdx_fast_path=True, verify_spdx_tags=verify)
+
+    def with_reuse_metadata(self, trust: bool = False) -> ScanPolicy:
+        """
+        Record the declarations of the bulk license metadata for the files they cover.
+
+        :param trust: Whether to skip the analysis of the covered files.
+        :return: The changed policy.
+        """
+        return dataclasses.replace(self, reuse_metadata=True, trust_reuse_metadata=trust)
+
+    def with_header_window(
+        self, line_count: int | None = None, size: int | None = None, tail_line_count: int | None = None
+    ) -> ScanPolicy:
+        """
+        Change the part of the file to analyze for the `header` action.
+
+        :param line_count: The number of lines at the beginning of the file. Keeps the current value if unset.
+        :param size: The number of characters at the beginning of the file. Keeps the current value if unset.
+        :param tail_line_count: The number of lines at the end of the file. Keeps the current value if unset.
+        :return: The changed policy.
+        """
+        values = dict(line_count=line_count, size=size, tail_line_count=tail_line_count)
+        return dataclasses.replace(
+            self, header_window=dataclasses.replace(self.header_window, **{key: value for key, value in values.items() if value is not None}),
+        )
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> ScanPolicy:
+        """
+        Create a policy from the given mapping, for example parsed from a TOML file.
+
+        :param data: The list of `rule` mappings, the `header_line_count`, `header_size`
+                     and `footer_line_count` values for the header window and the
+                     `comments_only`, `spdx_fast_path`, `verify_spdx_tags`,
+                     `reuse_metadata` and `trust_reuse_metadata` flags.
+        :return: The corresponding policy.
+        """
+        unknown = set(data) - {
+            "rule", "header_line_count", "header_size", "footer_line_count", "comments_only", "spdx_fast_path", "verify_spdx_tags",
+            "reuse_metadata", "trust_reuse_metadata",
+        }
+        if unknown:
+            raise ValueError(f"Unknown policy keys: {', '.join(sorted(unknown))}")
+        rule_keys = {field.name for field in fields(PolicyRule)}
+        rules = []
+        for rule in data.get("rule", []):
+            unknown = set(rule) - rule_keys
+            if unknown:
+                raise ValueError(f"Unknown policy rule keys: {', '.join(sorted(unknown))}")
+            # TOML only knows lists.
+            values: dict[str, Any] = {key: tuple(value) if isinstance(value, list) else value for key, value in rule.items()}
+            rules.append(PolicyRule(**values))
+        header_window = TextWindow(
+            line_count=data.get("header_line_count", DEFAULT_HEADER_WINDOW.line_count),
+            size=data.get("header_size", DEFAULT_HEADER_WINDOW.size),
+            tail_line_count=data.get("footer_line_count", DEFAULT_HEADER_WINDOW.tail_line_count),
+        )
+        return cls(
+            rules=tuple(rules),
+            header_window=header_window,
+            comments_only=bool(data.get("comments_only", False)),
+            spdx_fast_path=bool(data.get("spdx_fast_path", False)),
+            verify_spdx_tags=bool(data.get("verify_spdx_tags", False)),
+            reuse_metadata=bool(data.get("reuse_metadata", False)),
+            trust_reuse_metadata=bool(data.get("trust_reuse_metadata", False)),
+        )
+
+    @classmethod
+    def from_file(cls, path: Path | str) -> ScanPolicy:
+        """
+        Load the policy from the given TOML file.
+
+        :param path: The file to load.
+        :return: The corresponding policy.
+        """
+        return cls.from_dict(tomli.loads(Path(path).read_text()))
+
+
+def load_policy(value: str) -> ScanPolicy:
+    """
+    Load the policy with the given name.
+
+    :param value: `default` for the default rules, otherwise the path of a TOML file.
+    :return: The corresponding policy.
+    """
+    if value == "default":
+        return ScanPolicy()
+    return ScanPolicy.from_file(value)
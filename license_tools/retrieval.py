@@ -8,23 +8,41 @@ Retrieve license-related data.
 
 from __future__ import annotations
 
+import asyncio
 import atexit
+import functools
+import heapq
+import logging
 import math
 import shutil
+import threading
+import time
 from collections import defaultdict
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from contextlib import closing, ExitStack
 from pathlib import Path
 from tempfile import NamedTemporaryFile, TemporaryDirectory
-from typing import BinaryIO, cast, Generator
+from typing import Any, BinaryIO, Callable, cast, Generator, Iterable
+from urllib.parse import urlparse
 
 import scancode_config  # type: ignore[import-untyped]
 from joblib import Parallel, delayed  # type: ignore[import-untyped]
 
+from license_tools.constants import VERSION
+from license_tools.policy import PolicyDecision, ScanPolicy
+from license_tools.scanner import Scanner
 from license_tools.tools import cargo_tools, font_tools, image_tools, linking_tools, pip_tools, scancode_tools
 from license_tools.tools.pip_tools import download_package
-from license_tools.tools.scancode_tools import FileResults, Licenses, PackageResults
-from license_tools.utils import archive_utils
+from license_tools.tools.scancode_tools import FileResults, Licenses, PackageResults, TextWindow
+from license_tools.utils import archive_utils, cache_utils, file_type_utils, jsonl_utils
+from license_tools.utils.cache_utils import Journal, Manifest, ResultCache
 from license_tools.utils.download_utils import download_file
 from license_tools.utils.path_utils import DirectoryWithFixedNameContext, get_files_from_directory
+from license_tools.utils.reuse_utils import LicenseDeclaration, LicenseMetadata
+
+
+logger = logging.getLogger(__name__)
+del logging
 
 
 class RetrievalFlags:
@@ -167,10 +185,118 @@ def _get_dummy_file_results(
     return results
 
 
+def _get_policy_file_results(path: Path, short_path: str, decision: PolicyDecision | None) -> FileResults:
+    """
+    Get empty results for a file which is excluded from the license analysis, recording
+    the decision of the scan policy.
+
+    :param path: The file path to analyze.
+    :param short_path: The short path to use for display.
+    :param decision: The decision of the scan policy, if any.
+    :return: Minimal results.
+    """
+    results = _get_dummy_file_results(path=path, short_path=short_path)
+    if decision is not None:
+        results.policy_action = decision.action
+        results.policy_reason = decision.reason
+    return results
+
+
+def _get_declared_file_results(path: Path, short_path: str, declaration: LicenseDeclaration) -> FileResults:
+    """
+    Get the results for a file covered by bulk license metadata without analyzing it.
+
+    :param path: The file path to analyze.
+    :param short_path: The short path to use for display.
+    :param declaration: The declaration of the metadata for the file.
+    :return: Minimal results with the declared license.
+    """
+    results = _get_dummy_file_results(path=path, short_path=short_path)
+    results.licenses = Licenses(
+        detected_license_expression=declaration.license_expression,
+        detected_license_expression_spdx=declaration.license_expression,
+    )
+    results.declaration = declaration
+    return results
+
+
+def _get_cache_key(
+        path: Path,
+        retrieval_flags: int,
+        text_window: TextWindow | None = None,
+        comments_only: bool = False,
+        spdx_fast_path: bool = False,
+        file_hash: str | None = None,
+) -> str:
+    """
+    Get the cache key for the ScanCode results of the given file.
+
+    :param path: The file path to analyze.
+    :param retrieval_flags: Values to retrieve.
+    :param text_window: The part of the file to analyze, `None` for the whole file.
+    :param comments_only: Whether to only analyze the comments and docstrings.
+    :param spdx_fast_path: Whether to use the SPDX tags instead of the license matching.
+    :param file_hash: The content hash of the file. Calculated if unset.
+    :return: The key, consisting of the content hash, the versions involved and the
+             flags which influence the ScanCode results.
+    """
+    relevant_flags = retrieval_flags & (RetrievalFlags.COPYRIGHTS | RetrievalFlags.EMAILS | RetrievalFlags.URLS)
+    key = f"{file_hash or cache_utils.get_file_hash(path)}-{scancode_config.__version__}-{VERSION}-{relevant_flags}"
+    if text_window is not None:
+        key += f"-window{text_window.line_count}-{text_window.size}-{text_window.tail_line_count}"
+    if comments_only:
+        key += "-comments"
+    if spdx_fast_path:
+        key += "-spdx"
+    return key
+
+
+def _get_cached_file_results(
+        path: Path,
+        short_path: str,
+        cached: dict[str, Any],
+        retrieval_kwargs: dict[str, bool],
+        text_window: TextWindow | None = None,
+        comments_only: bool = False,
+        spdx_fast_path: bool = False,
+        verify_spdx_tags: bool = False,
+) -> FileResults:
+    """
+    Get the file results from the cached values without running the license matching.
+    The file information is not cached, as it depends on the actual file.
+
+    :param path: The file path to analyze.
+    :param short_path: The short path to use for display.
+    :param cached: The cached values.
+    :param retrieval_kwargs: Values to retrieve.
+    :param text_window: The part of the file to analyze.
+    :param comments_only: Whether to only analyze the comments and docstrings.
+    :param spdx_fast_path: Whether to use the SPDX tags instead of the license matching.
+    :param verify_spdx_tags: Whether to run the license matching for tagged files as well.
+    :return: The requested results.
+    """
+    results = FileResults(path=path, short_path=short_path, retrieve_file_info=retrieval_kwargs["retrieve_file_info"])
+    results.text_window = text_window
+    results.comments_only = comments_only
+    results.spdx_fast_path = spdx_fast_path
+    results.verify_spdx_tags = verify_spdx_tags
+    results.retrieve_licenses = True
+    results.retrieve_copyrights = retrieval_kwargs["retrieve_copyrights"]
+    results.retrieve_emails = retrieval_kwargs["retrieve_emails"]
+    results.retrieve_urls = retrieval_kwargs["retrieve_urls"]
+    for key, value in cached.items():
+        setattr(results, key, value)
+    return results
+
+
 def run_on_file(
     path: Path,
     short_path: str,
     retrieval_flags: int = 0,
+    cache: ResultCache | None = None,
+    manifest: Manifest | None = None,
+    journal: Journal | None = None,
+    policy: ScanPolicy | None = None,
 ) -> FileResults:
     """
     Run the analysis on the given file.
@@ -178,9 +304,14 @@ def run_on_file(
     :param path: The file path to analyze.
     :param short_path: The short path to use for display.
     :param retrieval_flags: Values to retrieve.
+    :param cache: The cache to retrieve and store the ScanCode results with.
+    :param manifest: The manifest to retrieve and record the results per file with.
+    :param journal: The journal to log the completed work in and to resume from.
+    :param policy: The policy to decide how to analyze the file with. Analyzes the whole
+                   file if unset.
     :return: The requested results.
     """
-    if archive_utils.can_extract(archive_path=path):
+    if file_type_utils.get_file_type(path).is_archive:
         # Archive files which can be extracted further are not being analyzed on the
         # file level. This should improve the extraction speed and avoid possible
         # memory errors as this skips running string matching on possibly large
@@ -192,42 +323,606 @@ def run_on_file(
             _run_on_archive_file(path=path, short_path=short_path, default_to_none=False)
         )
 
+    decision = policy.decide(path) if policy is not None else None
+    if decision is not None and decision.action == "skip":
+        return _get_policy_file_results(path=path, short_path=short_path, decision=decision)
+
+    # Read the file for its content hash only once, when required for the first time.
+    get_hash = functools.cache(functools.partial(cache_utils.get_file_hash, path))
+
+    # Check the previous results before running any of the analyses below.
+    if journal is not None:
+        logged = journal.get(path=path, short_path=short_path, flags=retrieval_flags, file_hash=get_hash())
+        if logged is not None:
+            # The file might have been extracted to a different location on resume.
+            logged.path = path
+            return cast(FileResults, logged)
+
+    if manifest is not None:
+        recorded = manifest.get(path=path, short_path=short_path, flags=retrieval_flags, get_hash=get_hash)
+        if recorded is not None:
+            # The file might have been moved to a different location, for example when extracting archives.
+            recorded.path = path
+            if journal is not None:
+                journal.add(path=path, short_path=short_path, flags=retrieval_flags, value=recorded, file_hash=get_hash())
+            return cast(FileResults, recorded)
+
+    def record(file_results: FileResults) -> FileResults:
+        if manifest is not None:
+            manifest.set(path=path, short_path=short_path, flags=retrieval_flags, value=file_results, file_hash=get_hash())
+        if journal is not None:
+            journal.add(path=path, short_path=short_path, flags=retrieval_flags, value=file_results, file_hash=get_hash())
+        return file_results
+
     retrieval_kwargs = RetrievalFlags.to_kwargs(flags=retrieval_flags)
 
+    cargo_metadata = None
     if path.name.startswith("Cargo.toml") and retrieval_kwargs.pop("retrieve_cargo_metadata"):
-        print(short_path)
-        print(cargo_tools.check_metadata(path=path) + "\n")
+        cargo_metadata = cargo_tools.analyze_metadata(path=path)
 
-    # This data is not yet part of the dataclasses above, as it is a custom analysis.
     # Return early if we got a result here, as these binary files currently do not
     # provide any additional useful insights in most of the cases, but tend to be
     # larger binary blobs which just slow down the analysis.
     if retrieval_kwargs.pop("retrieve_ldd_data"):
-        results = linking_tools.check_shared_objects(path=path)
-        if results:
-            print(short_path + "\n" + results)
-            return _get_dummy_file_results(path=path, short_path=short_path)
+        linking_data = linking_tools.check_shared_objects(path=path)
+        if linking_data:
+            dummy_results = _get_policy_file_results(path=path, short_path=short_path, decision=decision)
+            dummy_results.linking_data = linking_data
+            return record(dummy_results)
     if retrieval_kwargs.pop("retrieve_font_data"):
-        results = font_tools.check_font(path=path)
-        if results:
-            print(short_path + "\n" + results + "\n")
-            return _get_dummy_file_results(path=path, short_path=short_path)
+        font_data = font_tools.analyze_font(path=path)
+        if font_data and font_data["name"]:
+            dummy_results = _get_policy_file_results(path=path, short_path=short_path, decision=decision)
+            dummy_results.font_data = font_data
+            return record(dummy_results)
     if retrieval_kwargs.pop("retrieve_image_metadata"):
-        results = image_tools.check_image_metadata(path=path)
-        if results:
-            print(short_path + "\n" + results)
-            return _get_dummy_file_results(path=path, short_path=short_path)
+        image_metadata = image_tools.check_image_metadata(path=path)
+        if image_metadata:
+            dummy_results = _get_policy_file_results(path=path, short_path=short_path, decision=decision)
+            dummy_results.image_metadata = image_metadata
+            return record(dummy_results)
 
-    # Register this here as each parallel process has its own directory.
-    atexit.register(scancode_tools.cleanup, scancode_config.scancode_temp_dir)
+    if decision is not None and decision.action == "metadata":
+        dummy_results = _get_policy_file_results(path=path, short_path=short_path, decision=decision)
+        dummy_results.cargo_metadata = cargo_metadata
+        return record(dummy_results)
 
-    return FileResults(
-        path=path, short_path=short_path, retrieve_licenses=True,
-        retrieve_copyrights=retrieval_kwargs["retrieve_copyrights"],
-        retrieve_emails=retrieval_kwargs["retrieve_emails"],
-        retrieve_urls=retrieval_kwargs["retrieve_urls"],
-        retrieve_file_info=retrieval_kwargs["retrieve_file_info"],
-    )
+    text_window = None
+    if decision is not None and decision.action == "header":
+        text_window = cast(ScanPolicy, policy).header_window
+    comments_only = policy is not None and policy.comments_only
+    spdx_fast_path = policy is not None and policy.spdx_fast_path
+    verify_spdx_tags = policy is not None and policy.verify_spdx_tags
+
+    file_results = None
+    cache_key = None
+    if cache is not None:
+        cache_key = _get_cache_key(
+            path=path, retrieval_flags=retrieval_flags, text_window=text_window, comments_only=comments_only,
+            # Verified results are the regular matcher results.
+            spdx_fast_path=spdx_fast_path and not verify_spdx_tags, file_hash=get_hash(),
+        )
+        cached = cache.get(cache_key)
+        if cached is not None:
+            file_results = _get_cached_file_results(
+                path=path, short_path=short_path, cached=cached, retrieval_kwargs=retrieval_kwargs,
+                text_window=text_window, comments_only=comments_only, spdx_fast_path=spdx_fast_path, verify_spdx_tags=verify_spdx_tags,
+            )
+
+    if file_results is None:
+        # Register this here as each parallel process has its own directory.
+        atexit.register(scancode_tools.cleanup, scancode_config.scancode_temp_dir)
+
+        start = time.perf_counter()
+        file_results = FileResults(
+            path=path, short_path=short_path, retrieve_licenses=True,
+            retrieve_copyrights=retrieval_kwargs["retrieve_copyrights"],
+            retrieve_emails=retrieval_kwargs["retrieve_emails"],
+            retrieve_urls=retrieval_kwargs["retrieve_urls"],
+            retrieve_file_info=retrieval_kwargs["retrieve_file_info"],
+            text_window=text_window,
+            comments_only=comments_only,
+            spdx_fast_path=spdx_fast_path,
+            verify_spdx_tags=verify_spdx_tags,
+        )
+        if cache is not None and cache_key is not None:
+            cache.set(
+                cache_key,
+                dict(
+                    licenses=file_results.licenses, copyrights=file_results.copyrights,
+                    emails=file_results.emails, urls=file_results.urls, partial=file_results.partial,
+                ),
+            )
+            cache.add_timing(suffix=path.suffix.lower(), size=path.stat().st_size, duration=time.perf_counter() - start)
+
+    if cargo_metadata is not None:
+        file_results.cargo_metadata = cargo_metadata
+    if decision is not None:
+        file_results.policy_action = decision.action
+        file_results.policy_reason = decision.reason
+    return record(file_results)
+
+
+BATCH_MAXIMUM_SIZE = 64 * 1024
+"""
+Maximum total file size in bytes of the files analyzed by a single task.
+Larger files are always analyzed on their own.
+"""
+
+BATCH_MAXIMUM_COUNT = 32
+"""
+Maximum number of files analyzed by a single task.
+"""
+
+
+def _run_on_file_batch(
+    files: list[tuple[int, Path, str]],
+    retrieval_flags: int = 0,
+    cache: ResultCache | None = None,
+    manifest: Manifest | None = None,
+    journal: Journal | None = None,
+    policy: ScanPolicy | None = None,
+) -> list[tuple[int, FileResults]]:
+    """
+    Run the analysis on the given files one after another.
+
+    :param files: The position inside the work items, the path and the short path of each file.
+    :param retrieval_flags: Values to retrieve.
+    :param cache: The cache to retrieve and store the ScanCode results with.
+    :param manifest: The manifest to retrieve and record the results per file with.
+    :param journal: The journal to log the completed work in and to resume from.
+    :param policy: The policy to decide how to analyze each file with.
+    :return: The position and the requested results for each file.
+    """
+    results = [
+        (
+            index,
+            run_on_file(
+                path=path, short_path=short_path, retrieval_flags=retrieval_flags, cache=cache, manifest=manifest, journal=journal, policy=policy,
+            )
+        )
+        for index, path, short_path in files
+    ]
+    if cache is not None:
+        # The cache instance of this task is discarded afterwards.
+        cache.flush()
+    return results
+
+
+def _run_on_file_contents_batch(
+    files: list[tuple[int, Path, str, bytes]], retrieval_flags: int = 0, policy: ScanPolicy | None = None
+) -> list[tuple[int, FileResults]]:
+    """
+    Run the analysis on the given file contents one after another, for workers which
+    cannot access the original files.
+
+    :param files: The position inside the work items, the original path, the short path
+                  and the content of each file.
+    :param retrieval_flags: Values to retrieve.
+    :param policy: The policy to decide how to analyze each file with.
+    :return: The position and the requested results for each file, reporting the original paths.
+    """
+    results = []
+    with TemporaryDirectory() as directory:
+        for index, path, short_path, content in files:
+            # Keep the file name, as some of the analysis steps depend on it.
+            local_path = Path(directory) / path.name
+            local_path.write_bytes(content)
+            file_results = run_on_file(path=local_path, short_path=short_path, retrieval_flags=retrieval_flags, policy=policy)
+            file_results.path = path
+            local_path.unlink()
+            results.append((index, file_results))
+    return results
+
+
+def _get_batches(
+    files: Iterable[tuple[Path, str] | None],
+    maximum_size: int = BATCH_MAXIMUM_SIZE,
+    maximum_count: int = BATCH_MAXIMUM_COUNT,
+) -> Generator[list[tuple[int, Path, str]], None, None]:
+    """
+    Group the given files into batches to reduce the overhead of scheduling many
+    small files separately.
+
+    The first batches contain a single file only, with the number of files doubling
+    for each batch, thus small directories are still distributed over all workers.
+
+    :param files: The paths and short paths of the files to group. `None` marks that
+                  the following files are not available immediately, thus the current
+                  batch should not wait for them.
+    :param maximum_size: The maximum total file size in bytes of a batch.
+    :param maximum_count: The maximum number of files of a batch.
+    :return: The position, the path and the short path of each file, grouped into batches.
+    """
+    batch: list[tuple[int, Path, str]] = []
+    batch_size = 0
+    count = 1
+    index = 0
+    for entry in files:
+        if entry is None:
+            if batch:
+                yield batch
+                batch = []
+                batch_size = 0
+            continue
+        path, short_path = entry
+        try:
+            size = path.stat().st_size
+        except OSError:
+            size = 0
+        if batch and (batch_size + size > maximum_size or len(batch) >= count):
+            yield batch
+            batch = []
+            batch_size = 0
+            count = min(2 * count, maximum_count)
+        batch.append((index, path, short_path))
+        batch_size += size
+        index += 1
+    if batch:
+        yield batch
+
+
+def _run_on_files(
+    files: Iterable[tuple[Path, str] | None],
+    job_count: int = 4,
+    retrieval_flags: int = 0,
+    cache: ResultCache | None = None,
+    manifest: Manifest | None = None,
+    journal: Journal | None = None,
+    scanner: Scanner | None = None,
+    ordered: bool = True,
+    policy: ScanPolicy | None = None,
+) -> Generator[tuple[int, FileResults], None, None]:
+    """
+    Run the analysis on the given files in parallel.
+
+    The files are consumed lazily, thus further files can be added while the analysis
+    of the first ones is still running. Small files are grouped into batches, which
+    are analyzed by a single task each.
+
+    :param files: The paths and short paths of the files to analyze. `None` marks that
+                  the following files are not available immediately.
+    :param job_count: The number of parallel jobs to use.
+    :param retrieval_flags: Values to retrieve.
+    :param cache: The cache to retrieve and store the ScanCode results with.
+    :param manifest: The manifest to retrieve and record the results per file with.
+    :param journal: The journal to log the completed work in and to resume from.
+    :param scanner: The worker pool to use. Replaces `job_count` if set. Remote workers
+                    receive the file contents and do not support `cache`, `manifest`
+                    and `journal`.
+    :param ordered: Yield the results in the order of the given files. Otherwise, each
+                    batch of results is yielded as soon as it is available.
+    :param policy: The policy to decide how to analyze each file with.
+    :return: The position of the file and the requested results per file, yielded
+             while the analysis is still running.
+    """
+    batches = _get_batches(files, maximum_size=BATCH_MAXIMUM_SIZE, maximum_count=BATCH_MAXIMUM_COUNT)
+    batch_results: Iterable[list[tuple[int, FileResults]]]
+    if scanner is not None and scanner.remote:
+        if cache is not None or manifest is not None or journal is not None:
+            raise ValueError("Remote workers do not support the cache, the manifest and the journal.")
+        # Read the contents lazily, thus only the scheduled batches are kept in memory.
+        batch_results = scanner.map(
+            _run_on_file_contents_batch,
+            (
+                dict(
+                    files=[(index, path, short_path, path.read_bytes()) for index, path, short_path in batch],
+                    retrieval_flags=retrieval_flags, policy=policy,
+                )
+                for batch in batches
+            ),
+            ordered=ordered,
+        )
+    elif scanner is not None:
+        batch_results = scanner.map(
+            _run_on_file_batch,
+            (
+                dict(files=batch, retrieval_flags=retrieval_flags, cache=cache, manifest=manifest, journal=journal, policy=policy)
+                for batch in batches
+            ),
+            ordered=ordered,
+        )
+    else:
+        batch_results = Parallel(
+            n_jobs=job_count, batch_size=1, return_as="generator" if ordered else "generator_unordered"
+        )(
+            delayed(_run_on_file_batch)(
+                files=batch, retrieval_flags=retrieval_flags, cache=cache, manifest=manifest, journal=journal, policy=policy
+            )
+            for batch in batches
+        )
+    with closing(cast(Generator[list[tuple[int, FileResults]], None, None], batch_results)):
+        for batch_result in batch_results:
+            yield from batch_result
+
+
+def _get_predicted_cost(path: Path, timings: dict[str, float]) -> float:
+    """
+    Estimate how long analyzing the given file will take.
+
+    :param path: The file path to analyze.
+    :param timings: The recorded duration in seconds per byte for each file suffix.
+    :return: The predicted cost. Only meaningful in relation to other files.
+    """
+    if file_type_utils.get_file_type(path).is_archive:
+        # Only the archive headers are analyzed.
+        return 0.0
+    try:
+        size = path.stat().st_size
+    except OSError:
+        return 0.0
+    default = sum(timings.values()) / len(timings) if timings else 1.0
+    return size * timings.get(path.suffix.lower(), default)
+
+
+class _ExtractedDirectory:
+    """
+    Directory of an extracted archive, which is removed as soon as all files inside it
+    have been analyzed.
+    """
+
+    def __init__(self, context: DirectoryWithFixedNameContext, parent: _ExtractedDirectory | None) -> None:
+        """
+        :param context: The context managing the directory.
+        :param parent: The extracted directory containing the archive, if any.
+        """
+        self.context = context
+        self.parent = parent
+        self.path = context.__enter__()
+        self.pending = 0
+        self.complete = False
+        self.closed = False
+
+
+class _WorkItems:
+    """
+    Collect the files of a directory and its nested archives for a single work queue.
+
+    Nested archives are extracted in the background, while the previous files are
+    being analyzed. Each extracted directory is kept until the results for all files
+    inside it have been retrieved.
+
+    The files of each directory are scheduled by their predicted cost, starting with
+    the most expensive ones, to avoid a single large file at the end delaying the
+    overall result. The position of each file in the output does not depend on this.
+
+    The bulk license metadata of each directory is read before scheduling its files.
+    Covered files which do not have to be analyzed are not added to the work queue, but
+    their results are provided by :meth:`~pop_declared` directly.
+    """
+
+    def __init__(
+        self,
+        extraction_executor: Executor,
+        timings: dict[str, float] | None = None,
+        journal: Journal | None = None,
+        reuse_metadata: bool = False,
+        trust_reuse_metadata: bool = False,
+    ) -> None:
+        """
+        :param extraction_executor: The executor to extract the nested archives with.
+        :param timings: The recorded duration in seconds per byte for each file suffix.
+        :param journal: The journal to log the extracted archives in and to reuse them from.
+        :param reuse_metadata: Whether to read the bulk license metadata of the directories.
+        :param trust_reuse_metadata: Whether to skip the analysis of all covered files.
+        """
+        self.extraction_executor = extraction_executor
+        self.timings = timings or {}
+        self.journal = journal
+        self.reuse_metadata = reuse_metadata
+        self.trust_reuse_metadata = trust_reuse_metadata
+        self._lock = threading.Lock()
+        self._owners: dict[int, _ExtractedDirectory | None] = {}
+        self._positions: dict[int, int] = {}
+        self._declarations: dict[int, LicenseDeclaration] = {}
+        self._declared: list[tuple[int, FileResults]] = []
+        self._count = 0
+        self._position_count = 0
+        self._directories: list[_ExtractedDirectory] = []
+
+    def iterate(
+        self,
+        directory: str,
+        prefix: str | None = None,
+        allow_random_directory_for_archive: bool = True,
+        delete_unpacked_archive_directories: bool = True,
+        owner: _ExtractedDirectory | None = None,
+    ) -> Generator[tuple[Path, str] | None, None, None]:
+        """
+        Get the files to analyze, including the ones of nested archives.
+
+        :param directory: The directory to analyze.
+        :param prefix: Custom prefix to use.
+        :param allow_random_directory_for_archive: Allow a random directory for unpacking archives.
+        :param delete_unpacked_archive_directories: Delete the directories of unpacked archives afterwards.
+        :param owner: The extracted directory which is being iterated over, if any.
+        :return: The path and short path for each file. `None` marks that the following
+                 files are not available immediately.
+        """
+        files = list(get_files_from_directory(directory, prefix))
+
+        # Directories of an interrupted run are only logged after the extraction has finished.
+        # They are located next to the archives, thus exclude them from the regular files.
+        reused: dict[Path, Path] = {}
+        archive_hashes: dict[Path, str] = {}
+        if self.journal is not None:
+            for path, short_path in files:
+                if file_type_utils.get_file_type(path).is_archive:
+                    archive_hashes[path] = cache_utils.get_file_hash(path)
+                    existing = self.journal.get_extraction(path=path, short_path=short_path, file_hash=archive_hashes[path])
+                    if existing is not None:
+                        reused[path] = existing
+            files = [(path, short_path) for path, short_path in files if not any(path.is_relative_to(value) for value in reused.values())]
+
+        extractions: list[tuple[_ExtractedDirectory, Path, str, Future[None] | None]] = []
+        for path, short_path in files:
+            if path in reused:
+                extracted = self._open(
+                    context=DirectoryWithFixedNameContext(
+                        directory=reused[path], reuse_existing=True, delete_afterwards=delete_unpacked_archive_directories,
+                    ),
+                    parent=owner,
+                )
+                extractions.append((extracted, path, short_path, None))
+            elif file_type_utils.get_file_type(path).is_archive:
+                name = path.name[:-len("".join(path.suffixes))]
+                subdirectory = path.parent / f'{name}_{"_".join(path.suffixes).replace(".", "")}'
+                extracted = self._open(
+                    context=DirectoryWithFixedNameContext(
+                        directory=subdirectory,
+                        fallback_to_random_if_exists=allow_random_directory_for_archive,
+                        delete_afterwards=delete_unpacked_archive_directories,
+                    ),
+                    parent=owner,
+                )
+                extraction: Future[None] | None = self.extraction_executor.submit(
+                    archive_utils.extract, archive_path=path, target_directory=extracted.path
+                )
+                extractions.append((extracted, path, short_path, extraction))
+
+        declarations: list[LicenseDeclaration | None] = [None] * len(files)
+        if self.reuse_metadata:
+            metadata = LicenseMetadata.from_files(files=files, directory=Path(directory))
+            if metadata:
+                declarations = [
+                    None if file_type_utils.get_file_type(path).is_archive else metadata.get(path)
+                    for path, _ in files
+                ]
+
+        costs = [_get_predicted_cost(path=path, timings=self.timings) for path, _ in files]
+        first_position = self._position_count
+        self._position_count += len(files)
+        for file_index in sorted(range(len(files)), key=costs.__getitem__, reverse=True):
+            declaration = declarations[file_index]
+            if (
+                    declaration is not None and declaration.license_expression is not None
+                    and (self.trust_reuse_metadata or declaration.precedence == "override")
+            ):
+                path, short_path = files[file_index]
+                with self._lock:
+                    self._declared.append(
+                        (
+                            first_position + file_index,
+                            _get_declared_file_results(path=path, short_path=short_path, declaration=declaration),
+                        )
+                    )
+                continue
+            self._add(owner=owner, position=first_position + file_index, declaration=declaration)
+            yield files[file_index]
+
+        for extracted, path, short_path, extraction in extractions:
+            if extraction is not None:
+                if not extraction.done():
+                    # Do not delay the previous files until the extraction has finished.
+                    yield None
+                extraction.result()
+                if self.journal is not None:
+                    self.journal.add_extraction(path=path, short_path=short_path, directory=extracted.path, file_hash=archive_hashes[path])
+            yield from self.iterate(directory=str(extracted.path), prefix=directory, owner=extracted)
+            with self._lock:
+                extracted.complete = True
+                self._close_finished(extracted)
+
+    def _open(self, context: DirectoryWithFixedNameContext, parent: _ExtractedDirectory | None) -> _ExtractedDirectory:
+        """
+        Create the directory for an archive to extract.
+
+        :param context: The context managing the directory.
+        :param parent: The extracted directory containing the archive, if any.
+        :return: The new extracted directory.
+        """
+        with self._lock:
+            extracted = _ExtractedDirectory(context=context, parent=parent)
+            self._directories.append(extracted)
+        return extracted
+
+    def _add(self, owner: _ExtractedDirectory | None, position: int, declaration: LicenseDeclaration | None = None) -> None:
+        """
+        Register the next work item.
+
+        :param owner: The extracted directory containing the file, if any.
+        :param position: The position of the file in the output.
+        :param declaration: The declaration of the bulk license metadata for the file, if any.
+        """
+        with self._lock:
+            self._owners[self._count] = owner
+            self._positions[self._count] = position
+            if declaration is not None:
+                self._declarations[self._count] = declaration
+            self._count += 1
+            while owner is not None:
+                owner.pending += 1
+                owner = owner.parent
+
+    def get_position(self, index: int) -> int:
+        """
+        Get the position of the given work item in the output.
+
+        :param index: The position of the work item in the work queue.
+        :return: The output position.
+        """
+        with self._lock:
+            return self._positions[index]
+
+    def get_declaration(self, index: int) -> LicenseDeclaration | None:
+        """
+        Get the declaration of the bulk license metadata for the given work item.
+
+        :param index: The position of the work item in the work queue.
+        :return: The declaration, `None` if no metadata covers the file.
+        """
+        with self._lock:
+            return self._declarations.get(index)
+
+    def pop_declared(self) -> list[tuple[int, FileResults]]:
+        """
+        Get the results of the covered files which have not been added to the work queue
+        since the last call.
+
+        :return: The output position and the results of each file.
+        """
+        with self._lock:
+            declared = self._declared
+            self._declared = []
+        return declared
+
+    def finish(self, index: int) -> None:
+        """
+        Mark the work item as done, removing the extracted directories which are not
+        required anymore.
+
+        :param index: The position of the work item in the work queue.
+        """
+        with self._lock:
+            owner = self._owners.pop(index)
+            del self._positions[index]
+            self._declarations.pop(index, None)
+            directory = owner
+            while directory is not None:
+                directory.pending -= 1
+                directory = directory.parent
+            self._close_finished(owner)
+
+    def _close_finished(self, directory: _ExtractedDirectory | None) -> None:
+        """
+        Close the given directory and its parents if all of their files have been analyzed.
+
+        :param directory: The directory to start with.
+        """
+        while directory is not None and directory.complete and not directory.pending and not directory.closed:
+            directory.closed = True
+            directory.context.__exit__(None, None, None)
+            directory = directory.parent
+
+    def close(self) -> None:
+        """
+        Close all remaining directories, for example after an error.
+        """
+        with self._lock:
+            for directory in reversed(self._directories):
+                if not directory.closed:
+                    directory.closed = True
+                    directory.context.__exit__(None, None, None)
 
 
 def run_on_directory(
@@ -237,51 +932,111 @@ def run_on_directory(
     prefix: str | None = None,
     allow_random_directory_for_archive: bool = True,
     delete_unpacked_archive_directories: bool = True,
+    cache: ResultCache | None = None,
+    manifest: Manifest | None = None,
+    journal: Journal | None = None,
+    scanner: Scanner | None = None,
+    ordered: bool = True,
+    policy: ScanPolicy | None = None,
 ) -> Generator[FileResults, None, None]:
     """
     Run the analysis on the given directory.
 
+    All files, including the ones of nested archives, share the same work queue, thus
+    the workers stay busy until everything has been analyzed.
+
     :param directory: The directory to analyze.
     :param job_count: The number of parallel jobs to use.
     :param retrieval_flags: Values to retrieve.
     :param prefix: Custom prefix to use.
     :param allow_random_directory_for_archive: Allow a random directory for unpacking archives.
     :param delete_unpacked_archive_directories: Delete the directories of unpacked archives afterwards.
+    :param cache: The cache to retrieve and store the ScanCode results with.
+    :param manifest: The manifest to retrieve and record the results per file with.
+    :param journal: The journal to log the completed work in and to resume from.
+    :param scanner: The worker pool to use. Replaces `job_count` if set.
+    :param ordered: Yield the results in the order of the files, with the files of nested
+                    archives following the files of the enclosing directory. Otherwise,
+                    each result is yielded as soon as it is available.
+    :param policy: The policy to decide how to analyze each file with. Analyzes all files
+                   completely if unset. Enables the bulk license metadata like `REUSE.toml`
+                   files inside the directory if requested.
     :return: The requested results per file.
     """
-    files = list(get_files_from_directory(directory, prefix))
-    results = Parallel(n_jobs=job_count)(
-        delayed(run_on_file)(
-            path=path,
-            short_path=short_path,
-            retrieval_flags=retrieval_flags,
+    with ExitStack() as exit_stack:
+        extraction_executor = ThreadPoolExecutor(max_workers=1)
+        work_items = _WorkItems(
+            extraction_executor=extraction_executor, timings=cache.get_timings() if cache else None,
+            journal=journal,
+            reuse_metadata=policy is not None and policy.reuse_metadata,
+            trust_reuse_metadata=policy is not None and policy.trust_reuse_metadata,
         )
-        for path, short_path in files
-    )
-    yield from results
-
-    for path, _ in files:
-        if archive_utils.can_extract(path):
-            name = path.name[:-len("".join(path.suffixes))]
-            subdirectory = path.parent / f'{name}_{"_".join(path.suffixes).replace(".", "")}'
-            with DirectoryWithFixedNameContext(
-                    directory=subdirectory,
-                    fallback_to_random_if_exists=allow_random_directory_for_archive,
-                    delete_afterwards=delete_unpacked_archive_directories,
-            ) as target_directory:
-                archive_utils.extract(archive_path=path, target_directory=target_directory)
-                yield from run_on_directory(
-                    directory=str(target_directory),
+        exit_stack.callback(work_items.close)
+        # Registered afterwards, thus the extraction is stopped before deleting the directories.
+        exit_stack.callback(extraction_executor.shutdown, wait=True, cancel_futures=True)
+
+        results = exit_stack.enter_context(
+            closing(
+                _run_on_files(
+                    files=work_items.iterate(
+                        directory=directory,
+                        prefix=prefix,
+                        allow_random_directory_for_archive=allow_random_directory_for_archive,
+                        delete_unpacked_archive_directories=delete_unpacked_archive_directories,
+                    ),
                     job_count=job_count,
                     retrieval_flags=retrieval_flags,
-                    prefix=directory,
+                    cache=cache,
+                    manifest=manifest,
+                    journal=journal,
+                    scanner=scanner,
+                    ordered=False,
+                    policy=policy,
                 )
+            )
+        )
+
+        # The work items are not scheduled in the output order, thus buffer the results
+        # until all previous ones are available. The results of files which are not part
+        # of the work queue use a negative index.
+        pending: list[tuple[int, int, FileResults]] = []
+        next_position = 0
+        while True:
+            entry = next(results, None)
+            ready = [(position, -1, result) for position, result in work_items.pop_declared()]
+            if entry is not None:
+                index, result = entry
+                declaration = work_items.get_declaration(index)
+                if declaration is not None:
+                    result.declaration = declaration
+                ready.append((work_items.get_position(index), index, result))
+            for position, index, result in ready:
+                if not ordered:
+                    yield result
+                    if index >= 0:
+                        work_items.finish(index)
+                    continue
+                heapq.heappush(pending, (position, index, result))
+            while pending and pending[0][0] == next_position:
+                _, index, result = heapq.heappop(pending)
+                yield result
+                if index >= 0:
+                    work_items.finish(index)
+                next_position += 1
+            if entry is None:
+                break
 
 
 def run_on_package_archive_file(
     archive_path: Path,
     job_count: int = 4,
     retrieval_flags: int = 0,
+    cache: ResultCache | None = None,
+    manifest: Manifest | None = None,
+    journal: Journal | None = None,
+    scanner: Scanner | None = None,
+    ordered: bool = True,
+    policy: ScanPolicy | None = None,
 ) -> Generator[FileResults, None, None]:
     """
     Run the analysis on the given package archive file.
@@ -289,6 +1044,14 @@ def run_on_package_archive_file(
     :param archive_path: The package archive path to analyze.
     :param job_count: The number of parallel jobs to use.
     :param retrieval_flags: Values to retrieve.
+    :param cache: The cache to retrieve and store the ScanCode results with.
+    :param manifest: The manifest to retrieve and record the results per file with.
+    :param journal: The journal to log the completed work in and to resume from.
+    :param scanner: The worker pool to use. Replaces `job_count` if set.
+    :param ordered: Yield the results in the order of the files. Otherwise, each result
+                    is yielded as soon as it is available.
+    :param policy: The policy to decide how to analyze each file with. Analyzes all files
+                   completely if unset.
     :return: The requested results.
     """
     archive_results = _run_on_archive_file(path=archive_path, short_path=archive_path.name, default_to_none=True)
@@ -296,24 +1059,45 @@ def run_on_package_archive_file(
         yield archive_results
 
     with TemporaryDirectory() as working_directory:
-        if not archive_utils.can_extract(archive_path):
+        if not file_type_utils.get_file_type(archive_path).is_archive:
             raise ValueError(f'Unsupported archive format: {archive_path}')
         archive_utils.extract(archive_path=archive_path, target_directory=Path(working_directory))
 
+        python_metadata = None
+        metadata_directory = None
         if RetrievalFlags.is_set(flags=retrieval_flags, flag=RetrievalFlags.PYTHON_METADATA):
-            print(pip_tools.check_metadata(path=working_directory) + "\n")
+            python_metadata = pip_tools.check_metadata(path=working_directory)
+            metadata_directory = pip_tools.get_metadata_directory(path=working_directory)
 
-        yield from run_on_directory(
+        results = run_on_directory(
             directory=working_directory,
             job_count=job_count,
             retrieval_flags=retrieval_flags,
+            cache=cache,
+            manifest=manifest,
+            journal=journal,
+            scanner=scanner,
+            ordered=ordered,
+            policy=policy,
         )
+        with closing(results):
+            for result in results:
+                if metadata_directory is not None and result.path.parent == metadata_directory and result.path.name in pip_tools.METADATA_FILE_NAMES:
+                    # Display the package metadata together with the other results instead of printing it directly.
+                    result.python_metadata = python_metadata
+                yield result
 
 
 def run_on_downloaded_archive_file(
     download_url: str,
     job_count: int = 4,
     retrieval_flags: int = 0,
+    cache: ResultCache | None = None,
+    manifest: Manifest | None = None,
+    journal: Journal | None = None,
+    scanner: Scanner | None = None,
+    ordered: bool = True,
+    policy: ScanPolicy | None = None,
 ) -> Generator[FileResults, None, None]:
     """
     Run the analysis on the given archive file after downloading it.
@@ -321,6 +1105,14 @@ def run_on_downloaded_archive_file(
     :param download_url: The URL to download the archive from.
     :param job_count: The number of parallel jobs to use.
     :param retrieval_flags: Values to retrieve.
+    :param cache: The cache to retrieve and store the ScanCode results with.
+    :param manifest: The manifest to retrieve and record the results per file with.
+    :param journal: The journal to log the completed work in and to resume from.
+    :param scanner: The worker pool to use. Replaces `job_count` if set.
+    :param ordered: Yield the results in the order of the files. Otherwise, each result
+                    is yielded as soon as it is available.
+    :param policy: The policy to decide how to analyze each file with. Analyzes all files
+                   completely if unset.
     :return: The requested results.
     """
     # Retrieving the correct suffixes is a bit tricky here, so we use some guessing as well.
@@ -339,15 +1131,41 @@ def run_on_downloaded_archive_file(
             archive_path=Path(downloaded_file.name),
             job_count=job_count,
             retrieval_flags=retrieval_flags,
+            cache=cache,
+            manifest=manifest,
+            journal=journal,
+            scanner=scanner,
+            ordered=ordered,
+            policy=policy,
         )
 
 
+def _get_downloaded_file(download_directory: Path, package_definition: str) -> Path:
+    """
+    Get the package archive downloaded by pip.
+
+    :param download_directory: The directory the package has been downloaded to.
+    :param package_definition: The downloaded package definition.
+    :return: The path of the downloaded file.
+    """
+    paths = sorted(path for path in download_directory.iterdir() if path.is_file())
+    if len(paths) != 1:
+        raise ValueError(f"Expected one downloaded file for {package_definition}, got {len(paths)}.")
+    return paths[0]
+
+
 def run_on_downloaded_package_file(
     package_definition: str,
     index_url: str | None = None,
     job_count: int = 4,
     retrieval_flags: int = 0,
     prefer_sdist: bool = False,
+    cache: ResultCache | None = None,
+    manifest: Manifest | None = None,
+    journal: Journal | None = None,
+    scanner: Scanner | None = None,
+    ordered: bool = True,
+    policy: ScanPolicy | None = None,
 ) -> Generator[FileResults, None, None]:
     """
     Run the analysis for the given package definition.
@@ -357,6 +1175,14 @@ def run_on_downloaded_package_file(
     :param job_count: The number of parallel jobs to use.
     :param retrieval_flags: Values to retrieve.
     :param prefer_sdist: Download the source distribution instead of the wheel.
+    :param cache: The cache to retrieve and store the ScanCode results with.
+    :param manifest: The manifest to retrieve and record the results per file with.
+    :param journal: The journal to log the completed work in and to resume from.
+    :param scanner: The worker pool to use. Replaces `job_count` if set.
+    :param ordered: Yield the results in the order of the files. Otherwise, each result
+                    is yielded as soon as it is available.
+    :param policy: The policy to decide how to analyze each file with. Analyzes all files
+                   completely if unset.
     :return: The requested results.
     """
     with TemporaryDirectory() as download_directory:
@@ -366,11 +1192,17 @@ def run_on_downloaded_package_file(
             index_url=index_url,
             prefer_sdist=prefer_sdist,
         )
-        name = list(Path(download_directory).glob("*"))[0]
+        name = _get_downloaded_file(download_directory=Path(download_directory), package_definition=package_definition)
         yield from run_on_package_archive_file(
             archive_path=name.resolve(),
             job_count=job_count,
             retrieval_flags=retrieval_flags,
+            cache=cache,
+            manifest=manifest,
+            journal=journal,
+            scanner=scanner,
+            ordered=ordered,
+            policy=policy,
         )
 
 
@@ -382,6 +1214,236 @@ def _check_that_exactly_one_value_is_set(values: list[Path | str | None]) -> boo
     return len(filtered) == 1
 
 
+STREAMING_PATH_WIDTH = 60
+"""
+Minimum width of the path column when displaying the results while the analysis is still running.
+"""
+
+
+def _render_extra_data(result: FileResults) -> str | None:
+    """
+    Render the results of the additional analyses for the given file.
+
+    :param result: The file to render the results for.
+    :return: The rendered results, `None` if there are none.
+    """
+    rendered = []
+    if result.cargo_metadata:
+        rendered.append(cargo_tools.render_metadata(result.cargo_metadata) + "\n")
+    if result.linking_data:
+        rendered.append(result.linking_data)
+    if result.font_data:
+        names = font_tools.render_names(result.font_data)
+        if names:
+            rendered.append(names + "\n")
+    if result.image_metadata:
+        rendered.append(result.image_metadata)
+    if result.python_metadata:
+        rendered.append(result.python_metadata + "\n")
+    if not rendered:
+        return None
+    return result.short_path + "\n" + "\n".join(rendered)
+
+
+class _LicenseSummary:
+    """
+    Display the license of each file and count the files per license, without
+    keeping the results themselves.
+    """
+
+    def __init__(self, path_width: int, show_files: bool = True, show_extra_data: bool = True) -> None:
+        """
+        :param path_width: The minimum width of the path column.
+        :param show_files: Whether to display the license of each file.
+        :param show_extra_data: Whether to display the results of the additional analyses
+                                for each file before its license.
+        """
+        self.path_width = path_width
+        self.show_files = show_files
+        self.show_extra_data = show_extra_data and show_files
+        self.license_counts: dict[str | None, int] = defaultdict(int)
+
+    def add(self, result: FileResults) -> None:
+        """
+        Display and count the given result.
+
+        :param result: The result to add.
+        """
+        if self.show_extra_data:
+            extra_data = _render_extra_data(result)
+            if extra_data is not None:
+                print(extra_data)
+        if result.licenses is None:
+            return
+        licenses = result.licenses
+        if self.show_files:
+            scores = licenses.get_scores_of_detected_license_expression_spdx()
+            print(
+                f"{result.short_path:>{self.path_width}}",
+                f"{licenses.detected_license_expression_spdx:>70}"
+                if licenses.detected_license_expression_spdx
+                else " " * 70,
+                scores if scores else "",
+            )
+        self.license_counts[licenses.detected_license_expression_spdx] += 1
+
+    def print_summary(self) -> None:
+        """
+        Display the number of files per license.
+        """
+        if self.show_files:
+            print()
+            columns = shutil.get_terminal_size((80, 20)).columns
+            print("=" * columns)
+            print()
+        count_length = max(math.log10(count) for count in self.license_counts.values())
+        count_length = int(count_length) + 1
+        for identifier in sorted(self.license_counts, key=str):
+            print(
+                f"{identifier!s:>70}", f"{self.license_counts[identifier]:>{count_length + 1}d}"
+            )
+
+
+def _print_results(results: list[FileResults]) -> None:
+    """
+    Display the results of the additional analyses, the license of each file and the
+    number of files per license.
+
+    :param results: The results to display.
+    """
+    for result in results:
+        extra_data = _render_extra_data(result)
+        if extra_data is not None:
+            print(extra_data)
+
+    summary = _LicenseSummary(path_width=max(len(result.short_path) for result in results), show_extra_data=False)
+    for result in results:
+        summary.add(result)
+    summary.print_summary()
+
+
+def _log_cache_statistics(cache: ResultCache) -> None:
+    """
+    Log the usage statistics of the given cache.
+
+    :param cache: The cache to log the statistics for.
+    """
+    statistics = cache.get_statistics()
+    logger.info(
+        "Result cache: %d hits, %d misses, %d entries with %d bytes.",
+        statistics.hits, statistics.misses, statistics.entries, statistics.size,
+    )
+
+
+def run_on_source(
+    directory: Path | str | None = None,
+    file_path: Path | str | None = None,
+    archive_path: Path | str | None = None,
+    package_definition: str | None = None,
+    download_url: str | None = None,
+    index_url: str | None = None,
+    prefer_sdist: bool = False,
+    job_count: int = 4,
+    retrieval_flags: int = 0,
+    cache: ResultCache | None = None,
+    manifest: Manifest | None = None,
+    journal: Journal | None = None,
+    scanner: Scanner | None = None,
+    ordered: bool = True,
+    policy: ScanPolicy | None = None,
+) -> Generator[FileResults, None, None]:
+    """
+    Run the analysis for the given source without displaying the results.
+
+    The `directory`, `file_path`, `archive_path`, `package_definition` and `download_url` parameters are
+    mutually exclusive. See :func:`~run` for their meaning.
+
+    :param directory: The directory to run on.
+    :param file_path: The file to run on.
+    :param archive_path: The package archive to run on.
+    :param package_definition: The package definition to run for.
+    :param download_url: The package URL to download and run on.
+    :param index_url: The PyPI index URL to use. Uses the default one from the `.pypirc` file if unset.
+    :param prefer_sdist: For PyPI downloads, prefer/use the source distribution over/instead of the wheel.
+    :param job_count: The number of parallel jobs to use.
+    :param retrieval_flags: Values to retrieve.
+    :param cache: The cache to retrieve and store the ScanCode results with.
+    :param manifest: The manifest to retrieve and record the results per file with.
+    :param journal: The journal to log the completed work in and to resume from.
+    :param scanner: The worker pool to use. Replaces `job_count` if set.
+    :param ordered: Yield the results in the order of the files. Otherwise, each result
+                    is yielded as soon as it is available.
+    :param policy: The policy to decide how to analyze each file with. Analyzes all files
+                   completely if unset.
+    :return: The requested results, yielded while the analysis is still running.
+             Nothing is yielded if no source is set.
+    """
+    if package_definition:
+        yield from run_on_downloaded_package_file(
+            package_definition=package_definition,
+            index_url=index_url,
+            retrieval_flags=retrieval_flags,
+            job_count=job_count,
+            prefer_sdist=prefer_sdist,
+            cache=cache,
+            manifest=manifest,
+            journal=journal,
+            scanner=scanner,
+            ordered=ordered,
+            policy=policy,
+        )
+    elif directory:
+        yield from run_on_directory(
+            directory=str(directory),
+            retrieval_flags=retrieval_flags,
+            job_count=job_count,
+            cache=cache,
+            manifest=manifest,
+            journal=journal,
+            scanner=scanner,
+            ordered=ordered,
+            policy=policy,
+        )
+    elif archive_path:
+        yield from run_on_package_archive_file(
+            archive_path=Path(archive_path),
+            retrieval_flags=retrieval_flags,
+            job_count=job_count,
+            cache=cache,
+            manifest=manifest,
+            journal=journal,
+            scanner=scanner,
+            ordered=ordered,
+            policy=policy,
+        )
+    elif download_url:
+        yield from run_on_downloaded_archive_file(
+            download_url=download_url,
+            retrieval_flags=retrieval_flags,
+            job_count=job_count,
+            cache=cache,
+            manifest=manifest,
+            journal=journal,
+            scanner=scanner,
+            ordered=ordered,
+            policy=policy,
+        )
+    elif file_path:
+        yield from (
+            result
+            for _, result in _run_on_files(
+                files=[(Path(file_path), str(file_path))],
+                retrieval_flags=retrieval_flags,
+                job_count=1,
+                cache=cache,
+                manifest=manifest,
+                journal=journal,
+                scanner=scanner,
+                policy=policy,
+            )
+        )
+
+
 def run(
     directory: Path | str | None = None,
     file_path: Path | str | None = None,
@@ -400,6 +1462,17 @@ def run(
     retrieve_python_metadata: bool = False,
     retrieve_cargo_metadata: bool = False,
     retrieve_image_metadata: bool = False,
+    cache_directory: Path | str | None = None,
+    cache_size: int = cache_utils.DEFAULT_MAXIMUM_SIZE,
+    manifest_path: Path | str | None = None,
+    journal_path: Path | str | None = None,
+    resume: bool = False,
+    scanner: Scanner | None = None,
+    policy: ScanPolicy | None = None,
+    streaming: bool = False,
+    summary_only: bool = False,
+    jsonl_path: Path | str | None = None,
+    jsonl_compression: jsonl_utils.COMPRESSION_TYPE | None = None,
 ) -> list[FileResults]:
     """
     Run the analysis for the given input definition.
@@ -424,7 +1497,27 @@ def run(
     :param retrieve_python_metadata: Whether to retrieve Python package metadata.
     :param retrieve_cargo_metadata: Whether to retrieve Cargo metadata.
     :param retrieve_image_metadata: Whether to retrieve image metadata.
-    :return: The requested results.
+    :param cache_directory: The directory to cache the ScanCode results in. Disables caching if unset.
+    :param cache_size: The maximum size of the cache in bytes.
+    :param manifest_path: The file to record the results per file in. Files which did not change
+                          since the previous run with the same manifest are not analyzed again.
+                          Use a separate manifest for each source.
+    :param journal_path: The file to log the completed work in, allowing to resume the analysis
+                         if it has been interrupted.
+    :param resume: Whether to continue the analysis logged in the journal. Otherwise, the journal
+                   will be cleared beforehand.
+    :param scanner: The worker pool to use, for example to reuse it between multiple runs.
+                    Replaces `job_count` if set.
+    :param policy: The policy to decide how to analyze each file with. Analyzes all files
+                   completely if unset. The manifest and the journal do not distinguish
+                   between policies, thus use separate ones for each policy.
+    :param streaming: Display the results while the analysis is still running, using a fixed
+                      width for the path column, and drop them afterwards.
+    :param summary_only: Only display the number of files per license, without keeping any
+                         per-file results.
+    :param jsonl_path: The file to write each result to as JSON Lines, directly when it is available.
+    :param jsonl_compression: The compression to use for the JSON Lines file.
+    :return: The requested results. Empty for the `streaming` and `summary_only` modes.
     """
     # Remove the temporary directory of the main thread.
     atexit.register(scancode_tools.cleanup, scancode_config.scancode_temp_dir)
@@ -433,7 +1526,6 @@ def run(
         [directory, file_path, archive_path, package_definition, download_url]
     ), "Exactly one source is required."
 
-    license_counts: dict[str | None, int] = defaultdict(int)
     retrieval_flags = RetrievalFlags.to_int(
         retrieve_copyrights=retrieve_copyrights,
         retrieve_emails=retrieve_emails,
@@ -445,80 +1537,374 @@ def run(
         retrieve_cargo_metadata=retrieve_cargo_metadata,
         retrieve_image_metadata=retrieve_image_metadata,
     )
+    with ExitStack() as exit_stack:
+        # Close the databases and the output file if the analysis fails as well.
+        cache = ResultCache(directory=cache_directory, maximum_size=cache_size) if cache_directory else None
+        if cache is not None:
+            exit_stack.callback(cache.close)
+        manifest = Manifest(path=manifest_path) if manifest_path else None
+        if manifest is not None:
+            exit_stack.callback(manifest.close)
+            manifest.start()
+        journal = Journal(path=journal_path) if journal_path else None
+        if journal is not None:
+            exit_stack.callback(journal.close)
+            if not resume:
+                journal.clear()
 
-    # Run the analysis itself.
-    if package_definition:
-        results = list(
-            run_on_downloaded_package_file(
-                package_definition=package_definition,
-                index_url=index_url,
-                retrieval_flags=retrieval_flags,
-                job_count=job_count,
-                prefer_sdist=prefer_sdist,
-            )
-        )
-    elif directory:
-        results = list(
-            run_on_directory(
-                directory=str(directory),
-                retrieval_flags=retrieval_flags,
-                job_count=job_count,
-            )
+        # Run the analysis itself. The order of the files does not matter for the summary.
+        # Stop it before closing the databases if displaying the results fails.
+        results_generator = run_on_source(
+            directory=directory,
+            file_path=file_path,
+            archive_path=archive_path,
+            package_definition=package_definition,
+            download_url=download_url,
+            index_url=index_url,
+            prefer_sdist=prefer_sdist,
+            job_count=job_count,
+            retrieval_flags=retrieval_flags,
+            cache=cache,
+            manifest=manifest,
+            journal=journal,
+            scanner=scanner,
+            ordered=not summary_only,
+            policy=policy,
         )
-    elif archive_path:
-        results = list(
-            run_on_package_archive_file(
-                archive_path=Path(archive_path),
-                retrieval_flags=retrieval_flags,
-                job_count=job_count,
-            )
+        results_iterable: Iterable[FileResults] = exit_stack.enter_context(closing(results_generator))
+
+        if jsonl_path:
+            writer = jsonl_utils.JsonLinesWriter(path=jsonl_path, compression=jsonl_compression)
+            exit_stack.callback(writer.close)
+            results_iterable = writer.write_each(results_iterable)
+
+        if streaming or summary_only:
+            # Only keep the license counts, thus the memory usage does not grow with the number of files.
+            summary = _LicenseSummary(path_width=STREAMING_PATH_WIDTH, show_files=not summary_only)
+            for result in results_iterable:
+                summary.add(result)
+            summary.print_summary()
+            results = []
+        else:
+            results = list(results_iterable)
+            _print_results(results)
+
+        if cache is not None:
+            _log_cache_statistics(cache)
+
+        if manifest is not None:
+            # Only complete runs know which files do not exist anymore.
+            removed = manifest.remove_stale()
+            logger.info("Manifest: Removed %d entries of files which do not exist anymore.", removed)
+
+    return results
+
+
+class _BatchItem:
+    """
+    Single source of a batch run, passed through the stages of the pipeline.
+    """
+
+    def __init__(self, source: str) -> None:
+        """
+        :param source: The package definition or package archive path.
+        """
+        self.source = source
+        self.archive_path: Path | None = None
+        self.archive_results: FileResults | None = None
+        self.metadata: str | None = None
+        self.results: list[FileResults] = []
+        self.error: Exception | None = None
+        self._download_directory: TemporaryDirectory[str] | None = None
+        self._working_directory: TemporaryDirectory[str] | None = None
+
+    def download(self, index_url: str | None = None, prefer_sdist: bool = False) -> None:
+        """
+        Download the package if required. Sources starting with `http://` or `https://`
+        are downloaded directly, other sources which are no local files with pip.
+
+        :param index_url: The PyPI index URL to use. Uses the default one from the `.pypirc` file if unset.
+        :param prefer_sdist: Download the source distribution instead of the wheel.
+        """
+        if self.source.startswith(("http://", "https://")):
+            self._download_directory = TemporaryDirectory()
+            # Keep the filename, which is required to determine the archive format.
+            filename = Path(urlparse(self.source).path).name or "download"
+            archive_path = Path(self._download_directory.name, filename)
+            with open(archive_path, mode="wb") as file_object:
+                download_file(url=self.source, file_object=file_object)
+            self.archive_path = archive_path.resolve()
+            return
+        if Path(self.source).is_file():
+            self.archive_path = Path(self.source)
+            return
+        self._download_directory = TemporaryDirectory()
+        download_package(
+            package_definition=self.source,
+            download_directory=self._download_directory.name,
+            index_url=index_url,
+            prefer_sdist=prefer_sdist,
         )
-    elif download_url:
-        results = list(
-            run_on_downloaded_archive_file(
-                download_url=download_url,
+        self.archive_path = _get_downloaded_file(
+            download_directory=Path(self._download_directory.name), package_definition=self.source
+        ).resolve()
+
+    def extract(self, retrieval_flags: int = 0) -> None:
+        """
+        Extract the package archive, removing the downloaded archive afterwards.
+
+        :param retrieval_flags: Values to retrieve.
+        """
+        archive_path = cast(Path, self.archive_path)
+        self.archive_results = _run_on_archive_file(path=archive_path, short_path=archive_path.name, default_to_none=True)
+        if not file_type_utils.get_file_type(archive_path).is_archive:
+            raise ValueError(f'Unsupported archive format: {archive_path}')
+        self._working_directory = TemporaryDirectory()
+        archive_utils.extract(archive_path=archive_path, target_directory=Path(self._working_directory.name))
+        if self._download_directory is not None:
+            self._download_directory.cleanup()
+            self._download_directory = None
+
+        if RetrievalFlags.is_set(flags=retrieval_flags, flag=RetrievalFlags.PYTHON_METADATA):
+            self.metadata = pip_tools.check_metadata(path=self._working_directory.name)
+
+    def analyze(
+        self, retrieval_flags: int = 0, cache: ResultCache | None = None, scanner: Scanner | None = None, policy: ScanPolicy | None = None
+    ) -> None:
+        """
+        Run the analysis on the extracted files, removing them afterwards.
+
+        :param retrieval_flags: Values to retrieve.
+        :param cache: The cache to retrieve and store the ScanCode results with.
+        :param scanner: The worker pool to use.
+        :param policy: The policy to decide how to analyze each file with.
+        """
+        if self.archive_results is not None:
+            self.results.append(self.archive_results)
+        self.results.extend(
+            run_on_directory(
+                directory=cast(TemporaryDirectory[str], self._working_directory).name,
                 retrieval_flags=retrieval_flags,
-                job_count=job_count,
+                cache=cache,
+                scanner=scanner,
+                policy=policy,
             )
         )
-    elif file_path:
-        results = [
-            run_on_file(
-                path=Path(file_path),
-                short_path=str(file_path),
-                retrieval_flags=retrieval_flags,
-            )
-         ]
-    else:
-        return []
+        self.cleanup()
 
-    # Display the file-level results.
-    max_path_length = max(len(result.short_path) for result in results)
-    for result in results:
-        if result.licenses is None:
-            continue
-        licenses = result.licenses
-        scores = licenses.get_scores_of_detected_license_expression_spdx()
-        print(
-            f"{result.short_path:>{max_path_length}}",
-            f"{licenses.detected_license_expression_spdx:>70}"
-            if licenses.detected_license_expression_spdx
-            else " " * 70,
-            scores if scores else "",
-        )
-        license_counts[licenses.detected_license_expression_spdx] += 1
+    def cleanup(self) -> None:
+        """
+        Remove the temporary directories.
+        """
+        for directory in [self._download_directory, self._working_directory]:
+            if directory is not None:
+                directory.cleanup()
+        self._download_directory = self._working_directory = None
+
+
+async def _run_pipeline(
+    items: list[_BatchItem],
+    stages: list[Callable[[_BatchItem], None]],
+    finish: Callable[[_BatchItem], None],
+    queue_size: int = 1,
+    worker_counts: list[int] | None = None,
+) -> None:
+    """
+    Pass the given items through the given stages.
+
+    Each stage handles its items inside separate threads, thus downloading, extracting
+    and analyzing different items overlap. The bounded queues between the stages limit
+    how far each stage can run ahead of the next one. Stages with multiple workers handle
+    multiple items at once and pass them on as soon as they are done, but the items are
+    finished in their original order. Items failing in one stage skip the remaining stages.
 
-    # Display the license-level results.
+    :param items: The items to process.
+    :param stages: The blocking functions to call for each item, in order.
+    :param finish: The function to call for each item after the last stage inside the event loop.
+    :param queue_size: The maximum number of items waiting in front of each stage.
+    :param worker_counts: The maximum number of items each stage handles at once. Defaults to 1 for each stage.
+    """
+    if worker_counts is None:
+        worker_counts = [1] * len(stages)
+    assert len(worker_counts) == len(stages), "One worker count per stage is required."
+    queues: list[asyncio.Queue[tuple[int, _BatchItem] | None]] = [asyncio.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+
+    async def feed() -> None:
+        for entry in enumerate(items):
+            await queues[0].put(entry)
+        await queues[0].put(None)
+
+    async def run_stage(index: int) -> None:
+        semaphore = asyncio.Semaphore(worker_counts[index])
+        tasks: set[asyncio.Task[None]] = set()
+
+        async def handle(position: int, item: _BatchItem) -> None:
+            try:
+                if item.error is None:
+                    try:
+                        await asyncio.to_thread(stages[index], item)
+                    except Exception as exception:
+                        item.error = exception
+                await queues[index + 1].put((position, item))
+            finally:
+                semaphore.release()
+
+        while True:
+            # Only take the next item once a worker is available.
+            await semaphore.acquire()
+            entry = await queues[index].get()
+            if entry is None:
+                semaphore.release()
+                break
+            task = asyncio.create_task(handle(*entry))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+        await queues[index + 1].put(None)
+
+    async def consume() -> None:
+        # Buffer the items until all previous ones are available.
+        pending: list[tuple[int, _BatchItem]] = []
+        next_position = 0
+        while (entry := await queues[-1].get()) is not None:
+            heapq.heappush(pending, entry)
+            while pending and pending[0][0] == next_position:
+                finish(heapq.heappop(pending)[1])
+                next_position += 1
+
+    await asyncio.gather(feed(), *[run_stage(index) for index in range(len(stages))], consume())
+
+
+def _report_batch_item(item: _BatchItem, columns: int) -> None:
+    """
+    Display the results for the given batch item.
+
+    :param item: The finished item.
+    :param columns: The width of the separator lines.
+    """
+    print("#" * columns)
+    print(item.source)
+    print("#" * columns)
     print()
-    columns = shutil.get_terminal_size((80, 20)).columns
-    print("=" * columns)
+    if item.error is not None:
+        logger.error("Analyzing %s failed.", item.source, exc_info=item.error)
+        print()
+        return
+    if item.metadata is not None:
+        print(item.metadata + "\n")
+    _print_results(item.results)
     print()
-    count_length = max(math.log10(count) for count in license_counts.values())
-    count_length = int(count_length) + 1
-    for identifier in sorted(license_counts, key=str):
-        print(
-            f"{identifier!s:>70}", f"{license_counts[identifier]:>{count_length + 1}d}"
+
+
+def run_batch(
+    sources: list[str] | None = None,
+    requirements_path: Path | str | None = None,
+    index_url: str | None = None,
+    prefer_sdist: bool = False,
+    job_count: int = 4,
+    retrieve_copyrights: bool = False,
+    retrieve_emails: bool = False,
+    retrieve_file_info: bool = False,
+    retrieve_urls: bool = False,
+    retrieve_ldd_data: bool = False,
+    retrieve_font_data: bool = False,
+    retrieve_python_metadata: bool = False,
+    retrieve_cargo_metadata: bool = False,
+    retrieve_image_metadata: bool = False,
+    cache_directory: Path | str | None = None,
+    cache_size: int = cache_utils.DEFAULT_MAXIMUM_SIZE,
+    scanner: Scanner | None = None,
+    prefetch_count: int = 1,
+    policy: ScanPolicy | None = None,
+    download_count: int = 4,
+) -> dict[str, list[FileResults]]:
+    """
+    Run the analysis for multiple packages, reporting the results for each package separately.
+
+    All packages are analyzed with the same worker pool and cache, thus the license index
+    is only loaded once per worker. A failing package is logged and skipped.
+
+    The next packages are downloaded and extracted while the current one is being analyzed,
+    downloading multiple packages at once. The results are reported in the order of the sources.
+    This uses :mod:`asyncio` internally, thus this function cannot be called from a running
+    event loop.
+
+    :param sources: The package definitions, package archive paths or package archive URLs to run on.
+    :param requirements_path: The requirements file to read further package definitions from.
+    :param index_url: The PyPI index URL to use. Uses the default one from the `.pypirc` file if unset.
+    :param prefer_sdist: For PyPI downloads, prefer/use the source distribution over/instead of the wheel.
+    :param job_count: The number of parallel jobs to use.
+    :param retrieve_copyrights: Whether to retrieve copyright information.
+    :param retrieve_emails: Whether to retrieve e-mails.
+    :param retrieve_file_info: Whether to retrieve file-specific information.
+    :param retrieve_urls: Whether to retrieve URLs.
+    :param retrieve_ldd_data: Whether to retrieve linking data for shared objects.
+    :param retrieve_font_data: Whether to retrieve font data.
+    :param retrieve_python_metadata: Whether to retrieve Python package metadata.
+    :param retrieve_cargo_metadata: Whether to retrieve Cargo metadata.
+    :param retrieve_image_metadata: Whether to retrieve image metadata.
+    :param cache_directory: The directory to cache the ScanCode results in. Disables caching if unset.
+    :param cache_size: The maximum size of the cache in bytes.
+    :param scanner: The worker pool to use. Replaces `job_count` if set.
+    :param prefetch_count: The maximum number of packages waiting to be extracted and
+                           to be analyzed each.
+    :param policy: The policy to decide how to analyze each file with. Analyzes all files
+                   completely if unset.
+    :param download_count: The maximum number of packages to download at once.
+    :return: The requested results for each source which could be analyzed.
+    """
+    # Remove the temporary directory of the main thread.
+    atexit.register(scancode_tools.cleanup, scancode_config.scancode_temp_dir)
+
+    sources = list(sources or [])
+    if requirements_path:
+        sources += pip_tools.read_requirements_file(requirements_path)
+    # Each package is reported only once.
+    sources = list(dict.fromkeys(sources))
+    assert sources, "At least one source is required."
+
+    retrieval_flags = RetrievalFlags.to_int(
+        retrieve_copyrights=retrieve_copyrights,
+        retrieve_emails=retrieve_emails,
+        retrieve_file_info=retrieve_file_info,
+        retrieve_urls=retrieve_urls,
+        retrieve_ldd_data=retrieve_ldd_data,
+        retrieve_font_data=retrieve_font_data,
+        retrieve_python_metadata=retrieve_python_metadata,
+        retrieve_cargo_metadata=retrieve_cargo_metadata,
+        retrieve_image_metadata=retrieve_image_metadata,
+    )
+    cache = ResultCache(directory=cache_directory, maximum_size=cache_size) if cache_directory else None
+    columns = shutil.get_terminal_size((80, 20)).columns
+
+    items = [_BatchItem(source) for source in sources]
+    with ExitStack() as exit_stack:
+        if cache is not None:
+            exit_stack.callback(cache.close)
+        if scanner is None:
+            scanner = exit_stack.enter_context(Scanner(job_count=job_count))
+        for item in items:
+            exit_stack.callback(item.cleanup)
+        asyncio.run(
+            _run_pipeline(
+                items=items,
+                stages=[
+                    functools.partial(_BatchItem.download, index_url=index_url, prefer_sdist=prefer_sdist),
+                    functools.partial(_BatchItem.extract, retrieval_flags=retrieval_flags),
+                    functools.partial(_BatchItem.analyze, retrieval_flags=retrieval_flags, cache=cache, scanner=scanner, policy=policy),
+                ],
+                finish=functools.partial(_report_batch_item, columns=columns),
+                queue_size=prefetch_count,
+                worker_counts=[download_count, 1, 1],
+            )
         )
+        results = {item.source: item.results for item in items if item.error is None}
+
+        if len(results) < len(sources):
+            logger.warning("%d of %d sources could not be analyzed.", len(sources) - len(results), len(sources))
+
+        if cache is not None:
+            _log_cache_statistics(cache)
 
     return results
 
@@ -0,0 +1,310 @@
+# Copyright (c) stefan6419846. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+
+"""
+Long-lived worker pools to run the analysis with.
+"""
+
+from __future__ import annotations
+
+import atexit
+import gc
+import itertools
+import logging
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import Executor, FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Generator, Iterable, Literal, Type, TypeVar
+
+import scancode_config  # type: ignore[import-untyped]
+
+from license_tools.tools import scancode_tools
+from license_tools.utils import resource_utils
+from license_tools.utils.resource_utils import MemoryController
+
+
+logger = logging.getLogger(__name__)
+del logging
+
+
+_T = TypeVar("_T")
+
+START_METHOD_TYPE = Literal["spawn", "fork"]
+
+
+def initialize_worker(preload_index: bool = True, register_cleanup: bool = True) -> None:
+    """
+    Prepare a worker process.
+
+    :param preload_index: Whether to load the license index before running any task.
+    :param register_cleanup: Whether to remove the temporary directory of the worker
+                             on exit. Forked workers share the directory of the parent.
+    """
+    if register_cleanup:
+        # Each spawned worker process has its own temporary directory.
+        atexit.register(scancode_tools.cleanup, scancode_config.scancode_temp_dir)
+    if preload_index:
+        scancode_tools.load_index()
+
+
+def _get_initialized_worker_memory() -> int | None:
+    """
+    Prepare the current worker process like the regular workers and report its memory usage.
+
+    :return: The peak memory usage in bytes.
+    """
+    initialize_worker()
+    return resource_utils.get_peak_memory()
+
+
+def measure_worker_memory() -> int | None:
+    """
+    Start a single worker, which loads the license index, to measure the memory usage
+    a worker has before analyzing any files.
+
+    :return: The peak memory usage in bytes, `None` if it cannot be determined.
+    """
+    try:
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            return executor.submit(_get_initialized_worker_memory).result()
+    except (OSError, BrokenProcessPool) as exception:
+        logger.warning("Could not measure the memory usage of a worker: %s", exception)
+        return None
+
+
+def _call_with_peak_memory(function: Callable[..., _T], kwargs: dict[str, Any]) -> tuple[_T, int | None]:
+    """
+    Call the given function and report the peak memory usage of the worker afterwards.
+
+    :param function: The function to call.
+    :param kwargs: The keyword arguments to pass.
+    :return: The result and the peak memory usage in bytes.
+    """
+    return function(**kwargs), resource_utils.get_peak_memory()
+
+
+class _SynchronousExecutor(Executor):
+    """
+    Executor running each task directly inside the current process.
+    """
+
+    def submit(self, fn: Callable[..., _T], /, *args: Any, **kwargs: Any) -> Future[_T]:
+        future: Future[_T] = Future()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as exception:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+        return future
+
+
+class Scanner:
+    """
+    Worker pool which can be reused for multiple analysis runs.
+
+    The workers are started on first use and load the license index once, thus
+    subsequent runs do not have to pay the startup costs again. Use it as a context
+    manager or call :meth:`~close` to stop the workers.
+
+    With a job count of 1, all tasks run inside the current process.
+
+    The `spawn` start method launches fresh interpreters, which load their own copy
+    of the license index. The `fork` start method loads the index inside the current
+    process instead and forks the workers afterwards, thus they share the memory pages
+    of the index copy-on-write. Forking is only available on POSIX systems. The forked
+    workers are started when creating the scanner, thus it has to be created before the
+    current process starts any other threads, including the process pool of `joblib`
+    used for analysis runs without a scanner.
+
+    With a memory controller, the number of worker processes follows the memory usage of
+    the cgroup, while the job count sets the maximum. Once the controller changes the number,
+    no further tasks are scheduled until the running ones are done, and the workers are
+    replaced by a pool of the new size, which loads the license index again. With the `fork`
+    start method, the workers share the index, thus only the number of running tasks is
+    reduced and the workers are kept.
+    """
+
+    remote = False
+    """
+    Whether the workers run on other hosts, thus the file contents have to be sent to them.
+    """
+
+    def __init__(
+        self,
+        job_count: int = 4,
+        preload_index: bool = True,
+        start_method: START_METHOD_TYPE = "spawn",
+        controller: MemoryController | None = None,
+    ) -> None:
+        """
+        :param job_count: The number of parallel worker processes to use.
+        :param preload_index: Whether to load the license index when starting the workers.
+        :param start_method: How to start the worker processes.
+        :param controller: Adjust the number of tasks running in parallel to the memory usage.
+        """
+        if start_method not in {"spawn", "fork"}:
+            raise ValueError(f"Unsupported start method: {start_method}")
+        self.job_count = job_count
+        self.preload_index = preload_index
+        self.start_method = start_method
+        self.controller = controller
+        self._executor: Executor | None = None
+        self._worker_count = job_count
+        self._frozen = False
+        if start_method == "fork" and job_count > 1:
+            # Fork the workers before the analysis starts any helper threads.
+            self._executor = self._create_executor()
+
+    def __enter__(self) -> Scanner:
+        return self
+
+    def __exit__(self, type_: Type[BaseException] | None, value: BaseException | None, traceback: Any | None) -> None:
+        self.close()
+
+    def _create_executor(self) -> Executor:
+        """
+        Create the executor to submit the tasks to.
+
+        :return: The new executor.
+        """
+        if self.job_count == 1:
+            return _SynchronousExecutor()
+        if self.start_method == "fork":
+            if threading.active_count() > 1:
+                raise RuntimeError("Cannot fork the workers while other threads are running.")
+            if self.preload_index:
+                scancode_tools.load_index()
+                # Move the index out of the reach of the garbage collector, which would
+                # otherwise touch the objects and copy the shared pages in each worker.
+                # The current process would copy the shared pages as well, thus this is
+                # only undone when closing the executor.
+                gc.freeze()
+                self._frozen = True
+            executor = ProcessPoolExecutor(
+                max_workers=self._worker_count,
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=initialize_worker,
+                initargs=(False, False),
+            )
+            # The first task forks all workers before the executor starts its own threads.
+            executor.submit(int).result()
+            return executor
+        return ProcessPoolExecutor(
+            max_workers=self._worker_count,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=initialize_worker,
+            initargs=(self.preload_index, True),
+        )
+
+    @property
+    def executor(self) -> Executor:
+        """
+        The executor to submit the tasks to. Will be created if required.
+        """
+        if self._executor is None:
+            self._executor = self._create_executor()
+        return self._executor
+
+    def _resize(self, worker_count: int) -> None:
+        """
+        Stop the current workers, thus the next task starts the given number of new ones.
+        Only call this while no tasks are running.
+
+        :param worker_count: The number of worker processes to use.
+        """
+        logger.info("Replacing the %d worker processes by %d ones.", self._worker_count, worker_count)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self._worker_count = worker_count
+
+    def submit(self, function: Callable[..., _T], /, *args: Any, **kwargs: Any) -> Future[_T]:
+        """
+        Schedule the given function call.
+
+        :param function: The function to call. Has to be picklable.
+        :param args: The positional arguments to pass.
+        :param kwargs: The keyword arguments to pass.
+        :return: The corresponding future.
+        """
+        return self.executor.submit(function, *args, **kwargs)
+
+    def map(
+        self, function: Callable[..., _T], kwargs_iterable: Iterable[dict[str, Any]], ordered: bool = True
+    ) -> Generator[_T, None, None]:
+        """
+        Call the given function for each set of keyword arguments.
+
+        The arguments are consumed lazily, keeping twice as many calls scheduled as there
+        are workers. With a memory controller, only as many calls are scheduled as the
+        controller allows to run in parallel, and the workers are replaced by a pool of
+        this size once the scheduled calls are done.
+
+        :param function: The function to call. Has to be picklable.
+        :param kwargs_iterable: The keyword arguments for each call.
+        :param ordered: Yield the results in the order of the given arguments. Otherwise,
+                        each result is yielded as soon as it is available.
+        :return: The results, yielded while the remaining calls are still running.
+        """
+        arguments = iter(kwargs_iterable)
+        pending: deque[Future[Any]] = deque()
+        controller = self.controller
+        # Forked workers share the license index, thus replacing them would not save any memory.
+        resizable = controller is not None and self.job_count > 1 and self.start_method == "spawn"
+
+        def schedule() -> None:
+            if controller is None:
+                limit = 2 * self.job_count
+            else:
+                limit = controller.update()
+                if resizable and limit != self._worker_count:
+                    if pending:
+                        # Wait for the running tasks before replacing the workers.
+                        return
+                    self._resize(limit)
+            for kwargs in itertools.islice(arguments, max(0, limit - len(pending))):
+                if controller is None:
+                    pending.append(self.submit(function, **kwargs))
+                else:
+                    pending.append(self.submit(_call_with_peak_memory, function, kwargs))
+
+        try:
+            schedule()
+            while pending:
+                if ordered:
+                    done = [pending.popleft()]
+                else:
+                    done_set, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    done = [future for future in pending if future in done_set]
+                    for future in done:
+                        pending.remove(future)
+                for future in done:
+                    if controller is None:
+                        yield future.result()
+                    else:
+                        result, peak_memory = future.result()
+                        controller.add_worker_memory(peak_memory)
+                        yield result
+                    schedule()
+        finally:
+            # Do not keep the workers busy if the caller stops early.
+            for future in pending:
+                future.cancel()
+
+    def close(self) -> None:
+        """
+        Stop all workers. The scanner can be used again afterwards, which will start
+        new workers.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self._worker_count = self.job_count
+        if self._frozen:
+            # Let the garbage collector handle the objects of the current process again.
+            gc.unfreeze()
+            self._frozen = False
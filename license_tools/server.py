@@ -0,0 +1,273 @@
+# Copyright (c) stefan6419846. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+
+"""
+Long-running analysis server, keeping the license index and the worker pool loaded
+between the analysis jobs.
+
+The server accepts the jobs as JSON objects via `POST /scan` over HTTP, either on a TCP
+port or on a Unix socket, and streams the results back as JSON Lines. `GET /health`
+can be used to check whether the server is ready. The server analyzes arbitrary paths
+of the host on request and does not authenticate the clients, thus only make it
+accessible to trusted clients, preferably using a Unix socket.
+
+Example job::
+
+    {"directory": "/path/to/sources", "retrieve_copyrights": true}
+"""
+
+from __future__ import annotations
+
+import inspect
+import json
+import logging
+import os
+import socketserver
+import stat
+from contextlib import closing
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Generator, Union
+
+from license_tools import retrieval
+from license_tools.retrieval import RetrievalFlags
+from license_tools.scanner import Scanner
+from license_tools.tools import scancode_tools
+from license_tools.tools.scancode_tools import FileResults
+from license_tools.utils import cache_utils, jsonl_utils
+from license_tools.utils.cache_utils import ResultCache
+
+
+logger = logging.getLogger(__name__)
+del logging
+
+
+SOURCE_KEYS = ("directory", "file_path", "archive_path", "package_definition", "download_url")
+"""
+Keys of a job to set the source to analyze. Exactly one of them is required.
+"""
+
+RETRIEVAL_KEYS = tuple(inspect.signature(RetrievalFlags.to_int).parameters)
+"""
+Keys of a job to select the values to retrieve.
+"""
+
+SERVER_TYPE = Union["_TcpServer", "_UnixServer"]
+
+
+class _ServerMixin:
+    """
+    State shared by all requests of a server.
+    """
+
+    daemon_threads = True
+
+    scanner: Scanner
+    cache_directory: Path | str | None
+    cache_size: int
+
+
+class _TcpServer(_ServerMixin, ThreadingHTTPServer):
+    """
+    Server listening on a TCP port.
+    """
+
+
+class _UnixServer(_ServerMixin, socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Server listening on a Unix socket.
+    """
+
+    def server_bind(self) -> None:
+        path = Path(self.server_address)  # type: ignore[arg-type]
+        if path.exists() and stat.S_ISSOCK(path.stat().st_mode):
+            # Left over by a previous server which has not been shut down correctly.
+            path.unlink()
+        super().server_bind()
+
+    def server_close(self) -> None:
+        super().server_close()
+        Path(self.server_address).unlink(missing_ok=True)  # type: ignore[arg-type]
+
+
+class JobError(ValueError):
+    """
+    Invalid analysis job.
+    """
+
+
+def parse_job(data: bytes) -> dict[str, Any]:
+    """
+    Validate the given analysis job.
+
+    :param data: The JSON-encoded job.
+    :return: The keyword arguments for :func:`~license_tools.retrieval.run_on_source`,
+             without the shared worker pool and cache.
+    """
+    try:
+        job = json.loads(data)
+    except ValueError as exception:
+        raise JobError(f"Invalid JSON: {exception}")
+    if not isinstance(job, dict):
+        raise JobError("The job has to be an object.")
+    unknown = set(job) - set(SOURCE_KEYS) - set(RETRIEVAL_KEYS) - {"index_url", "prefer_sdist"}
+    if unknown:
+        raise JobError(f"Unknown keys: {', '.join(sorted(unknown))}")
+    sources = [key for key in SOURCE_KEYS if job.get(key)]
+    if len(sources) != 1:
+        raise JobError(f"Exactly one source is required: {', '.join(SOURCE_KEYS)}")
+    for key in [*SOURCE_KEYS, "index_url"]:
+        if key in job and not isinstance(job[key], str):
+            raise JobError(f"{key} has to be a string.")
+    for key in [*RETRIEVAL_KEYS, "prefer_sdist"]:
+        if key in job and not isinstance(job[key], bool):
+            raise JobError(f"{key} has to be a boolean.")
+
+    retrieval_kwargs = {key: job.pop(key) for key in RETRIEVAL_KEYS if key in job}
+    if not job.get("package_definition"):
+        # Consistent with `retrieval.run`.
+        retrieval_kwargs.pop("retrieve_python_metadata", None)
+    job["retrieval_flags"] = RetrievalFlags.to_int(**retrieval_kwargs)
+    return job
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    """
+    Handle the requests of a single client connection.
+    """
+
+    server: SERVER_TYPE
+
+    def log_message(self, format: str, *args: Any) -> None:
+        # The default implementation writes to stderr and fails for Unix sockets.
+        logger.debug("Request: " + format, *args)
+
+    def _send_json(self, status: HTTPStatus, value: Any) -> None:
+        """
+        Send a complete JSON response.
+
+        :param status: The status to respond with.
+        :param value: The value to send.
+        """
+        body = jsonl_utils.to_json(value).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:  # noqa: N802
+        if self.path == "/health":
+            self._send_json(HTTPStatus.OK, {"status": "ok"})
+            return
+        self._send_json(HTTPStatus.NOT_FOUND, {"error": "Not found."})
+
+    def do_POST(self) -> None:  # noqa: N802
+        if self.path != "/scan":
+            self._send_json(HTTPStatus.NOT_FOUND, {"error": "Not found."})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            job = parse_job(self.rfile.read(length))
+        except (JobError, ValueError) as exception:
+            self._send_json(HTTPStatus.BAD_REQUEST, {"error": str(exception)})
+            return
+
+        logger.info("Starting job %s.", job)
+        # The response has no length, thus it ends with closing the connection.
+        self.close_connection = True
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        self.wfile.flush()
+
+        # Each connection runs in its own thread, which needs its own database connection.
+        cache = ResultCache(directory=self.server.cache_directory, maximum_size=self.server.cache_size) if self.server.cache_directory else None
+        try:
+            self._stream_results(retrieval.run_on_source(cache=cache, scanner=self.server.scanner, **job))
+        finally:
+            if cache is not None:
+                cache.close()
+
+    def _stream_results(self, results: Generator[FileResults, None, None]) -> None:
+        """
+        Send each result as soon as it is available. Errors are reported as the last line.
+
+        :param results: The results to send.
+        """
+        count = 0
+        with closing(results):
+            try:
+                for result in results:
+                    self.wfile.write(jsonl_utils.to_json(result).encode("utf-8") + b"\n")
+                    self.wfile.flush()
+                    count += 1
+            except (BrokenPipeError, ConnectionResetError):
+                # Stop the remaining analysis if the client is gone.
+                logger.warning("Client disconnected after %d results.", count)
+                return
+            except Exception as exception:
+                logger.exception("Job failed after %d results.", count)
+                self.wfile.write(jsonl_utils.to_json({"error": f"{type(exception).__name__}: {exception}"}).encode("utf-8") + b"\n")
+                return
+        logger.info("Completed job with %d results.", count)
+
+
+def create_server(
+    address: str | tuple[str, int],
+    job_count: int = 4,
+    cache_directory: Path | str | None = None,
+    cache_size: int = cache_utils.DEFAULT_MAXIMUM_SIZE,
+) -> SERVER_TYPE:
+    """
+    Create the server and start the worker pool, loading the license index in each worker.
+
+    :param address: The host and port to listen on, or the path of the Unix socket.
+    :param job_count: The number of parallel worker processes to use. With a job count of 1,
+                      the analysis runs inside the server process.
+    :param cache_directory: The directory to cache the ScanCode results in. Disables caching if unset.
+    :param cache_size: The maximum size of the cache in bytes.
+    :return: The server, which has to be started using `serve_forever`. Call `server_close`
+             and `scanner.close` afterwards.
+    """
+    server: SERVER_TYPE
+    if isinstance(address, str):
+        server = _UnixServer(address, _RequestHandler)
+    else:
+        server = _TcpServer(address, _RequestHandler)
+    server.scanner = Scanner(job_count=job_count)
+    server.cache_directory = cache_directory
+    server.cache_size = cache_size
+
+    # Start all workers directly, thus the first job does not have to wait for them.
+    futures = [server.scanner.submit(scancode_tools.load_index) for _ in range(job_count)]
+    for future in futures:
+        future.result()
+    return server
+
+
+def serve(
+    address: str | tuple[str, int],
+    job_count: int = 4,
+    cache_directory: Path | str | None = None,
+    cache_size: int = cache_utils.DEFAULT_MAXIMUM_SIZE,
+) -> None:
+    """
+    Run the server until it is interrupted.
+
+    :param address: The host and port to listen on, or the path of the Unix socket.
+    :param job_count: The number of parallel worker processes to use.
+    :param cache_directory: The directory to cache the ScanCode results in. Disables caching if unset.
+    :param cache_size: The maximum size of the cache in bytes.
+    """
+    server = create_server(address=address, job_count=job_count, cache_directory=cache_directory, cache_size=cache_size)
+    logger.info("Listening on %s with %d workers (PID %d).", server.server_address, job_count, os.getpid())
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.scanner.close()
@@ -77,6 +77,16 @@ def check_metadata(path: Path | str) -> str:
     metadata = analyze_metadata(path)
     if not metadata:
         return ""
+    return render_metadata(metadata)
+
+
+def render_metadata(metadata: dict[str, str | list[str]]) -> str:
+    """
+    Render the relevant details of the given package metadata.
+
+    :param metadata: The package metadata, as retrieved by :func:`~analyze_metadata`.
+    :return: The rendered dictionary-like representation of the relevant fields.
+    """
     return rendering_utils.render_dictionary(
         dictionary=metadata, verbose_names_mapping=_VERBOSE_NAMES, multi_value_keys={"authors", "categories", "keywords"}
     )
@@ -262,6 +262,17 @@ def check_font(path: Path) -> str | None:
     font_data = analyze_font(path)
     if not font_data:
         return None
+    return render_names(font_data)
+
+
+def render_names(font_data: dict[str, None | dict[str, FONT_VALUE_TYPE]]) -> str | None:
+    """
+    Render the names section of the given font data.
+
+    :param font_data: The font data, as retrieved by :func:`~analyze_font`.
+    :return: `None` if there is no names section, otherwise the rendered
+             dictionary-like representation of it.
+    """
     names = font_data["name"]
     if not names:
         return None
@@ -12,9 +12,8 @@ import logging
 import shutil
 import subprocess
 from pathlib import Path
-from typing import cast
 
-from typecode import magic2  # type: ignore[import-untyped]
+from license_tools.utils import file_type_utils
 
 logger = logging.getLogger(__name__)
 del logging
@@ -27,7 +26,7 @@ def _get_mime_type(path: Path) -> str:
     :param: The file to check.
     :return: The guessed mime type.
     """
-    return cast(str, magic2.mime_type(path))
+    return file_type_utils.get_file_type(path).mime_type
 
 
 def is_image(path: Path) -> bool:
@@ -13,7 +13,7 @@ import subprocess
 from pathlib import Path
 from typing import cast, Literal
 
-from typecode import magic2  # type: ignore[import-untyped]
+from license_tools.utils import file_type_utils
 
 logger = logging.getLogger(__name__)
 del logging
@@ -34,7 +34,7 @@ def _get_file_type(path: Path) -> str:
     :param: The file to check.
     :return: The guessed file type.
     """
-    return cast(str, magic2.file_type(path))
+    return file_type_utils.get_file_type(path).description
 
 
 def is_elf(path: Path) -> bool:
@@ -8,6 +8,7 @@ Tools related to pip.
 
 from __future__ import annotations
 
+import re
 import subprocess
 import sys
 from dataclasses import asdict as dataclasses_asdict
@@ -33,6 +34,28 @@ _VERBOSE_NAMES = {
 }
 
 
+METADATA_FILE_NAMES = {"METADATA", "PKG-INFO"}
+"""
+Names of the files inside the metadata directory which hold the package metadata.
+"""
+
+
+def get_metadata_directory(path: Path | str) -> Path:
+    """
+    Find the Python package metadata directory for the given directory.
+
+    :param path: The directory to search. Should either be a `.dist-info` one or the parent.
+    :return: The `.dist-info` or `.egg-info` directory.
+    """
+    path = Path(path)
+    if path.suffix in {".dist-info", ".egg-info"}:
+        return path
+    try:
+        return next(path.glob("*.dist-info"))
+    except StopIteration:
+        return next(path.rglob("*.egg-info"))
+
+
 def analyze_metadata(path: Path | str) -> PackageInfo:
     """
     Analyze the Python package metadata for the given directory.
@@ -40,13 +63,7 @@ def analyze_metadata(path: Path | str) -> PackageInfo:
     :param path: The directory to analyze. Should either be a `.dist-info` one or the parent.
     :return: The package metadata.
     """
-    path = Path(path)
-    if path.suffix not in {".dist-info", ".egg-info"}:
-        try:
-            path = next(path.glob("*.dist-info"))
-        except StopIteration:
-            path = next(path.rglob("*.egg-info"))
-    distribution = PathDistribution(path)
+    distribution = PathDistribution(get_metadata_directory(path))
     return get_package_info(distribution, normalize_name=True)
 
 
@@ -103,3 +120,26 @@ def download_package(
         if exception.stderr:
             sys.stderr.write(exception.stderr)
         raise
+
+
+def read_requirements_file(path: Path | str) -> list[str]:
+    """
+    Read the package definitions from the given requirements file.
+
+    Options like nested requirements files, editable installs or hashes are ignored.
+
+    :param path: The requirements file to read.
+    :return: The package definitions in the order of the file.
+    """
+    content = Path(path).read_text()
+    # Join continued lines.
+    content = content.replace("\\\n", " ")
+    requirements = []
+    for line in content.splitlines():
+        line = re.sub(r"(^|\s+)#.*$", "", line).strip()
+        if not line or line.startswith("-"):
+            continue
+        # Remove per-requirement options like `--hash`.
+        line = re.sub(r"\s+--\w.*$", "", line)
+        requirements.append(line)
+    return requirements
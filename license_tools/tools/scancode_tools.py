@@ -11,14 +11,239 @@ from __future__ import annotations
 
 import atexit
 import datetime
+import hashlib
+import logging
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager, nullcontext
 from dataclasses import dataclass, field as dataclass_field
 from pathlib import Path
-from typing import Literal
+from typing import Any, Generator, Iterable, Iterator, Literal, TYPE_CHECKING
 
 import scancode_config  # type: ignore[import-untyped]
 from commoncode import fileutils  # type: ignore[import-untyped]
+from commoncode.text import python_safe_name  # type: ignore[import-untyped]
+from license_expression import combine_expressions  # type: ignore[import-untyped]
+from licensedcode import tokenize  # type: ignore[import-untyped]
+from licensedcode.cache import build_spdx_license_expression  # type: ignore[import-untyped]
+from licensedcode.detection import get_uuid_on_content  # type: ignore[import-untyped]
+from licensedcode.match_spdx_lid import get_spdx_expression, MATCH_SPDX_ID  # type: ignore[import-untyped]
 from packagedcode.rpm import RpmArchiveHandler  # type: ignore[import-untyped]
 from scancode import api  # type: ignore[import-untyped]
+from textcode import analysis, markup  # type: ignore[import-untyped]
+
+from license_tools.utils import comment_utils
+
+if TYPE_CHECKING:
+    from license_tools.tools.font_tools import FONT_VALUE_TYPE
+    from license_tools.utils.reuse_utils import LicenseDeclaration
+
+
+logger = logging.getLogger(__name__)
+del logging
+
+
+SPDX_TAG = "spdx-license-identifier"
+"""
+Lowercase marker of SPDX license identifier tags, see https://spdx.dev/learn/handling-license-info/.
+"""
+
+
+@dataclass(frozen=True)
+class TextWindow:
+    """
+    Part of a file to pass to the detectors, usually the license header at its beginning.
+    The detectors report the original line numbers.
+    """
+
+    line_count: int | None = None
+    """
+    The number of lines at the beginning of the file. Unlimited if unset.
+    """
+
+    size: int | None = None
+    """
+    The number of characters at the beginning of the file, cutting long lines like the
+    ones of minified files. Unlimited if unset.
+    """
+
+    tail_line_count: int = 0
+    """
+    The number of lines at the end of the file to pass additionally, for license notices
+    placed at the end.
+    """
+
+    def apply(self, lines: Iterable[tuple[int, str]]) -> tuple[list[tuple[int, str]], bool]:
+        """
+        Select the lines inside the window.
+
+        :param lines: The numbered lines of the file.
+        :return: The selected lines and whether any line has been left out.
+        """
+        iterator = iter(lines)
+        selected: list[tuple[int, str]] = []
+        size = 0
+        first_omitted: tuple[int, str] | None = None
+        for number, line in iterator:
+            if self.line_count is not None and len(selected) >= self.line_count:
+                first_omitted = (number, line)
+                break
+            if self.size is not None and size + len(line) > self.size:
+                if self.size > size:
+                    selected.append((number, line[:self.size - size]))
+                # The remainder of the cut line must not be part of the tail.
+                first_omitted = (-1, "")
+                break
+            selected.append((number, line))
+            size += len(line)
+        if first_omitted is None:
+            return selected, False
+        if self.tail_line_count:
+            tail: deque[tuple[int, str]] = deque(maxlen=self.tail_line_count)
+            if first_omitted[0] >= 0:
+                tail.append(first_omitted)
+            # Reads the whole file, but only the last lines are kept.
+            tail.extend(iterator)
+            selected.extend(tail)
+        return selected, True
+
+
+TEXT_LINES_TYPE = dict[tuple[str, bool, bool, int, bool], list[tuple[int, str]]]
+"""
+Extracted text lines, keyed by the file path, whether markup has been removed, whether
+the file is treated as plain text, the first line number and whether only the comments
+have been kept.
+"""
+
+
+class _TextLinesCache(threading.local):
+    """
+    Thread-local storage for the text lines which have already been extracted.
+    """
+
+    lines: TEXT_LINES_TYPE | None = None
+    window: TextWindow | None = None
+    comments_only: bool = False
+    partial: bool = False
+
+
+_text_lines_cache = _TextLinesCache()
+_numbered_text_lines = analysis.numbered_text_lines
+_patch_lock = threading.Lock()
+_patch_count = 0
+_patched_functions: tuple[Any, Any] = (None, None)
+
+
+def _cached_numbered_text_lines(
+        location: Any, demarkup: bool = False, plain_text: bool = False, start_line: int = 1
+) -> Iterator[tuple[int, str]]:
+    """
+    Drop-in replacement for `textcode.analysis.numbered_text_lines` which reuses
+    already extracted lines while inside the :func:`~shared_text_lines` context.
+    Behaves exactly like the original function otherwise, for example for other threads.
+    """
+    cache = _text_lines_cache.lines
+    if cache is None or not isinstance(location, str):
+        return iter(_numbered_text_lines(location, demarkup=demarkup, plain_text=plain_text, start_line=start_line))
+    if demarkup and not markup.is_markup(location):
+        # Without markup, both variants yield the same lines.
+        demarkup = False
+    language = comment_utils.get_language(location) if _text_lines_cache.comments_only else None
+    key = (location, demarkup, plain_text, start_line, language is not None)
+    if key not in cache:
+        lines = _numbered_text_lines(location, demarkup=demarkup, plain_text=plain_text, start_line=start_line)
+        if language is not None:
+            lines = comment_utils.extract_comments(lines, language)
+        if _text_lines_cache.window is None:
+            cache[key] = list(lines)
+        else:
+            cache[key], partial = _text_lines_cache.window.apply(lines)
+            _text_lines_cache.partial |= partial
+    return iter(cache[key])
+
+
+def is_sharing_disabled() -> bool:
+    """
+    Check whether sharing the text lines between the detectors has been disabled by setting
+    the environment variable `LICENSE_TOOLS_DISABLE_SHARED_TEXT_LINES=true`. Text windows
+    and the comment filter are not available in this case.
+
+    :return: The check result.
+    """
+    return os.getenv("LICENSE_TOOLS_DISABLE_SHARED_TEXT_LINES", "").lower() == "true"
+
+
+@contextmanager
+def _patched_text_lines() -> Generator[None, None, None]:
+    """
+    Route the text extraction of the copyright, e-mail, URL and license detectors through
+    :func:`~_cached_numbered_text_lines` while inside this context. The ScanCode API does
+    not accept already extracted lines with their original line numbers, thus this cannot
+    be passed explicitly. The original functions are restored as soon as no thread is
+    inside this context anymore.
+    """
+    global _patch_count, _patched_functions
+    with _patch_lock:
+        if _patch_count == 0:
+            _patched_functions = analysis.numbered_text_lines, tokenize.numbered_text_lines
+            analysis.numbered_text_lines = _cached_numbered_text_lines
+            tokenize.numbered_text_lines = _cached_numbered_text_lines
+        _patch_count += 1
+    try:
+        yield
+    finally:
+        with _patch_lock:
+            _patch_count -= 1
+            if _patch_count == 0:
+                analysis.numbered_text_lines, tokenize.numbered_text_lines = _patched_functions
+                _patched_functions = (None, None)
+
+
+@contextmanager
+def shared_text_lines(window: TextWindow | None = None) -> Generator[TEXT_LINES_TYPE, None, None]:
+    """
+    Extract the text lines of each file only once while inside this context, instead of
+    once for each detector. The cache is dropped afterwards.
+
+    :param window: Only pass the lines inside the given window to the detectors.
+    :return: The extracted lines, keyed by the file and the extraction parameters.
+    """
+    if is_sharing_disabled():
+        if window is not None:
+            raise ValueError("Text windows are not available with LICENSE_TOOLS_DISABLE_SHARED_TEXT_LINES=true.")
+        yield {}
+        return
+    cache = _text_lines_cache
+    previous = cache.lines, cache.window, cache.comments_only, cache.partial
+    lines: TEXT_LINES_TYPE = {}
+    cache.lines = lines
+    cache.window = window
+    cache.comments_only = False
+    cache.partial = False
+    try:
+        with _patched_text_lines():
+            yield lines
+    finally:
+        cache.lines, cache.window, cache.comments_only, cache.partial = previous
+
+
+@contextmanager
+def comment_lines_only() -> Generator[None, None, None]:
+    """
+    Only pass the comments and docstrings of supported source files to the detectors
+    running inside this context, see :mod:`license_tools.utils.comment_utils`. Applied
+    before the window. Only has an effect inside the :func:`~shared_text_lines` context.
+    """
+    if is_sharing_disabled():
+        raise ValueError("The comment filter is not available with LICENSE_TOOLS_DISABLE_SHARED_TEXT_LINES=true.")
+    cache = _text_lines_cache
+    previous = cache.comments_only
+    cache.comments_only = True
+    try:
+        yield
+    finally:
+        cache.comments_only = previous
 
 
 @dataclass
@@ -422,6 +647,63 @@ class Licenses:
             LicenseClue(**x) if not isinstance(x, LicenseClue) else x for x in self.license_clues  # type: ignore[arg-type]
         ]
 
+    @classmethod
+    def from_spdx_tags(cls, lines: Iterable[tuple[int, str]]) -> Licenses | None:
+        """
+        Build the license information from the `SPDX-License-Identifier` tags of the given
+        lines, without running the license matching. Each tag becomes a detection with a
+        single `1-spdx-id` match, like the matcher would report it. Other license texts
+        and notices inside the lines are not considered.
+
+        :param lines: The numbered text lines of the file.
+        :return: The license information, `None` if there are no tags or any of them cannot
+                 be resolved to known licenses and thus requires the matcher.
+        """
+        detections = []
+        token_count = 0
+        matched_token_count = 0
+        for number, line in lines:
+            line_token_count = len(list(tokenize.query_tokenizer(line)))
+            token_count += line_token_count
+            index = line.lower().find(SPDX_TAG)
+            if index < 0:
+                continue
+            text = line[index:].strip()
+            expression = get_spdx_expression(text)
+            if not expression or "unknown-spdx" in expression:
+                return None
+            expression_spdx = build_spdx_license_expression(expression)
+            matched_length = len(list(tokenize.query_tokenizer(text)))
+            matched_token_count += matched_length
+            rule_identifier = (
+                f"spdx-license-identifier-{python_safe_name(expression)}-"
+                f"{hashlib.sha1(f'{expression!r}{text!r}'.encode()).hexdigest()}"
+            )
+            detections.append(
+                LicenseDetection(
+                    license_expression=expression,
+                    license_expression_spdx=expression_spdx,
+                    identifier=f"{python_safe_name(expression)}-{get_uuid_on_content([(rule_identifier, 100.0, text)])}",
+                    matches=[
+                        LicenseMatch(
+                            score=100.0, start_line=number, end_line=number, matched_length=matched_length,
+                            match_coverage=100.0, matcher=MATCH_SPDX_ID, license_expression=expression,
+                            license_expression_spdx=expression_spdx, rule_identifier=rule_identifier,
+                            rule_relevance=100, rule_url=None, from_file=None,
+                        )
+                    ],
+                )
+            )
+        if not detections:
+            return None
+        expression = str(combine_expressions([detection.license_expression for detection in detections]))
+        return cls(
+            detected_license_expression=expression,
+            detected_license_expression_spdx=build_spdx_license_expression(expression),
+            percentage_of_license_text=round(matched_token_count / token_count * 100, 2) if token_count else 0.0,
+            license_detections=detections,
+        )
+
     def get_scores_of_detected_license_expression_spdx(self) -> list[float]:
         """
         Attempt to resolve the scores for the detected license expression.
@@ -484,6 +766,31 @@ class FileResults:
     Configuration option: Whether to retrieve file information.
     """
 
+    text_window: TextWindow | None = None
+    """
+    Configuration option: Only run the detectors on the given part of the file, usually
+    its header. Analyzes the whole file if unset.
+    """
+
+    comments_only: bool = False
+    """
+    Configuration option: Only run the license matching on the comments and docstrings of
+    supported source files, ignoring license-like text inside the code. The other
+    detectors still analyze the whole text.
+    """
+
+    spdx_fast_path: bool = False
+    """
+    Configuration option: Build the license information from the `SPDX-License-Identifier`
+    tags of the file, if there are any, instead of running the license matching.
+    """
+
+    verify_spdx_tags: bool = False
+    """
+    Configuration option: Run the license matching even if the file has SPDX tags and
+    report the matcher results, warning about tags which disagree with them.
+    """
+
     # Analysis results.
     copyrights: Copyrights | None = None
     """
@@ -510,7 +817,66 @@ class FileResults:
     The retrieved file information.
     """
 
+    partial: bool = False
+    """
+    Whether the detectors only analyzed a part of the file due to the text window, thus
+    the results might be incomplete.
+    """
+
+    # Results of the additional analyses.
+    cargo_metadata: dict[str, str | list[str]] | None = None
+    """
+    The package metadata of a `Cargo.toml` file.
+    """
+
+    linking_data: str | None = None
+    """
+    The shared objects a binary is linked against, as reported by `ldd`.
+    """
+
+    font_data: dict[str, None | dict[str, FONT_VALUE_TYPE]] | None = None
+    """
+    The head and name sections of a font file.
+    """
+
+    image_metadata: str | None = None
+    """
+    The metadata of an image file, as reported by `exiftool`.
+    """
+
+    python_metadata: str | None = None
+    """
+    The rendered metadata of the analyzed Python package, attached to its metadata file.
+    """
+
+    # Scan policy.
+    policy_action: str | None = None
+    """
+    The action of the scan policy used for the file, like `header` or `skip`.
+    `None` if no policy has been used.
+    """
+
+    policy_reason: str | None = None
+    """
+    The reason of the matching scan policy rule. `None` if no rule matched.
+    """
+
+    # Bulk license metadata.
+    declaration: LicenseDeclaration | None = None
+    """
+    The license and the copyrights declared for the file by metadata like `REUSE.toml`,
+    see :mod:`license_tools.utils.reuse_utils`. `None` if no metadata covers the file.
+    """
+
     def __post_init__(self) -> None:
+        with shared_text_lines(window=self.text_window):
+            self._retrieve()
+            self.partial = self.partial or _text_lines_cache.partial
+
+    def _retrieve(self) -> None:
+        """
+        Run the requested detectors.
+        """
         path_str = str(self.path)
         if self.retrieve_copyrights:
             self.copyrights = Copyrights(**api.get_copyrights(path_str))
@@ -519,10 +885,31 @@ class FileResults:
         if self.retrieve_urls:
             self.urls = Urls(**api.get_urls(path_str))
         if self.retrieve_licenses:
-            self.licenses = Licenses(**api.get_licenses(path_str))
+            with comment_lines_only() if self.comments_only else nullcontext():
+                self.licenses = self._retrieve_licenses()
         if self.retrieve_file_info:
             self.file_info = FileInfo(**api.get_file_info(path_str))
 
+    def _retrieve_licenses(self) -> Licenses:
+        """
+        Detect the licenses, using the SPDX tags if requested.
+
+        :return: The detected licenses.
+        """
+        path_str = str(self.path)
+        tagged = None
+        if self.spdx_fast_path or self.verify_spdx_tags:
+            tagged = Licenses.from_spdx_tags(analysis.numbered_text_lines(path_str))
+            if tagged is not None and not self.verify_spdx_tags:
+                return tagged
+        licenses = Licenses(**api.get_licenses(path_str))
+        if tagged is not None and tagged.detected_license_expression_spdx != licenses.detected_license_expression_spdx:
+            logger.warning(
+                "SPDX tags of %s declare %s, but the license matching found %s.",
+                self.short_path, tagged.detected_license_expression_spdx, licenses.detected_license_expression_spdx,
+            )
+        return licenses
+
 
 @dataclass
 class Party:
@@ -794,6 +1181,16 @@ class PackageResults:
         return cls(**data)
 
 
+def load_index() -> None:
+    """
+    Load the license index into the current process. This usually happens lazily
+    on the first license scan, but takes a few seconds.
+    """
+    from licensedcode.cache import get_index  # type: ignore[import-untyped]
+
+    get_index()
+
+
 def cleanup(directory: Path | str) -> None:
     """
     Remove the given directory.
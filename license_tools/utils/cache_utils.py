@@ -0,0 +1,570 @@
+# Copyright (c) stefan6419846. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+
+"""
+Persistent result caching.
+"""
+
+from __future__ import annotations
+
+import abc
+import hashlib
+import logging
+import os
+import pickle
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable
+
+
+logger = logging.getLogger(__name__)
+del logging
+
+
+DEFAULT_MAXIMUM_SIZE = 512 * 1024 * 1024
+"""
+Default size limit of the cache in bytes.
+"""
+
+FLUSH_INTERVAL = 10.0
+"""
+Maximum number of seconds to keep the access times and counters of the cache lookups in memory.
+"""
+
+FLUSH_COUNT = 1000
+"""
+Maximum number of cache lookups to keep in memory before writing them to the database.
+"""
+
+EVICTION_CHUNK_SIZE = 100
+"""
+Number of least recently used cache entries to retrieve at once when evicting entries.
+"""
+
+
+def get_file_hash(path: Path | str) -> str:
+    """
+    Calculate the SHA256 hash of the given file.
+
+    :param path: The file to hash.
+    :return: The hexadecimal digest.
+    """
+    digest = hashlib.sha256()
+    with open(path, mode="rb") as fd:
+        for chunk in iter(lambda: fd.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@dataclass
+class CacheStatistics:
+    """
+    Usage statistics of a cache.
+    """
+
+    hits: int = 0
+    """
+    The number of successful lookups.
+    """
+
+    misses: int = 0
+    """
+    The number of failed lookups.
+    """
+
+    entries: int = 0
+    """
+    The number of cached entries.
+    """
+
+    size: int = 0
+    """
+    The size of all cached entries in bytes.
+    """
+
+
+class _Database(abc.ABC):
+    """
+    SQLite database, which can be passed to parallel workers. Each process opens its
+    own connection, while the tables are only created by the process which created
+    the instance.
+    """
+
+    def __init__(self, path: Path | str) -> None:
+        """
+        :param path: The path of the database. The parent directory will be created if required.
+        """
+        self._path = Path(path)
+        self._connection: sqlite3.Connection | None = None
+        self._connection_pid: int | None = None
+        self._initialized = False
+
+    def __getstate__(self) -> dict[str, Any]:
+        if not self._initialized:
+            # Create the tables in the current process, thus the workers only have to open the database.
+            self.connection
+        # Connections cannot be shared between processes.
+        state = self.__dict__.copy()
+        state["_connection"] = None
+        state["_connection_pid"] = None
+        return state
+
+    @property
+    def path(self) -> Path:
+        """
+        The path of the database.
+        """
+        return self._path
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """
+        The database connection for the current process.
+        """
+        if self._connection is None or self._connection_pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=60)
+            connection.execute("PRAGMA journal_mode=WAL")
+            if not self._initialized:
+                self._initialize(connection)
+                self._initialized = True
+            self._connection = connection
+            self._connection_pid = os.getpid()
+        return self._connection
+
+    @abc.abstractmethod
+    def _initialize(self, connection: sqlite3.Connection) -> None:
+        """
+        Create the tables if required. Only called for the first connection of the instance.
+
+        :param connection: The new connection.
+        """
+        pass
+
+    def close(self) -> None:
+        """
+        Close the connection of the current process.
+        """
+        if self._connection is not None and self._connection_pid == os.getpid():
+            self._connection.close()
+        self._connection = None
+        self._connection_pid = None
+
+
+class ResultCache(_Database):
+    """
+    Content-addressed cache for analysis results, stored inside a SQLite database.
+
+    Entries are evicted in least-recently-used order as soon as the total size exceeds
+    the configured limit. Each process opens its own database connection, thus instances
+    can be passed to parallel workers, which will share the same cache and counters.
+
+    Lookups do not write to the database. Their access times and counters are kept in
+    memory and written together with the next stored value, after :data:`FLUSH_INTERVAL`
+    seconds or :data:`FLUSH_COUNT` lookups, when calling :meth:`~flush` and on close.
+    Parallel workers should call :meth:`~flush` at the end of each task.
+
+    Additionally, the analysis durations per file suffix are recorded to allow estimating
+    the costs of future runs.
+    """
+
+    def __init__(self, directory: Path | str, maximum_size: int = DEFAULT_MAXIMUM_SIZE) -> None:
+        """
+        :param directory: The directory to store the cache database in. Will be created if required.
+        :param maximum_size: The maximum size of all cached values in bytes.
+        """
+        self.directory = Path(directory)
+        self.maximum_size = maximum_size
+        super().__init__(path=self.directory / "results.sqlite3")
+        self._reset_pending()
+
+    def __getstate__(self) -> dict[str, Any]:
+        # The pending lookups are written by the process which recorded them.
+        state = super().__getstate__()
+        state.update(_pending_hits=0, _pending_misses=0, _pending_accesses={}, _last_flush=time.monotonic())
+        return state
+
+    def _reset_pending(self) -> None:
+        """
+        Forget the lookups which have not been written yet.
+        """
+        self._pending_hits = 0
+        self._pending_misses = 0
+        self._pending_accesses: dict[str, float] = {}
+        self._last_flush = time.monotonic()
+
+    def _initialize(self, connection: sqlite3.Connection) -> None:
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS entries "
+            "(key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+        connection.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS timings (suffix TEXT PRIMARY KEY, size INTEGER NOT NULL, duration REAL NOT NULL)"
+        )
+        with connection:
+            connection.execute("INSERT OR IGNORE INTO counters (name, value) VALUES ('hits', 0), ('misses', 0)")
+            # Keep the total size of the entries instead of summing them up for each new entry.
+            connection.execute("INSERT OR IGNORE INTO counters (name, value) SELECT 'size', COALESCE(SUM(size), 0) FROM entries")
+
+    def get(self, key: str) -> Any | None:
+        """
+        Retrieve the value for the given key.
+
+        :param key: The key to look up.
+        :return: The cached value, `None` if there is no such entry.
+        """
+        row = self.connection.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self._pending_misses += 1
+        else:
+            self._pending_hits += 1
+            self._pending_accesses[key] = time.time()
+        if (
+            self._pending_hits + self._pending_misses >= FLUSH_COUNT
+            or time.monotonic() - self._last_flush >= FLUSH_INTERVAL
+        ):
+            self.flush()
+        return None if row is None else pickle.loads(row[0])
+
+    def set(self, key: str, value: Any) -> None:
+        """
+        Store the given value, evicting the least recently used entries if the cache is full.
+
+        :param key: The key to store the value for.
+        :param value: The value to store. Has to be picklable.
+        """
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.maximum_size:
+            logger.warning("Not caching %s with %d bytes, as it exceeds the cache size.", key, len(data))
+            return
+        connection = self.connection
+        with connection:
+            # Replaced entries do not count twice.
+            connection.execute(
+                "UPDATE counters SET value = value + ? - COALESCE((SELECT size FROM entries WHERE key = ?), 0) WHERE name = 'size'",
+                (len(data), key)
+            )
+            connection.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, data, len(data), time.time())
+            )
+            # The eviction depends on the latest access times.
+            self._flush(connection)
+            self._evict(connection)
+
+    def flush(self) -> None:
+        """
+        Write the access times and counters of the pending lookups to the database.
+        """
+        if not self._pending_hits and not self._pending_misses:
+            return
+        connection = self.connection
+        with connection:
+            self._flush(connection)
+
+    def _flush(self, connection: sqlite3.Connection) -> None:
+        """
+        Write the access times and counters of the pending lookups inside the current transaction.
+
+        :param connection: The connection to use.
+        """
+        connection.executemany(
+            "UPDATE entries SET last_access = MAX(last_access, ?) WHERE key = ?",
+            [(last_access, key) for key, last_access in self._pending_accesses.items()]
+        )
+        connection.executemany(
+            "UPDATE counters SET value = value + ? WHERE name = ?",
+            [(self._pending_hits, "hits"), (self._pending_misses, "misses")]
+        )
+        self._reset_pending()
+
+    def _evict(self, connection: sqlite3.Connection) -> None:
+        """
+        Remove the least recently used entries until the size limit is met.
+
+        :param connection: The connection to use.
+        """
+        total_size = connection.execute("SELECT value FROM counters WHERE name = 'size'").fetchone()[0]
+        if total_size <= self.maximum_size:
+            return
+        while total_size > self.maximum_size:
+            rows = connection.execute(
+                "SELECT key, size FROM entries ORDER BY last_access ASC LIMIT ?", (EVICTION_CHUNK_SIZE,)
+            ).fetchall()
+            if not rows:
+                total_size = 0
+                break
+            keys = []
+            for key, size in rows:
+                keys.append((key,))
+                total_size -= size
+                if total_size <= self.maximum_size:
+                    break
+            connection.executemany("DELETE FROM entries WHERE key = ?", keys)
+        connection.execute("UPDATE counters SET value = ? WHERE name = 'size'", (total_size,))
+
+    def add_timing(self, suffix: str, size: int, duration: float) -> None:
+        """
+        Record how long analyzing a file took.
+
+        :param suffix: The file suffix.
+        :param size: The file size in bytes.
+        :param duration: The duration of the analysis in seconds.
+        """
+        connection = self.connection
+        with connection:
+            connection.execute(
+                "INSERT INTO timings (suffix, size, duration) VALUES (?, ?, ?) "
+                "ON CONFLICT (suffix) DO UPDATE SET size = size + excluded.size, duration = duration + excluded.duration",
+                (suffix, size, duration)
+            )
+
+    def get_timings(self) -> dict[str, float]:
+        """
+        Get the recorded analysis speed.
+
+        :return: The average duration in seconds per byte for each file suffix.
+        """
+        rows = self.connection.execute("SELECT suffix, size, duration FROM timings WHERE size > 0").fetchall()
+        return {suffix: duration / size for suffix, size, duration in rows}
+
+    def get_statistics(self) -> CacheStatistics:
+        """
+        Get the usage statistics. The counters are shared between all users of the cache.
+
+        :return: The current statistics.
+        """
+        self.flush()
+        connection = self.connection
+        counters = dict(connection.execute("SELECT name, value FROM counters").fetchall())
+        entries = connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return CacheStatistics(hits=counters["hits"], misses=counters["misses"], entries=entries, size=counters["size"])
+
+    def clear(self) -> None:
+        """
+        Remove all entries and timings and reset the counters.
+        """
+        connection = self.connection
+        with connection:
+            connection.execute("DELETE FROM entries")
+            connection.execute("DELETE FROM timings")
+            connection.execute("UPDATE counters SET value = 0")
+        self._reset_pending()
+
+    def close(self) -> None:
+        """
+        Write the pending lookups and close the connection of the current process.
+        """
+        if self._connection is not None and self._connection_pid == os.getpid():
+            self.flush()
+        super().close()
+
+
+class Manifest(_Database):
+    """
+    Results of a previous analysis per file, stored inside a SQLite database together
+    with the file metadata and the content hash.
+
+    Files whose size, modification time and inode did not change are considered to be
+    unchanged without reading them. Otherwise, the content hash decides. Files which
+    have been modified shortly before their results have been recorded are always
+    verified by their hash, as the modification time might not reflect later changes.
+    """
+
+    RACY_INTERVAL_NS = 2_000_000_000
+    """
+    Files modified within this interval before recording them are verified by their hash.
+    """
+
+    def __init__(self, path: Path | str) -> None:
+        """
+        :param path: The path of the manifest database. The parent directory will be created if required.
+        """
+        super().__init__(path=path)
+        self.generation = 0
+
+    def _initialize(self, connection: sqlite3.Connection) -> None:
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS files "
+            "(short_path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime INTEGER NOT NULL, inode INTEGER NOT NULL, "
+            "hash TEXT NOT NULL, recorded INTEGER NOT NULL, flags INTEGER NOT NULL, value BLOB NOT NULL, generation INTEGER NOT NULL)"
+        )
+
+    def start(self) -> None:
+        """
+        Start a new analysis run. Entries which are not used until calling
+        :meth:`~remove_stale` will be removed then.
+        """
+        row = self.connection.execute("SELECT COALESCE(MAX(generation), 0) FROM files").fetchone()
+        self.generation = row[0] + 1
+
+    def get(self, path: Path, short_path: str, flags: int, get_hash: Callable[[], str] | None = None) -> Any | None:
+        """
+        Retrieve the recorded value for the given file if it did not change.
+
+        :param path: The file to look up.
+        :param short_path: The short path of the file, which identifies it between runs.
+        :param flags: The flags the value has been determined with.
+        :param get_hash: Calculate the content hash of the file if required, which allows
+                         the caller to reuse it. Uses :func:`~get_file_hash` if unset.
+        :return: The recorded value, `None` if the file is unknown or has been modified.
+        """
+        connection = self.connection
+        row = connection.execute(
+            "SELECT size, mtime, inode, hash, recorded, flags, value FROM files WHERE short_path = ?", (short_path,)
+        ).fetchone()
+        if row is None:
+            return None
+        size, mtime, inode, file_hash, recorded, recorded_flags, value = row
+        stat = path.stat()
+        if recorded_flags != flags or size != stat.st_size:
+            return None
+        if (mtime, inode) != (stat.st_mtime_ns, stat.st_ino) or mtime >= recorded - self.RACY_INTERVAL_NS:
+            if (get_hash() if get_hash is not None else get_file_hash(path)) != file_hash:
+                return None
+            # The content has been verified now.
+            recorded = time.time_ns()
+        with connection:
+            connection.execute(
+                "UPDATE files SET mtime = ?, inode = ?, recorded = ?, generation = ? WHERE short_path = ?",
+                (stat.st_mtime_ns, stat.st_ino, recorded, self.generation, short_path)
+            )
+        return pickle.loads(value)
+
+    def set(self, path: Path, short_path: str, flags: int, value: Any, file_hash: str | None = None) -> None:
+        """
+        Record the value for the given file.
+
+        :param path: The file to record the value for.
+        :param short_path: The short path of the file, which identifies it between runs.
+        :param flags: The flags the value has been determined with.
+        :param value: The value to store. Has to be picklable.
+        :param file_hash: The content hash of the file. Calculated if unset.
+        """
+        stat = path.stat()
+        if file_hash is None:
+            file_hash = get_file_hash(path)
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        connection = self.connection
+        with connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO files (short_path, size, mtime, inode, hash, recorded, flags, value, generation) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (short_path, stat.st_size, stat.st_mtime_ns, stat.st_ino, file_hash, time.time_ns(), flags, data, self.generation)
+            )
+
+    def remove_stale(self) -> int:
+        """
+        Remove the entries which have not been used since calling :meth:`~start`, for
+        example because the files have been deleted.
+
+        :return: The number of removed entries.
+        """
+        connection = self.connection
+        with connection:
+            cursor = connection.execute("DELETE FROM files WHERE generation < ?", (self.generation,))
+        return cursor.rowcount
+
+
+class Journal(_Database):
+    """
+    Durable log of the completed work of an analysis run, which allows resuming it
+    after an interruption.
+
+    The results are identified by the short path and the content hash of the file,
+    extracted archives by the short path and the content hash of the archive.
+    """
+
+    def _initialize(self, connection: sqlite3.Connection) -> None:
+        # Committed transactions survive the process being killed, but might be lost on power loss.
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS results "
+            "(short_path TEXT NOT NULL, hash TEXT NOT NULL, flags INTEGER NOT NULL, value BLOB NOT NULL, PRIMARY KEY (short_path, hash, flags))"
+        )
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS extractions "
+            "(short_path TEXT NOT NULL, hash TEXT NOT NULL, directory TEXT NOT NULL, PRIMARY KEY (short_path, hash))"
+        )
+
+    def get(self, path: Path, short_path: str, flags: int, file_hash: str | None = None) -> Any | None:
+        """
+        Retrieve the logged value for the given file.
+
+        :param path: The file to look up.
+        :param short_path: The short path of the file.
+        :param flags: The flags the value has been determined with.
+        :param file_hash: The content hash of the file. Calculated if unset.
+        :return: The logged value, `None` if there is no such entry.
+        """
+        row = self.connection.execute(
+            "SELECT value FROM results WHERE short_path = ? AND hash = ? AND flags = ?",
+            (short_path, file_hash or get_file_hash(path), flags)
+        ).fetchone()
+        if row is None:
+            return None
+        return pickle.loads(row[0])
+
+    def add(self, path: Path, short_path: str, flags: int, value: Any, file_hash: str | None = None) -> None:
+        """
+        Log the value for the given file.
+
+        :param path: The file the value belongs to.
+        :param short_path: The short path of the file.
+        :param flags: The flags the value has been determined with.
+        :param value: The value to log. Has to be picklable.
+        :param file_hash: The content hash of the file. Calculated if unset.
+        """
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        connection = self.connection
+        with connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO results (short_path, hash, flags, value) VALUES (?, ?, ?, ?)",
+                (short_path, file_hash or get_file_hash(path), flags, data)
+            )
+
+    def get_extraction(self, path: Path, short_path: str, file_hash: str | None = None) -> Path | None:
+        """
+        Retrieve the directory the given archive has been extracted to completely.
+
+        :param path: The archive to look up.
+        :param short_path: The short path of the archive.
+        :param file_hash: The content hash of the archive. Calculated if unset.
+        :return: The directory, `None` if there is no such entry or the directory does not exist anymore.
+        """
+        row = self.connection.execute(
+            "SELECT directory FROM extractions WHERE short_path = ? AND hash = ?", (short_path, file_hash or get_file_hash(path))
+        ).fetchone()
+        if row is None or not Path(row[0]).is_dir():
+            return None
+        return Path(row[0])
+
+    def add_extraction(self, path: Path, short_path: str, directory: Path, file_hash: str | None = None) -> None:
+        """
+        Log that the given archive has been extracted completely.
+
+        :param path: The archive which has been extracted.
+        :param short_path: The short path of the archive.
+        :param directory: The directory the archive has been extracted to.
+        :param file_hash: The content hash of the archive. Calculated if unset.
+        """
+        connection = self.connection
+        with connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO extractions (short_path, hash, directory) VALUES (?, ?, ?)",
+                (short_path, file_hash or get_file_hash(path), str(directory))
+            )
+
+    def clear(self) -> None:
+        """
+        Remove all entries.
+        """
+        connection = self.connection
+        with connection:
+            connection.execute("DELETE FROM results")
+            connection.execute("DELETE FROM extractions")
@@ -0,0 +1,270 @@
+# Copyright (c) stefan6419846. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+
+"""
+Extract the comments and docstrings of source files, where license notices and
+copyright statements usually are, using lightweight lexers.
+
+The lexers only distinguish between code, string literals, comments and docstrings.
+They do not validate the syntax and might misinterpret rare constructs like regular
+expression literals in JavaScript or raw strings in C++ and Rust.
+"""
+
+from __future__ import annotations
+
+import functools
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Generator, Iterable, Literal
+
+
+@dataclass(frozen=True)
+class StringSyntax:
+    """
+    Delimiter of a string literal.
+    """
+
+    delimiter: str
+    """
+    The delimiter at the beginning and at the end of the string.
+    """
+
+    multiline: bool = False
+    """
+    Whether the string can span multiple lines. Otherwise, unterminated strings end with the line.
+    """
+
+    escapes: bool = True
+    """
+    Whether a backslash escapes the following character.
+    """
+
+
+@dataclass(frozen=True)
+class Language:
+    """
+    Comment and string syntax of a programming language.
+    """
+
+    name: str
+    """
+    The name of the language.
+    """
+
+    line_comments: tuple[str, ...] = ()
+    """
+    The patterns starting a comment until the end of the line.
+    """
+
+    block_comments: tuple[tuple[str, str], ...] = ()
+    """
+    The delimiters at the beginning and at the end of block comments.
+    """
+
+    nested_block_comments: bool = False
+    """
+    Whether block comments can be nested.
+    """
+
+    strings: tuple[StringSyntax, ...] = ()
+    """
+    The string literals to skip.
+    """
+
+    docstrings: tuple[StringSyntax, ...] = ()
+    """
+    The string literals to keep, like Python docstrings.
+    """
+
+    skip_patterns: tuple[str, ...] = ()
+    """
+    Further patterns inside the code to skip, like character literals.
+    """
+
+    @functools.cached_property
+    def _tokens(self) -> list[tuple[Literal["line", "block", "string", "docstring", "skip"], str, tuple[str, str] | StringSyntax | None]]:
+        """
+        The kind, the pattern and the delimiters of all tokens which can start inside
+        the code. Longer delimiters are checked first.
+        """
+        tokens: list[tuple[Literal["line", "block", "string", "docstring", "skip"], str, tuple[str, str] | StringSyntax | None]] = []
+        for string in self.docstrings:
+            tokens.append(("docstring", re.escape(string.delimiter), string))
+        for string in sorted(self.strings, key=lambda value: len(value.delimiter), reverse=True):
+            tokens.append(("string", re.escape(string.delimiter), string))
+        for block in self.block_comments:
+            tokens.append(("block", re.escape(block[0]), block))
+        for pattern in self.line_comments:
+            tokens.append(("line", pattern, None))
+        for pattern in self.skip_patterns:
+            tokens.append(("skip", pattern, None))
+        return tokens
+
+    @functools.cached_property
+    def _pattern(self) -> re.Pattern[str]:
+        """
+        Pattern matching the start of any token.
+        """
+        return re.compile("|".join(f"(?P<t{index}>{pattern})" for index, (_, pattern, _) in enumerate(self._tokens)))
+
+
+PYTHON = Language(
+    name="Python",
+    line_comments=("#",),
+    strings=(StringSyntax('"'), StringSyntax("'")),
+    docstrings=(StringSyntax('"""', multiline=True), StringSyntax("'''", multiline=True)),
+)
+
+C = Language(
+    name="C/C++",
+    line_comments=("//",),
+    block_comments=(("/*", "*/"),),
+    strings=(StringSyntax('"'), StringSyntax("'")),
+)
+
+RUST = Language(
+    name="Rust",
+    line_comments=("//",),
+    block_comments=(("/*", "*/"),),
+    nested_block_comments=True,
+    strings=(StringSyntax('"', multiline=True),),
+    # Character literals, which cannot be told apart from lifetimes by the quote only.
+    skip_patterns=(r"'(?:\\[^']{1,10}|[^\\'])'",),
+)
+
+JAVASCRIPT = Language(
+    name="JavaScript",
+    line_comments=("//",),
+    block_comments=(("/*", "*/"),),
+    strings=(StringSyntax('"'), StringSyntax("'"), StringSyntax("`", multiline=True)),
+)
+
+JAVA = Language(
+    name="Java",
+    line_comments=("//",),
+    block_comments=(("/*", "*/"),),
+    strings=(StringSyntax('"""', multiline=True), StringSyntax('"'), StringSyntax("'")),
+)
+
+SHELL = Language(
+    name="Shell",
+    # Only at the beginning of a word, thus `$#` and `${#value}` are no comments.
+    line_comments=(r"(?<![^\s;|&()])#",),
+    strings=(StringSyntax('"', multiline=True), StringSyntax("'", multiline=True, escapes=False)),
+)
+
+LANGUAGES_BY_SUFFIX = {
+    **dict.fromkeys([".py", ".pyi", ".pyw"], PYTHON),
+    **dict.fromkeys([".c", ".h", ".cc", ".cpp", ".cxx", ".c++", ".hh", ".hpp", ".hxx", ".h++"], C),
+    ".rs": RUST,
+    **dict.fromkeys([".js", ".mjs", ".cjs", ".jsx", ".ts", ".mts", ".cts", ".tsx"], JAVASCRIPT),
+    ".java": JAVA,
+    **dict.fromkeys([".sh", ".bash", ".ksh", ".zsh"], SHELL),
+}
+"""
+Supported languages by their lowercase file suffix.
+"""
+
+
+def get_language(path: Path | str) -> Language | None:
+    """
+    Determine the language of the given file from its suffix.
+
+    :param path: The file to check.
+    :return: The language, `None` if it is not supported.
+    """
+    return LANGUAGES_BY_SUFFIX.get(Path(path).suffix.lower())
+
+
+def _find_string_end(line: str, position: int, string: StringSyntax) -> int | None:
+    """
+    Find the end of the string literal.
+
+    :param line: The line to search in.
+    :param position: The position to start at, inside the string.
+    :param string: The syntax of the string.
+    :return: The position after the closing delimiter, `None` if the string does not end in this line.
+    """
+    if not string.escapes:
+        index = line.find(string.delimiter, position)
+        return index + len(string.delimiter) if index >= 0 else None
+    while True:
+        index = line.find(string.delimiter, position)
+        if index < 0:
+            return None
+        backslash = line.find("\\", position, index)
+        if backslash < 0:
+            return index + len(string.delimiter)
+        # Skip the escaped character and continue after it.
+        position = backslash + 2
+
+
+def extract_comments(lines: Iterable[tuple[int, str]], language: Language) -> Generator[tuple[int, str], None, None]:
+    """
+    Extract the comments and docstrings from the given lines.
+
+    :param lines: The numbered lines of the source file.
+    :param language: The language of the source file.
+    :return: The comments and docstrings of each line containing any, with the original
+             line numbers. Comments sharing the line with code only contain the comment.
+             Lines without any comment are left out.
+    """
+    pattern = language._pattern
+    tokens = language._tokens
+    # Block comment, string or docstring which has not ended yet.
+    open_kind: Literal["block", "string", "docstring"] | None = None
+    open_syntax: tuple[str, str] | StringSyntax | None = None
+    depth = 0
+
+    for number, line in lines:
+        fragments: list[str] = []
+        position = 0
+        fragment_start = 0
+        length = len(line)
+        while position < length:
+            if open_kind is None:
+                match = pattern.search(line, position)
+                if match is None:
+                    break
+                kind, _, syntax = tokens[int(str(match.lastgroup)[1:])]
+                if kind == "line":
+                    fragments.append(line[match.start():])
+                    break
+                if kind != "skip":
+                    open_kind, open_syntax, depth = kind, syntax, 1
+                    fragment_start = match.start()
+                position = match.end()
+            elif isinstance(open_syntax, tuple):
+                start, end = open_syntax
+                end_index = line.find(end, position)
+                if language.nested_block_comments:
+                    start_index = line.find(start, position)
+                    if start_index >= 0 and (end_index < 0 or start_index < end_index):
+                        depth += 1
+                        position = start_index + len(start)
+                        continue
+                if end_index < 0:
+                    fragments.append(line[fragment_start:])
+                    break
+                position = end_index + len(end)
+                depth -= 1
+                if depth == 0:
+                    fragments.append(line[fragment_start:position])
+                    open_kind = None
+            else:
+                assert isinstance(open_syntax, StringSyntax)
+                end_position = _find_string_end(line, position, open_syntax)
+                if end_position is None:
+                    if open_kind == "docstring":
+                        fragments.append(line[fragment_start:])
+                    elif not open_syntax.multiline:
+                        open_kind = None
+                    break
+                if open_kind == "docstring":
+                    fragments.append(line[fragment_start:end_position])
+                open_kind = None
+                position = end_position
+        if fragments:
+            yield number, " ".join(fragment.rstrip("\r\n") for fragment in fragments) + "\n"
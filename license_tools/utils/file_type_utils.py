@@ -0,0 +1,105 @@
+# Copyright (c) stefan6419846. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+
+"""
+Determine the type of each file once and share it between all analysis steps.
+"""
+
+from __future__ import annotations
+
+import functools
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+from typecode import contenttype  # type: ignore[import-untyped]
+
+from license_tools.utils import archive_utils
+
+
+# libmagic handles are not thread-safe, but ScanCode shares one handle per flag set between
+# all threads. Archives are extracted in background threads while the files of the parent
+# directory are being classified, thus the calls of this module are serialized.
+_lock = threading.Lock()
+
+
+CACHE_SIZE = 4096
+"""
+Maximum number of file types to keep per process.
+"""
+
+
+@dataclass(frozen=True)
+class FileType:
+    """
+    Type of a single file, determined from its magic bytes and its name.
+    """
+
+    description: str
+    """
+    The file type as reported by libmagic.
+    """
+
+    mime_type: str
+    """
+    The MIME type as reported by libmagic.
+    """
+
+    is_archive: bool
+    """
+    Whether the file is an archive which can be extracted.
+    """
+
+    is_source: bool = False
+    """
+    Whether the file is recognized as source code, like a Python module or a C header.
+    """
+
+
+def get_file_type(path: Path) -> FileType:
+    """
+    Get the type of the given file.
+
+    The result is cached per process, based upon the path, the size and the modification
+    time, thus the different analysis steps for the same file only run libmagic once.
+
+    :param path: The file to check.
+    :return: The file type.
+    """
+    try:
+        stat = path.stat()
+    except OSError:
+        # Missing files and broken symlinks, for which libmagic does not report anything either.
+        return FileType(description="", mime_type="", is_archive=False)
+    return _get_file_type(location=os.path.abspath(path), size=stat.st_size, modification_time=stat.st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _get_file_type(location: str, size: int, modification_time: int) -> FileType:
+    """
+    Determine the type of the given file.
+
+    :param location: The absolute file path.
+    :param size: The file size. Only used for caching.
+    :param modification_time: The modification time. Only used for caching.
+    :return: The file type.
+    """
+    with _lock:
+        file_type = contenttype.get_type(location)
+        # Reuses the values already determined by libmagic.
+        is_archive = archive_utils.can_extract(archive_path=Path(location))
+        return FileType(
+            description=file_type.filetype_file or "",
+            mime_type=file_type.mimetype_file or "",
+            is_archive=bool(is_archive),
+            is_source=bool(file_type.is_source),
+        )
+
+
+def clear_cache() -> None:
+    """
+    Forget all file types cached by this module.
+    """
+    _get_file_type.cache_clear()
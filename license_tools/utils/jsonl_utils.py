@@ -0,0 +1,120 @@
+# Copyright (c) stefan6419846. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+
+"""
+Streaming JSON Lines output.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import gzip
+import json
+from pathlib import Path
+from typing import Any, BinaryIO, Generator, Iterable, Literal, Type, TypeVar
+
+
+_T = TypeVar("_T")
+
+COMPRESSION_TYPE = Literal["gzip", "zstd"]
+
+
+def to_json(value: Any) -> str:
+    """
+    Serialize the given value as a single line of JSON.
+
+    Dataclasses, including nested ones, are converted to objects and paths to strings.
+
+    :param value: The value to serialize.
+    :return: The JSON string without a trailing newline.
+    """
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        value = dataclasses.asdict(value)
+    return json.dumps(value, default=str, ensure_ascii=False, separators=(",", ":"))
+
+
+class JsonLinesWriter:
+    """
+    Write one JSON object per line, directly when each value is available.
+
+    Use it as a context manager or call :meth:`~close` to finish the file. Compressed
+    output requires closing the file to be complete.
+    """
+
+    def __init__(self, path: Path | str, compression: COMPRESSION_TYPE | None = None, flush_interval: int = 1) -> None:
+        """
+        :param path: The file to write to. Will be overwritten if it already exists.
+        :param compression: The compression to use. `zstd` requires the `zstandard` package.
+        :param flush_interval: Flush the output after this number of lines, thus readers
+                               can process them directly. Use 0 to only flush on closing.
+        """
+        if compression not in {None, "gzip", "zstd"}:
+            raise ValueError(f"Unsupported compression: {compression}")
+        self.path = Path(path)
+        self.compression = compression
+        self.flush_interval = flush_interval
+        self.count = 0
+        self._raw_file: BinaryIO | None = None
+        self._file: BinaryIO = self._open()
+
+    def _open(self) -> BinaryIO:
+        """
+        Open the output file.
+
+        :return: The stream to write the uncompressed data to.
+        """
+        if self.compression == "zstd":
+            import zstandard  # type: ignore[import-not-found,unused-ignore]
+
+            self._raw_file = open(self.path, mode="wb")
+            return zstandard.ZstdCompressor().stream_writer(self._raw_file)  # type: ignore[no-any-return]
+        if self.compression == "gzip":
+            return gzip.open(self.path, mode="wb")  # type: ignore[return-value]
+        return open(self.path, mode="wb")
+
+    def __enter__(self) -> JsonLinesWriter:
+        return self
+
+    def __exit__(self, type_: Type[BaseException] | None, value: BaseException | None, traceback: Any | None) -> None:
+        self.close()
+
+    def write(self, value: Any) -> None:
+        """
+        Write the given value as a new line.
+
+        :param value: The value to write. See :func:`~to_json` for the supported values.
+        """
+        self._file.write(to_json(value).encode("utf-8") + b"\n")
+        self.count += 1
+        if self.flush_interval and self.count % self.flush_interval == 0:
+            self.flush()
+
+    def write_each(self, values: Iterable[_T]) -> Generator[_T, None, None]:
+        """
+        Write each of the given values while passing them on.
+
+        :param values: The values to write.
+        :return: The unchanged values, each yielded after writing it.
+        """
+        for value in values:
+            self.write(value)
+            yield value
+
+    def flush(self) -> None:
+        """
+        Write the buffered data to the file, including the pending compressed data.
+        """
+        self._file.flush()
+        if self._raw_file is not None:
+            self._raw_file.flush()
+
+    def close(self) -> None:
+        """
+        Finish and close the file.
+        """
+        if self._file.closed:
+            return
+        self._file.close()
+        if self._raw_file is not None and not self._raw_file.closed:
+            self._raw_file.close()
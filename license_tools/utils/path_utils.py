@@ -44,6 +44,7 @@ class DirectoryWithFixedNameContext:
             directory: str | Path,
             fallback_to_random_if_exists: bool = True,
             delete_afterwards: bool = True,
+            reuse_existing: bool = False,
     ) -> None:
         """
         :param directory: The target directory to create temporarily.
@@ -51,13 +52,18 @@ class DirectoryWithFixedNameContext:
                                              already exists or whether to fall back to a
                                              random directory with the same parent in this case.
         :param delete_afterwards: Specify whether to delete the directory on exit.
+        :param reuse_existing: Specify whether to use the target directory if it already exists.
+                               Takes precedence over `fallback_to_random_if_exists`.
         """
         self.directory = Path(directory)
         self._consider_fallback = fallback_to_random_if_exists
         self._delete_afterwards = delete_afterwards
+        self._reuse_existing = reuse_existing
 
     def __enter__(self) -> Path:
         if self.directory.exists():
+            if self._reuse_existing:
+                return self.directory
             if not self._consider_fallback:
                 # Let `pathlib` handle the error reporting which contains more details.
                 self.directory.mkdir(parents=False, exist_ok=False)
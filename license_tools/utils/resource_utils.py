@@ -0,0 +1,241 @@
+# Copyright (c) stefan6419846. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+
+"""
+Determine the resources available to the analysis, respecting the limits of the
+control group (cgroup) of containers.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import os
+import time
+from pathlib import Path
+
+
+logger = logging.getLogger(__name__)
+del logging
+
+
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+"""
+Mount point of the control groups.
+"""
+
+DEFAULT_WORKER_MEMORY = 1536 * 1024 * 1024
+"""
+Expected peak memory usage of a single worker in bytes, dominated by the license index.
+Only used if the actual usage has not been measured, see :func:`license_tools.scanner.measure_worker_memory`.
+"""
+
+MEMORY_RESERVE = 512 * 1024 * 1024
+"""
+Memory in bytes to keep free for the main process and the archive extraction.
+"""
+
+_UNLIMITED_THRESHOLD = 2 ** 60
+"""
+cgroup v1 reports an unset memory limit as a value close to the maximum integer.
+"""
+
+
+def _read(path: Path) -> str | None:
+    """
+    Read the given control file.
+
+    :param path: The file to read.
+    :return: The stripped content, `None` if it is not available.
+    """
+    try:
+        return path.read_text().strip()
+    except OSError:
+        return None
+
+
+def get_cpu_limit(root: Path = CGROUP_ROOT) -> float | None:
+    """
+    Get the CPU quota of the current cgroup.
+
+    :param root: The mount point of the control groups.
+    :return: The number of CPUs the quota corresponds to, `None` if there is no quota.
+    """
+    # cgroup v2: `$QUOTA $PERIOD` or `max $PERIOD`.
+    value = _read(root / "cpu.max")
+    if value is not None:
+        quota, _, period = value.partition(" ")
+        if quota == "max" or not period:
+            return None
+        return int(quota) / int(period)
+    # cgroup v1: A quota of -1 means no limit.
+    quota_value = _read(root / "cpu" / "cpu.cfs_quota_us")
+    period_value = _read(root / "cpu" / "cpu.cfs_period_us")
+    if quota_value is None or period_value is None or int(quota_value) <= 0:
+        return None
+    return int(quota_value) / int(period_value)
+
+
+def get_memory_limit(root: Path = CGROUP_ROOT) -> int | None:
+    """
+    Get the memory limit of the current cgroup, falling back to the physical memory.
+
+    :param root: The mount point of the control groups.
+    :return: The limit in bytes, `None` if it cannot be determined.
+    """
+    value = _read(root / "memory.max")
+    if value is None:
+        value = _read(root / "memory" / "memory.limit_in_bytes")
+    if value is not None and value != "max" and int(value) < _UNLIMITED_THRESHOLD:
+        return int(value)
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, OSError, ValueError):
+        # Not available on Windows.
+        return None
+
+
+def get_memory_usage(root: Path = CGROUP_ROOT) -> int | None:
+    """
+    Get the current memory usage of the current cgroup.
+
+    :param root: The mount point of the control groups.
+    :return: The usage in bytes, `None` if it cannot be determined.
+    """
+    value = _read(root / "memory.current")
+    if value is None:
+        value = _read(root / "memory" / "memory.usage_in_bytes")
+    return int(value) if value is not None else None
+
+
+def get_cpu_count(root: Path = CGROUP_ROOT) -> int:
+    """
+    Get the number of CPUs the current process may use, respecting the CPU affinity
+    and the quota of the cgroup.
+
+    :param root: The mount point of the control groups.
+    :return: The number of CPUs. At least 1.
+    """
+    if hasattr(os, "sched_getaffinity"):
+        count = len(os.sched_getaffinity(0))
+    else:
+        count = os.cpu_count() or 1
+    limit = get_cpu_limit(root=root)
+    if limit is not None:
+        count = min(count, math.ceil(limit))
+    return max(1, count)
+
+
+def get_peak_memory() -> int | None:
+    """
+    Get the peak resident set size (RSS) of the current process.
+
+    :return: The peak RSS in bytes, `None` if it cannot be determined.
+    """
+    try:
+        import resource
+    except ImportError:
+        # Not available on Windows.
+        return None
+    # Linux reports kibibytes.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def get_auto_job_count(worker_memory: int | None = None, root: Path = CGROUP_ROOT) -> int:
+    """
+    Derive the number of parallel jobs from the available CPUs and memory.
+
+    :param worker_memory: The observed peak memory usage of a single worker in bytes.
+                          Falls back to :data:`DEFAULT_WORKER_MEMORY` if unset.
+    :param root: The mount point of the control groups.
+    :return: The number of jobs. At least 1.
+    """
+    if not worker_memory:
+        worker_memory = DEFAULT_WORKER_MEMORY
+    cpu_count = get_cpu_count(root=root)
+    memory_limit = get_memory_limit(root=root)
+    if memory_limit is None:
+        job_count = cpu_count
+    else:
+        job_count = max(1, min(cpu_count, (memory_limit - MEMORY_RESERVE) // worker_memory))
+    logger.info(
+        "Using %d jobs for %d CPUs, a memory limit of %s MiB and %d MiB per worker.",
+        job_count, cpu_count, memory_limit // 1024 // 1024 if memory_limit is not None else "unknown", worker_memory // 1024 // 1024,
+    )
+    return job_count
+
+
+class MemoryController:
+    """
+    Adjust the number of running tasks to the memory usage of the cgroup.
+
+    The `Scanner` uses this number as size of its worker pool as well, thus idle workers
+    do not keep their memory.
+
+    Reduces the number of tasks while the usage is above the upper threshold and increases
+    it again while the usage is below the lower threshold and there is enough memory left
+    for another worker, based upon the observed peak memory usage of the workers.
+    """
+
+    def __init__(
+        self,
+        maximum: int,
+        memory_limit: int | None = None,
+        lower_threshold: float = 0.7,
+        upper_threshold: float = 0.85,
+        interval: float = 1.0,
+        root: Path = CGROUP_ROOT,
+    ) -> None:
+        """
+        :param maximum: The maximum number of tasks to run in parallel.
+        :param memory_limit: The memory limit in bytes. Determined automatically if unset.
+        :param lower_threshold: Fraction of the limit below which to run more tasks.
+        :param upper_threshold: Fraction of the limit above which to run less tasks.
+        :param interval: The minimum number of seconds between two adjustments.
+        :param root: The mount point of the control groups.
+        """
+        self.maximum = maximum
+        self.job_count = maximum
+        self.memory_limit = memory_limit if memory_limit is not None else get_memory_limit(root=root)
+        self.lower_threshold = lower_threshold
+        self.upper_threshold = upper_threshold
+        self.interval = interval
+        self.root = root
+        self.worker_memory = 0
+        # The monotonic clock might start at the boot time, thus always evaluate the first call.
+        self._last_update = -math.inf
+
+    def add_worker_memory(self, value: int | None) -> None:
+        """
+        Record the peak memory usage reported by a worker.
+
+        :param value: The peak memory usage in bytes.
+        """
+        if value is not None:
+            self.worker_memory = max(self.worker_memory, value)
+
+    def update(self) -> int:
+        """
+        Adjust the number of tasks to the current memory usage.
+
+        :return: The number of tasks to run in parallel.
+        """
+        now = time.monotonic()
+        if now - self._last_update < self.interval:
+            return self.job_count
+        self._last_update = now
+        usage = get_memory_usage(root=self.root)
+        if usage is None or not self.memory_limit:
+            return self.job_count
+        ratio = usage / self.memory_limit
+        if ratio > self.upper_threshold and self.job_count > 1:
+            self.job_count -= 1
+            logger.info("Memory usage at %d %%, reducing the parallel tasks to %d.", ratio * 100, self.job_count)
+        elif (
+            ratio < self.lower_threshold and self.job_count < self.maximum
+            and usage + self.worker_memory < self.memory_limit * self.upper_threshold
+        ):
+            self.job_count += 1
+            logger.info("Memory usage at %d %%, increasing the parallel tasks to %d.", ratio * 100, self.job_count)
+        return self.job_count
@@ -0,0 +1,360 @@
+# Copyright (c) stefan6419846. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+
+"""
+Read bulk license metadata, which declares the license and the copyright of many files
+at once using glob patterns:
+
+* `REUSE.toml` files, see https://reuse.software/spec-3.3/#reusetoml.
+* `.reuse/dep5` files of older REUSE versions.
+* Machine-readable `debian/copyright` files, see https://www.debian.org/doc/packaging-manuals/copyright-format/1.0/.
+
+The license expressions are kept as declared. Debian copyright files might use license
+names which are no SPDX identifiers.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Generator, Iterable, Literal
+
+import tomli
+
+
+logger = logging.getLogger(__name__)
+del logging
+
+
+PRECEDENCE_TYPE = Literal["closest", "aggregate", "override"]
+
+PRECEDENCES = ("closest", "aggregate", "override")
+
+DEP5_FORMAT_PREFIX = "://www.debian.org/doc/packaging-manuals/copyright-format/"
+"""
+Part of the `Format` URL which marks machine-readable Debian copyright files.
+"""
+
+
+@dataclass(frozen=True)
+class LicenseDeclaration:
+    """
+    License and copyright declared for a file by bulk license metadata.
+    """
+
+    license_expression: str | None
+    """
+    The declared license expression, `None` if the metadata only declares the copyright.
+    """
+
+    copyrights: tuple[str, ...] = ()
+    """
+    The declared copyright statements.
+    """
+
+    precedence: PRECEDENCE_TYPE = "closest"
+    """
+    How the declaration relates to the information inside the file. With `override`, the
+    file itself should not be considered at all.
+    """
+
+    source: str = ""
+    """
+    The short path of the metadata file.
+    """
+
+
+@dataclass(frozen=True)
+class _Rule:
+    """
+    Declaration for all files matching one of the patterns.
+    """
+
+    patterns: tuple[re.Pattern[str], ...]
+    declaration: LicenseDeclaration
+
+
+def _compile_pattern(pattern: str, star_matches_slash: bool) -> re.Pattern[str]:
+    """
+    Convert the given glob pattern to a regular expression.
+
+    :param pattern: The pattern, relative to the directory of the metadata. A backslash
+                    escapes the following character.
+    :param star_matches_slash: Whether a single `*` matches directory separators as well.
+                               Otherwise, only `**` does.
+    :return: The compiled expression, which has to match the complete relative path.
+    """
+    parts = []
+    index = 0
+    while index < len(pattern):
+        character = pattern[index]
+        if character == "\\" and index + 1 < len(pattern):
+            parts.append(re.escape(pattern[index + 1]))
+            index += 2
+            continue
+        if character == "*":
+            if pattern.startswith("**", index):
+                parts.append(".*")
+                index += 2
+                continue
+            parts.append(".*" if star_matches_slash else "[^/]*")
+        elif character == "?" and star_matches_slash:
+            parts.append(".")
+        else:
+            parts.append(re.escape(character))
+        index += 1
+    return re.compile("".join(parts), flags=re.DOTALL)
+
+
+class BulkLicenses:
+    """
+    Rules of a single metadata file, applying to the files below its base directory.
+    """
+
+    def __init__(self, base_directory: Path, rules: Iterable[_Rule]) -> None:
+        """
+        :param base_directory: The directory the patterns are relative to.
+        :param rules: The rules, of which the last matching one applies.
+        """
+        self.base_directory = base_directory
+        self.rules = list(rules)
+
+    def get(self, path: Path, precedence: PRECEDENCE_TYPE | None = None) -> LicenseDeclaration | None:
+        """
+        Get the declaration for the given file.
+
+        :param path: The file to get the declaration for.
+        :param precedence: Only consider the rules with the given precedence.
+        :return: The declaration of the last matching rule, `None` if the file is not covered.
+        """
+        if not path.is_relative_to(self.base_directory):
+            return None
+        relative_path = path.relative_to(self.base_directory).as_posix()
+        for rule in reversed(self.rules):
+            if precedence is not None and rule.declaration.precedence != precedence:
+                continue
+            if any(pattern.fullmatch(relative_path) for pattern in rule.patterns):
+                return rule.declaration
+        return None
+
+    @classmethod
+    def from_reuse_toml(cls, text: str, base_directory: Path, source: str = "REUSE.toml") -> BulkLicenses:
+        """
+        Parse the given `REUSE.toml` file.
+
+        :param text: The content of the file.
+        :param base_directory: The directory of the file.
+        :param source: The short path of the file.
+        :return: The rules of the `annotations` tables.
+        """
+        data = tomli.loads(text)
+        if data.get("version") != 1:
+            raise ValueError(f"Unsupported REUSE.toml version: {data.get('version')}")
+        rules = []
+        for annotation in data.get("annotations", []):
+            paths = _as_tuple(annotation["path"])
+            precedence = annotation.get("precedence", "closest")
+            if precedence not in PRECEDENCES:
+                raise ValueError(f"Unsupported REUSE.toml precedence: {precedence}")
+            expressions = _as_tuple(annotation.get("SPDX-License-Identifier", ()))
+            rules.append(
+                _Rule(
+                    patterns=tuple(_compile_pattern(pattern, star_matches_slash=False) for pattern in paths),
+                    declaration=LicenseDeclaration(
+                        license_expression=_combine(expressions),
+                        copyrights=_as_tuple(annotation.get("SPDX-FileCopyrightText", ())),
+                        precedence=precedence,
+                        source=source,
+                    ),
+                )
+            )
+        return cls(base_directory=base_directory, rules=rules)
+
+    @classmethod
+    def from_dep5(cls, text: str, base_directory: Path, source: str = "debian/copyright") -> BulkLicenses:
+        """
+        Parse the given machine-readable Debian copyright file, as used for `.reuse/dep5` as well.
+
+        :param text: The content of the file.
+        :param base_directory: The directory the `Files` patterns are relative to.
+        :param source: The short path of the file.
+        :return: The rules of the `Files` paragraphs.
+        """
+        paragraphs = list(_parse_dep5_paragraphs(text))
+        if not paragraphs or DEP5_FORMAT_PREFIX not in paragraphs[0].get("format", ""):
+            raise ValueError("Not a machine-readable Debian copyright file.")
+        rules = []
+        for paragraph in paragraphs[1:]:
+            if "files" not in paragraph:
+                # Stand-alone license paragraph with the license text.
+                continue
+            license_value = paragraph.get("license", "")
+            copyright_value = paragraph.get("copyright", "")
+            rules.append(
+                _Rule(
+                    patterns=tuple(_compile_pattern(pattern, star_matches_slash=True) for pattern in paragraph["files"].split()),
+                    declaration=LicenseDeclaration(
+                        license_expression=_normalize_dep5_expression(license_value.split("\n", maxsplit=1)[0]) or None,
+                        copyrights=tuple(line.strip() for line in copyright_value.splitlines() if line.strip()),
+                        precedence="aggregate",
+                        source=source,
+                    ),
+                )
+            )
+        return cls(base_directory=base_directory, rules=rules)
+
+
+def _as_tuple(value: str | list[str] | tuple[str, ...]) -> tuple[str, ...]:
+    """
+    Convert the given TOML value, which might be a single string or a list, to a tuple.
+
+    :param value: The value to convert.
+    :return: The values as tuple.
+    """
+    if isinstance(value, str):
+        return (value,)
+    return tuple(value)
+
+
+def _combine(expressions: tuple[str, ...]) -> str | None:
+    """
+    Combine the given license expressions, which all apply.
+
+    :param expressions: The expressions to combine.
+    :return: The combined expression, `None` if there are no expressions.
+    """
+    if not expressions:
+        return None
+    if len(expressions) == 1:
+        return expressions[0]
+    return " AND ".join(f"({expression})" if " " in expression else expression for expression in expressions)
+
+
+def _normalize_dep5_expression(value: str) -> str:
+    """
+    Convert the lowercase operators of Debian license expressions to the SPDX ones.
+    Commas separate alternatives with lower precedence and are kept.
+
+    :param value: The first line of the `License` field.
+    :return: The normalized expression.
+    """
+    return re.sub(r"\s+(and|or|with)\s+", lambda match: f" {match.group(1).upper()} ", value.strip(), flags=re.IGNORECASE)
+
+
+def _parse_dep5_paragraphs(text: str) -> Generator[dict[str, Any], None, None]:
+    """
+    Split the given Debian control file into paragraphs.
+
+    :param text: The content of the file.
+    :return: The fields of each paragraph, with the lowercase field names as keys.
+             Continuation lines are joined with newlines, lines only consisting of a
+             dot are empty lines.
+    """
+    paragraph: dict[str, str] = {}
+    name = None
+    for line in text.splitlines():
+        if not line.strip():
+            if paragraph:
+                yield paragraph
+            paragraph = {}
+            name = None
+        elif line.startswith("#"):
+            continue
+        elif line[0] in " \t":
+            if name is None:
+                raise ValueError(f"Continuation line without field: {line!r}")
+            value = line.strip()
+            paragraph[name] += "\n" + ("" if value == "." else value)
+        else:
+            name, _, value = line.partition(":")
+            name = name.strip().lower()
+            paragraph[name] = value.strip()
+    if paragraph:
+        yield paragraph
+
+
+def is_metadata_file(path: Path, directory: Path) -> bool:
+    """
+    Check whether the given file is bulk license metadata.
+
+    :param path: The file to check.
+    :param directory: The directory which is being analyzed.
+    :return: True for `REUSE.toml`, `.reuse/dep5` and `debian/copyright` files, False otherwise.
+    """
+    parts = path.relative_to(directory).parts if path.is_relative_to(directory) else path.parts
+    return parts[-1:] == ("REUSE.toml",) or parts[-2:] in {(".reuse", "dep5"), ("debian", "copyright")}
+
+
+def load_metadata_file(path: Path, short_path: str) -> BulkLicenses | None:
+    """
+    Load the given metadata file.
+
+    :param path: The file to load, see :func:`~is_metadata_file`.
+    :param short_path: The short path to use for display.
+    :return: The rules, `None` if the file could not be parsed, for example because it
+             is a Debian copyright file which is not machine-readable.
+    """
+    try:
+        text = path.read_text(encoding="utf-8")
+        if path.name == "REUSE.toml":
+            return BulkLicenses.from_reuse_toml(text=text, base_directory=path.parent, source=short_path)
+        return BulkLicenses.from_dep5(text=text, base_directory=path.parent.parent, source=short_path)
+    except (OSError, ValueError, KeyError, TypeError) as exception:
+        logger.warning("Ignoring license metadata of %s: %s", short_path, exception)
+        return None
+
+
+class LicenseMetadata:
+    """
+    All bulk license metadata of a directory. Metadata of nested directories takes
+    precedence for the files below them if it covers them, unless an outer declaration
+    has the `override` precedence.
+    """
+
+    def __init__(self, metadata: Iterable[BulkLicenses]) -> None:
+        """
+        :param metadata: The rules of each metadata file.
+        """
+        # Start with the deepest base directory.
+        self.metadata = sorted(metadata, key=lambda value: len(value.base_directory.parts), reverse=True)
+
+    def __bool__(self) -> bool:
+        return bool(self.metadata)
+
+    def get(self, path: Path) -> LicenseDeclaration | None:
+        """
+        Get the declaration for the given file.
+
+        :param path: The file to get the declaration for.
+        :return: The overriding declaration of the outermost metadata file, otherwise the
+                 declaration of the closest metadata file covering the file. `None` if
+                 there is none.
+        """
+        for metadata in reversed(self.metadata):
+            declaration = metadata.get(path, precedence="override")
+            if declaration is not None:
+                return declaration
+        for metadata in self.metadata:
+            declaration = metadata.get(path)
+            if declaration is not None:
+                return declaration
+        return None
+
+    @classmethod
+    def from_files(cls, files: Iterable[tuple[Path, str]], directory: Path) -> LicenseMetadata:
+        """
+        Load the metadata from the given files of a directory.
+
+        :param files: The paths and short paths of all files of the directory.
+        :param directory: The directory which is being analyzed.
+        :return: The metadata of the files which are metadata files.
+        """
+        metadata = (
+            load_metadata_file(path=path, short_path=short_path)
+            for path, short_path in files
+            if is_metadata_file(path=path, directory=directory)
+        )
+        return cls(value for value in metadata if value is not None)
@@ -0,0 +1,157 @@
+# Copyright (c) stefan6419846. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+import threading
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import mock, TestCase
+
+from license_tools import distributed, retrieval
+from license_tools.distributed import Coordinator, DistributedScanner
+from license_tools.utils.cache_utils import ResultCache
+
+
+AUTHKEY = b"secret"
+
+
+def _get_pid(value: int) -> tuple[int, int]:
+    return value, os.getpid()
+
+
+def _get_thread(value: int) -> tuple[int, str]:
+    return value, threading.current_thread().name
+
+
+def _fail(value: int) -> None:
+    raise ValueError(f"Invalid value {value}")
+
+
+def _start_worker_threads(address: distributed.ADDRESS_TYPE, count: int) -> list[threading.Thread]:
+    threads = [
+        threading.Thread(target=distributed.run_worker, kwargs=dict(address=address, authkey=AUTHKEY), name=f"worker-{index}")
+        for index in range(count)
+    ]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+class ParseAddressTestCase(TestCase):
+    def test_parse_address(self) -> None:
+        self.assertEqual(("localhost", 8000), distributed.parse_address("localhost:8000"))
+        self.assertEqual(("10.0.0.1", 0), distributed.parse_address("10.0.0.1:0"))
+        self.assertEqual(("::1", 8000), distributed.parse_address("[::1]:8000"))
+        self.assertEqual("/tmp/license_tools.sock", distributed.parse_address("/tmp/license_tools.sock"))
+        self.assertEqual("/tmp/a:b.sock", distributed.parse_address("/tmp/a:b.sock"))
+
+
+class GetAuthkeyTestCase(TestCase):
+    def test_get_authkey(self) -> None:
+        self.assertEqual(b"key", distributed.get_authkey("key"))
+        with mock.patch.dict(os.environ, {"LICENSE_TOOLS_AUTHKEY": "other"}):
+            self.assertEqual(b"other", distributed.get_authkey())
+        with mock.patch.dict(os.environ, {"LICENSE_TOOLS_AUTHKEY": ""}):
+            with self.assertRaisesRegex(expected_exception=ValueError, expected_regex=r"^No authentication key set\."):
+                distributed.get_authkey()
+
+
+class CoordinatorTestCase(TestCase):
+    def test_tcp__multiple_workers(self) -> None:
+        coordinator = Coordinator(address=("127.0.0.1", 0), authkey=AUTHKEY)
+        threads = _start_worker_threads(address=coordinator.address, count=2)
+        try:
+            futures = [coordinator.submit(_get_thread, value) for value in range(20)]
+            results = [future.result(timeout=30) for future in futures]
+            failure = coordinator.submit(_fail, 42)
+            with self.assertRaisesRegex(expected_exception=ValueError, expected_regex=r"^Invalid value 42$"):
+                failure.result(timeout=30)
+        finally:
+            coordinator.shutdown()
+        for thread in threads:
+            thread.join(timeout=30)
+            self.assertFalse(thread.is_alive())
+
+        self.assertEqual(list(range(20)), [value for value, _ in results])
+        self.assertTrue({name for _, name in results}.issubset({"worker-0", "worker-1"}))
+        with self.assertRaisesRegex(expected_exception=RuntimeError, expected_regex=r"after shutdown$"):
+            coordinator.submit(_get_thread, 1)
+
+    def test_invalid_authkey(self) -> None:
+        coordinator = Coordinator(address=("127.0.0.1", 0), authkey=AUTHKEY)
+        try:
+            with self.assertRaises(multiprocessing.AuthenticationError):
+                distributed.run_worker(address=coordinator.address, authkey=b"invalid", timeout=0)
+        finally:
+            coordinator.shutdown()
+        self.assertEqual(0, coordinator.worker_count)
+
+    def test_lost_worker(self) -> None:
+        coordinator = Coordinator(address=("127.0.0.1", 0), authkey=AUTHKEY)
+        try:
+            # Disconnect without sending a result.
+            connection = distributed._connect(address=coordinator.address, authkey=AUTHKEY, timeout=0)
+            future = coordinator.submit(_get_thread, 1)
+            connection.recv()
+            with self.assertLogs(distributed.logger, level="WARNING") as logs:
+                connection.close()
+                _start_worker_threads(address=coordinator.address, count=1)
+                self.assertEqual((1, "worker-0"), future.result(timeout=30))
+        finally:
+            coordinator.shutdown()
+        self.assertIn("Lost worker connection, sending the task to another worker", logs.output[0])
+
+
+class RunWorkersTestCase(TestCase):
+    def test_processes__unix_socket(self) -> None:
+        with TemporaryDirectory() as tempdir:
+            address = str(Path(tempdir) / "coordinator.sock")
+            with DistributedScanner(address=address, authkey=AUTHKEY, job_count=2) as scanner:
+                # Listen before starting the workers.
+                self.assertEqual(address, scanner.executor.address)  # type: ignore[attr-defined]
+                workers = threading.Thread(
+                    target=distributed.run_workers, kwargs=dict(address=address, authkey=AUTHKEY, job_count=2, preload_index=False)
+                )
+                workers.start()
+                results = list(scanner.map(_get_pid, [dict(value=value) for value in range(10)]))
+            workers.join(timeout=60)
+            self.assertFalse(workers.is_alive())
+
+        self.assertEqual(list(range(10)), [value for value, _ in results])
+        self.assertNotIn(os.getpid(), {pid for _, pid in results})
+
+
+class DistributedScannerTestCase(TestCase):
+    def test_run_on_directory(self) -> None:
+        with TemporaryDirectory() as tempdir:
+            directory = Path(tempdir) / "source"
+            directory.mkdir()
+            directory.joinpath("LICENSE").write_text("Apache-2.0")
+            directory.joinpath("README").write_text("CC-BY-2.0")
+
+            # Run a single worker inside the current process, as each worker process would load its own copy of the license index.
+            with DistributedScanner(address=("127.0.0.1", 0), authkey=AUTHKEY, job_count=2) as scanner:
+                threads = _start_worker_threads(address=scanner.executor.address, count=1)  # type: ignore[attr-defined]
+                results = list(retrieval.run_on_directory(str(directory), scanner=scanner))
+            threads[0].join(timeout=30)
+
+            self.assertEqual(["LICENSE", "README"], [result.short_path for result in results])
+            self.assertEqual([directory / "LICENSE", directory / "README"], [result.path for result in results])
+            self.assertEqual(
+                ["Apache-2.0", "CC-BY-2.0"],
+                [result.licenses.detected_license_expression_spdx for result in results if result.licenses]
+            )
+
+    def test_unsupported_cache(self) -> None:
+        with TemporaryDirectory() as tempdir:
+            Path(tempdir, "LICENSE").write_text("Apache-2.0")
+            cache = ResultCache(directory=Path(tempdir) / "cache")
+            scanner = DistributedScanner(address=("127.0.0.1", 0), authkey=AUTHKEY)
+            with self.assertRaisesRegex(expected_exception=ValueError, expected_regex=r"^Remote workers do not support the cache"):
+                list(retrieval._run_on_files(files=[(Path(tempdir, "LICENSE"), "LICENSE")], cache=cache, scanner=scanner))
+            cache.close()
+            scanner.close()
@@ -12,7 +12,7 @@ from pathlib import Path
 from tempfile import TemporaryDirectory
 from unittest import TestCase
 
-from license_tools.__main__ import log_level_type
+from license_tools.__main__ import job_count_type, log_level_type
 from license_tools.utils.path_utils import get_files_from_directory
 from tests.data import TYPING_EXTENSION_4_8_0__EXPECTED_OUTPUT
 
@@ -44,6 +44,15 @@ checksum = "bef38d45163c2f1dde094a7dfd33ccf595c92905c8f8f4fdc18d06fb1037718a"
 EXAMPLE_CARGO_LOCK_FILE__ONE_PACKAGE_ONLY = "".join(EXAMPLE_CARGO_LOCK_FILE.splitlines(keepends=True)[:10])
 
 
+class JobCountTypeTestCase(TestCase):
+    def test_job_count_type(self) -> None:
+        self.assertEqual(8, job_count_type("8"))
+        self.assertEqual("auto", job_count_type("auto"))
+        for value in ["0", "-1", "many"]:
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                job_count_type(value)
+
+
 class LogLevelTypeTestCase(TestCase):
     def test_constant_name(self) -> None:
         self.assertEqual(40, log_level_type("error"))
@@ -81,6 +90,15 @@ class MainTestCase(TestCase):
         self.assertEqual(b"", result.stderr)
         self.assertEqual(TYPING_EXTENSION_4_8_0__EXPECTED_OUTPUT, result.stdout.decode("UTF-8"))
 
+    def test_resume_without_journal(self) -> None:
+        result = subprocess.run(
+            [sys.executable, "-m", "license_tools", "--directory", ".", "--resume"],
+            capture_output=True, env=self.custom_env
+        )
+        self.assertEqual(2, result.returncode, result)
+        self.assertEqual(b"", result.stdout)
+        self.assertTrue(result.stderr.endswith(b"error: --resume requires --journal.\n"), result.stderr)
+
     def test_cargo_lock_download(self) -> None:
         time.sleep(1)
         with TemporaryDirectory() as target_directory, TemporaryDirectory() as source_directory:
@@ -0,0 +1,144 @@
+# Copyright (c) stefan6419846. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+
+from __future__ import annotations
+
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Any
+from unittest import TestCase
+
+from license_tools import policy
+from license_tools.policy import PolicyDecision, PolicyRule, ScanPolicy
+from license_tools.tools.scancode_tools import TextWindow
+from tests.data import SETUP_PATH
+
+
+class IsMinifiedOrGeneratedTestCase(TestCase):
+    def test_is_minified_or_generated(self) -> None:
+        with TemporaryDirectory() as tempdir:
+            directory = Path(tempdir)
+            for name, content, expected in [
+                ("regular.js", b"function a() {\n    return 1;\n}\n" * 200, False),
+                ("bundle.min.js", b"function a(){return 1}\n", True),
+                ("bundle.js", b"function a(){return 1;}" * 1000, True),
+                ("generated.py", b"# Code generated by protoc. DO NOT EDIT.\nx = 1\n", True),
+                ("binary.js", b"\0" * 10000, False),
+            ]:
+                with self.subTest(name=name):
+                    path = directory / name
+                    path.write_bytes(content)
+                    self.assertEqual(expected, policy.is_minified_or_generated(path))
+            self.assertFalse(policy.is_minified_or_generated(directory / "missing.js"))
+
+
+class ScanPolicyTestCase(TestCase):
+    def test_default(self) -> None:
+        scan_policy = ScanPolicy()
+        with TemporaryDirectory() as tempdir:
+            directory = Path(tempdir)
+            directory.joinpath("module.pyc").write_bytes(b"\x00\x01")
+            directory.joinpath("poetry.lock").write_text("[[package]]\n")
+            directory.joinpath("data.csv").write_text("a,b\n" * 300_000)
+            directory.joinpath("small.csv").write_text("a,b\n")
+            directory.joinpath("app.min.js").write_text("function a(){return 1}\n")
+            directory.joinpath("image.svg").write_text('<svg xmlns="http://www.w3.org/2000/svg"></svg>\n')
+
+            self.assertEqual(PolicyDecision(action="skip", reason="Compiled Python bytecode"), scan_policy.decide(directory / "module.pyc"))
+            self.assertEqual(PolicyDecision(action="skip", reason="Lock file"), scan_policy.decide(directory / "poetry.lock"))
+            self.assertEqual(PolicyDecision(action="header", reason="Large data file"), scan_policy.decide(directory / "data.csv"))
+            self.assertEqual(PolicyDecision(action="full"), scan_policy.decide(directory / "small.csv"))
+            self.assertEqual(PolicyDecision(action="header", reason="Minified or generated file"), scan_policy.decide(directory / "app.min.js"))
+            self.assertEqual(PolicyDecision(action="full", reason="Vector graphics"), scan_policy.decide(directory / "image.svg"))
+            self.assertEqual(PolicyDecision(action="full"), scan_policy.decide(SETUP_PATH))
+
+    def test_from_dict(self) -> None:
+        scan_policy = ScanPolicy.from_dict(
+            {
+                "header_line_count": 20,
+                "footer_line_count": 5,
+                "comments_only": True,
+                "spdx_fast_path": True,
+                "reuse_metadata": True,
+                "rule": [
+                    {"action": "skip", "reason": "Test data", "names": ["test_*.json"], "minimum_size": 10},
+                    {"action": "metadata", "reason": "Text", "mime_types": ["text/"]},
+                ],
+            }
+        )
+        self.assertEqual(TextWindow(line_count=20, size=policy.DEFAULT_HEADER_SIZE, tail_line_count=5), scan_policy.header_window)
+        self.assertTrue(scan_policy.comments_only)
+        self.assertEqual((True, False), (scan_policy.spdx_fast_path, scan_policy.verify_spdx_tags))
+        self.assertEqual((True, False), (scan_policy.reuse_metadata, scan_policy.trust_reuse_metadata))
+        self.assertEqual(
+            (
+                PolicyRule(action="skip", reason="Test data", names=("test_*.json",), minimum_size=10),
+                PolicyRule(action="metadata", reason="Text", mime_types=("text/",)),
+            ),
+            scan_policy.rules,
+        )
+        with TemporaryDirectory() as tempdir:
+            directory = Path(tempdir)
+            directory.joinpath("test_large.json").write_text('{"key": "value"}\n')
+            directory.joinpath("test_small.json").write_text("{}\n")
+            directory.joinpath("notes.txt").write_text("Some notes.\n")
+            self.assertEqual("skip", scan_policy.decide(directory / "test_large.json").action)
+            self.assertEqual("full", scan_policy.decide(directory / "test_small.json").action)
+            self.assertEqual("metadata", scan_policy.decide(directory / "notes.txt").action)
+
+    def test_from_dict__invalid(self) -> None:
+        cases: list[tuple[dict[str, Any], str]] = [
+            ({"rules": []}, r"^Unknown policy keys: rules$"),
+            ({"rule": [{"action": "skip", "reason": "Test", "extension": ".txt"}]}, r"^Unknown policy rule keys: extension$"),
+            ({"rule": [{"action": "ignore", "reason": "Test"}]}, r"^Unsupported policy action: ignore$"),
+        ]
+        for data, message in cases:
+            with self.subTest(data=data):
+                with self.assertRaisesRegex(expected_exception=ValueError, expected_regex=message):
+                    ScanPolicy.from_dict(data)
+
+    def test_load_policy(self) -> None:
+        self.assertEqual(ScanPolicy(), policy.load_policy("default"))
+        with TemporaryDirectory() as tempdir:
+            path = Path(tempdir) / "policy.toml"
+            path.write_text('[[rule]]\naction = "skip"\nreason = "Images"\nsuffixes = [".png", ".JPG"]\n')
+            scan_policy = policy.load_policy(str(path))
+            self.assertEqual((PolicyRule(action="skip", reason="Images", suffixes=(".png", ".JPG")),), scan_policy.rules)
+            self.assertEqual(policy.DEFAULT_HEADER_WINDOW, scan_policy.header_window)
+            self.assertFalse(scan_policy.comments_only)
+            self.assertEqual("skip", scan_policy.decide(Path(tempdir) / "photo.jpg").action)
+
+    def test_with_comments_only(self) -> None:
+        scan_policy = ScanPolicy().with_comments_only()
+        self.assertEqual(ScanPolicy(comments_only=True), scan_policy)
+        self.assertFalse(ScanPolicy().comments_only)
+
+    def test_with_spdx_fast_path(self) -> None:
+        self.assertEqual(ScanPolicy(spdx_fast_path=True), ScanPolicy().with_spdx_fast_path())
+        self.assertEqual(ScanPolicy(spdx_fast_path=True, verify_spdx_tags=True), ScanPolicy().with_spdx_fast_path(verify=True))
+
+    def test_with_reuse_metadata(self) -> None:
+        self.assertEqual(ScanPolicy(reuse_metadata=True), ScanPolicy().with_reuse_metadata())
+        self.assertEqual(ScanPolicy(reuse_metadata=True, trust_reuse_metadata=True), ScanPolicy().with_reuse_metadata(trust=True))
+
+    def test_with_source_code_headers(self) -> None:
+        scan_policy = ScanPolicy().with_source_code_headers()
+        self.assertEqual((*policy.DEFAULT_RULES, policy.SOURCE_CODE_HEADER_RULE), scan_policy.rules)
+        with TemporaryDirectory() as tempdir:
+            directory = Path(tempdir)
+            directory.joinpath("README.txt").write_text("Some text.\n")
+            directory.joinpath("module.pyc").write_bytes(b"\x00\x01")
+            self.assertEqual(PolicyDecision(action="header", reason="Source file"), scan_policy.decide(SETUP_PATH))
+            self.assertEqual(PolicyDecision(action="full"), scan_policy.decide(directory / "README.txt"))
+            # The existing rules take precedence.
+            self.assertEqual("skip", scan_policy.decide(directory / "module.pyc").action)
+
+    def test_with_header_window(self) -> None:
+        scan_policy = ScanPolicy()
+        self.assertEqual(scan_policy, scan_policy.with_header_window())
+        self.assertEqual(
+            TextWindow(line_count=10, size=policy.DEFAULT_HEADER_SIZE, tail_line_count=3),
+            scan_policy.with_header_window(line_count=10, tail_line_count=3).header_window,
+        )
+        self.assertEqual(policy.DEFAULT_HEADER_WINDOW, scan_policy.header_window)
@@ -5,19 +5,31 @@
 from __future__ import annotations
 
 import copy
+import gzip
+import json
 import os
 import re
+import shutil
 import tarfile
+import threading
+import zipfile
 from contextlib import contextmanager, redirect_stdout
 from io import StringIO
 from pathlib import Path
 from tempfile import NamedTemporaryFile, TemporaryDirectory
-from typing import Any, cast, Generator
+from typing import Any, BinaryIO, cast, Generator, Iterator
 from unittest import mock, TestCase
 
+from joblib import Parallel  # type: ignore[import-untyped]
+
 from license_tools import retrieval
+from license_tools.policy import PolicyRule, ScanPolicy
 from license_tools.retrieval import RetrievalFlags
-from license_tools.tools.scancode_tools import FileResults, LicenseDetection, LicenseMatch, Licenses
+from license_tools.scanner import Scanner
+from license_tools.tools import linking_tools, pip_tools
+from license_tools.tools.scancode_tools import FileResults, LicenseDetection, LicenseMatch, Licenses, TextWindow
+from license_tools.utils import archive_utils, cache_utils
+from license_tools.utils.cache_utils import Journal, Manifest, ResultCache
 from license_tools.utils.path_utils import get_files_from_directory
 from tests import Download, get_from_url
 from tests.data import (
@@ -34,6 +46,23 @@ from tests.data import (
 )
 
 
+# Replacements for `retrieval.run_on_file`, ignoring the other arguments.
+def _get_path(path: Path, short_path: str, **kwargs: Any) -> Path:
+    return path
+
+
+def _get_short_path(path: Path, short_path: str, **kwargs: Any) -> str:
+    return short_path
+
+
+def _get_path_and_short_path(path: Path, short_path: str, **kwargs: Any) -> tuple[Path, str]:
+    return path, short_path
+
+
+def _get_file_results(path: Path, short_path: str, **kwargs: Any) -> FileResults:
+    return FileResults(path=path, short_path=short_path)
+
+
 class RetrievalFlagsTestCase(TestCase):
     def test_to_int(self) -> None:
         self.assertEqual(0, RetrievalFlags.to_int())
@@ -100,12 +129,18 @@ class RunOnFileTestCase(TestCase):
         self,
         flags: int,
         mock_target: str,
-        return_value: str | None = "",
-    ) -> tuple[mock.Mock, mock.Mock, str]:
+        return_value: Any = "",
+    ) -> tuple[mock.Mock, mock.Mock, str, Any]:
         stdout = StringIO()
 
         class DummyFileResult:
             licenses = None
+            short_path = "setup.py"
+            cargo_metadata = None
+            linking_data = None
+            font_data = None
+            image_metadata = None
+            python_metadata = None
 
             def __init__(self, *args: Any, **kwargs: Any) -> None:
                 pass
@@ -120,11 +155,11 @@ class RunOnFileTestCase(TestCase):
                 path=SETUP_PATH, short_path="setup.py", retrieval_flags=flags
             )
             self.assertEqual(file_result, result)
-        return results_mock, check_mock, stdout.getvalue()
+        return results_mock, check_mock, stdout.getvalue(), result
 
     def test_run_on_file__ldd_handling(self) -> None:
         # 1) LDD handling is inactive.
-        results_mock, check_mock, stdout = self._run_mocked(
+        results_mock, check_mock, stdout, result = self._run_mocked(
             flags=15, mock_target="license_tools.tools.linking_tools.check_shared_objects"
         )
         check_mock.assert_not_called()
@@ -136,13 +171,17 @@ class RunOnFileTestCase(TestCase):
             retrieve_emails=True,
             retrieve_file_info=True,
             retrieve_urls=True,
+            text_window=None,
+            comments_only=False,
+            spdx_fast_path=False,
+            verify_spdx_tags=False,
         )
         self.assertEqual("", stdout)
 
         # 2) LDD handling is active, but has no results.
         for result in ["", None]:
             with self.subTest(result=result):
-                results_mock, check_mock, stdout = self._run_mocked(
+                results_mock, check_mock, stdout, result = self._run_mocked(
                     flags=31,
                     return_value=result,
                     mock_target="license_tools.tools.linking_tools.check_shared_objects",
@@ -156,6 +195,10 @@ class RunOnFileTestCase(TestCase):
                     retrieve_emails=True,
                     retrieve_file_info=True,
                     retrieve_urls=True,
+                    text_window=None,
+                    comments_only=False,
+                    spdx_fast_path=False,
+                    verify_spdx_tags=False,
                 )
                 self.assertEqual("", stdout)
 
@@ -166,7 +209,7 @@ class RunOnFileTestCase(TestCase):
     libtinfo.so.6 => /lib64/libtinfo.so.6 (0x00007fbe48600000)
     /lib64/ld-linux-x86-64.so.2 (0x00007fbe492b8000)
 """
-        results_mock, check_mock, stdout = self._run_mocked(
+        results_mock, check_mock, stdout, result = self._run_mocked(
             flags=31,
             return_value=ldd_usr_bin_bc,
             mock_target="license_tools.tools.linking_tools.check_shared_objects",
@@ -176,12 +219,14 @@ class RunOnFileTestCase(TestCase):
             path=SETUP_PATH,
             short_path="setup.py",
         )
-        self.assertEqual("setup.py\n" + ldd_usr_bin_bc + "\n", stdout)
+        self.assertEqual("", stdout)
+        self.assertEqual(ldd_usr_bin_bc, result.linking_data)
+        self.assertEqual("setup.py\n" + ldd_usr_bin_bc, retrieval._render_extra_data(result))
 
     def test_run_on_file__font_handling(self) -> None:
         # 1) Font handling is inactive.
-        results_mock, check_mock, stdout = self._run_mocked(
-            flags=15, mock_target="license_tools.tools.font_tools.check_font"
+        results_mock, check_mock, stdout, result = self._run_mocked(
+            flags=15, mock_target="license_tools.tools.font_tools.analyze_font"
         )
         check_mock.assert_not_called()
         results_mock.assert_called_once_with(
@@ -192,16 +237,20 @@ class RunOnFileTestCase(TestCase):
             retrieve_emails=True,
             retrieve_file_info=True,
             retrieve_urls=True,
+            text_window=None,
+            comments_only=False,
+            spdx_fast_path=False,
+            verify_spdx_tags=False,
         )
         self.assertEqual("", stdout)
 
         # 2) Font handling is active, but has no results.
-        for result in ["", None]:
-            with self.subTest(result=result):
-                results_mock, check_mock, stdout = self._run_mocked(
+        for empty_font_data in [None, {"head": None, "name": None}]:
+            with self.subTest(font_data=empty_font_data):
+                results_mock, check_mock, stdout, result = self._run_mocked(
                     flags=63,
-                    return_value=result,
-                    mock_target="license_tools.tools.font_tools.check_font",
+                    return_value=empty_font_data,
+                    mock_target="license_tools.tools.font_tools.analyze_font",
                 )
                 check_mock.assert_called_once_with(path=SETUP_PATH)
                 results_mock.assert_called_once_with(
@@ -212,37 +261,47 @@ class RunOnFileTestCase(TestCase):
                     retrieve_emails=True,
                     retrieve_file_info=True,
                     retrieve_urls=True,
+                    text_window=None,
+                    comments_only=False,
+                    spdx_fast_path=False,
+                    verify_spdx_tags=False,
                 )
                 self.assertEqual("", stdout)
 
         # 3) Font handling is active and has results.
-        font_awesome = """             Copyright notice: Copyright (c) Font Awesome
-          Font family name: Font Awesome 6 Free Solid
-       Font subfamily name: Solid
-    Unique font identifier: Font Awesome 6 Free Solid-6.5.1
-            Full font name: Font Awesome 6 Free Solid
-            Version string: Version 773.01171875 (Font Awesome version: 6.5.1)
-           PostScript name: FontAwesome6Free-Solid
-               Description: The web's most popular icon set and toolkit.
-                URL Vendor: https://fontawesome.com
-   Typographic Family name: Font Awesome 6 Free
-Typographic Subfamily name: Solid
-"""
-        results_mock, check_mock, stdout = self._run_mocked(
+        font_data: dict[str, Any] = {
+            "head": {"Font revision": 773.01171875},
+            "name": {
+                "Copyright notice": "Copyright (c) Font Awesome",
+                "Font family name": "Font Awesome 6 Free Solid",
+                "URL Vendor": "https://fontawesome.com",
+            },
+        }
+        results_mock, check_mock, stdout, result = self._run_mocked(
             flags=63,
-            return_value=font_awesome,
-            mock_target="license_tools.tools.font_tools.check_font",
+            return_value=font_data,
+            mock_target="license_tools.tools.font_tools.analyze_font",
         )
         check_mock.assert_called_once_with(path=SETUP_PATH)
         results_mock.assert_called_once_with(
             path=SETUP_PATH,
             short_path="setup.py",
         )
-        self.assertEqual("setup.py\n" + font_awesome + "\n\n", stdout)
+        self.assertEqual("", stdout)
+        self.assertEqual(font_data, result.font_data)
+        self.assertEqual(
+            """
+setup.py
+Copyright notice: Copyright (c) Font Awesome
+Font family name: Font Awesome 6 Free Solid
+      URL Vendor: https://fontawesome.com
+"""[1:],
+            retrieval._render_extra_data(result),
+        )
 
     def test_run_on_file__image_handling(self) -> None:
         # 1) Image handling is inactive.
-        results_mock, check_mock, stdout = self._run_mocked(
+        results_mock, check_mock, stdout, result = self._run_mocked(
             flags=15, mock_target="license_tools.tools.image_tools.check_image_metadata"
         )
         check_mock.assert_not_called()
@@ -254,13 +313,17 @@ Typographic Subfamily name: Solid
             retrieve_emails=True,
             retrieve_file_info=True,
             retrieve_urls=True,
+            text_window=None,
+            comments_only=False,
+            spdx_fast_path=False,
+            verify_spdx_tags=False,
         )
         self.assertEqual("", stdout)
 
         # 2) Image handling is active, but has no results.
         for result in ["", None]:
             with self.subTest(result=result):
-                results_mock, check_mock, stdout = self._run_mocked(
+                results_mock, check_mock, stdout, result = self._run_mocked(
                     flags=511,
                     return_value=result,
                     mock_target="license_tools.tools.image_tools.check_image_metadata",
@@ -274,6 +337,10 @@ Typographic Subfamily name: Solid
                     retrieve_emails=True,
                     retrieve_file_info=True,
                     retrieve_urls=True,
+                    text_window=None,
+                    comments_only=False,
+                    spdx_fast_path=False,
+                    verify_spdx_tags=False,
                 )
                 self.assertEqual("", stdout)
 
@@ -286,7 +353,7 @@ Typographic Subfamily name: Solid
 [File]          File Type Extension             : jpg
 [File]          MIME Type                       : image/jpeg
 """
-        results_mock, check_mock, stdout = self._run_mocked(
+        results_mock, check_mock, stdout, result = self._run_mocked(
             flags=511,
             return_value=mountain_jpg,
             mock_target="license_tools.tools.image_tools.check_image_metadata",
@@ -296,7 +363,9 @@ Typographic Subfamily name: Solid
             path=SETUP_PATH,
             short_path="setup.py",
         )
-        self.assertEqual("setup.py\n" + mountain_jpg + "\n", stdout)
+        self.assertEqual("", stdout)
+        self.assertEqual(mountain_jpg, result.image_metadata)
+        self.assertEqual("setup.py\n" + mountain_jpg, retrieval._render_extra_data(result))
 
     def test_cargo_toml(self) -> None:
         with get_from_url(BASE64__0_22_0__CARGO_TOML) as source_path, TemporaryDirectory() as directory:
@@ -311,6 +380,8 @@ Typographic Subfamily name: Solid
             stdout = StringIO()
             with redirect_stdout(stdout):
                 result = retrieval.run_on_file(path=cargo_toml_path, short_path="/path/to/Cargo.toml", retrieval_flags=RetrievalFlags.CARGO_METADATA)
+            self.assertEqual("", stdout.getvalue())
+            self.assertEqual("base64", cast(dict[str, Any], result.cargo_metadata)["name"])
 
             self.assertEqual(
                 """
@@ -331,9 +402,8 @@ Typographic Subfamily name: Solid
                * no_std
                * utf8
   Categories: encoding
-
 """[1:],
-                stdout.getvalue()
+                retrieval._render_extra_data(result)
             )
             self.assertEqual(
                 FileResults(
@@ -359,23 +429,209 @@ Typographic Subfamily name: Solid
                         ],
                         license_clues=[]
                     ),
-                    file_info=None
+                    file_info=None,
+                    cargo_metadata=result.cargo_metadata,
                 ),
                 result
             )
 
+    def test_cache(self) -> None:
+        with TemporaryDirectory() as directory:
+            cache = ResultCache(directory=Path(directory) / "cache")
+            first_path = Path(directory) / "first.py"
+            first_path.write_bytes(SETUP_PATH.read_bytes())
+            second_path = Path(directory) / "second.py"
+            second_path.write_bytes(SETUP_PATH.read_bytes())
+
+            # 1) Cache miss.
+            first = retrieval.run_on_file(path=first_path, short_path="first.py", retrieval_flags=RetrievalFlags.URLS, cache=cache)
+            self.assertEqual(SETUP_PY_LICENSES, first.licenses)
+            self.assertEqual(1, cache.get_statistics().misses)
+            self.assertEqual(1, cache.get_statistics().entries)
+            self.assertEqual({".py"}, set(cache.get_timings()))
+
+            # 2) Cache hit for the same content. The matching does not run at all.
+            with mock.patch("scancode.api.get_licenses") as licenses_mock, mock.patch("scancode.api.get_urls") as urls_mock:
+                second = retrieval.run_on_file(path=second_path, short_path="second.py", retrieval_flags=RetrievalFlags.URLS, cache=cache)
+            licenses_mock.assert_not_called()
+            urls_mock.assert_not_called()
+            self.assertEqual(1, cache.get_statistics().hits)
+            self.assertEqual(second_path, second.path)
+            self.assertEqual("second.py", second.short_path)
+            self.assertTrue(second.retrieve_licenses)
+            self.assertTrue(second.retrieve_urls)
+            self.assertFalse(second.retrieve_copyrights)
+            self.assertEqual(first.licenses, second.licenses)
+            self.assertEqual(first.urls, second.urls)
+            self.assertIsNone(second.copyrights)
+
+            # 3) Different flags are a cache miss.
+            third = retrieval.run_on_file(path=second_path, short_path="second.py", retrieval_flags=RetrievalFlags.COPYRIGHTS, cache=cache)
+            self.assertIsNotNone(third.copyrights)
+            self.assertIsNone(third.urls)
+            self.assertEqual(2, cache.get_statistics().misses)
+
+            # 4) Modified content is a cache miss.
+            second_path.write_text("# SPDX-License-Identifier: MIT\n")
+            fourth = retrieval.run_on_file(path=second_path, short_path="second.py", retrieval_flags=RetrievalFlags.URLS, cache=cache)
+            self.assertEqual("MIT", cast(Licenses, fourth.licenses).detected_license_expression_spdx)
+            self.assertEqual(3, cache.get_statistics().misses)
+            cache.close()
+
+    def test_policy(self) -> None:
+        scan_policy = ScanPolicy(
+            rules=(
+                PolicyRule(action="skip", reason="Bytecode", suffixes=(".pyc",)),
+                PolicyRule(action="metadata", reason="Data", suffixes=(".dat",)),
+                PolicyRule(action="header", reason="Generated", suffixes=(".py",), minified_or_generated=True),
+            ),
+            header_window=TextWindow(line_count=5),
+        )
+        with TemporaryDirectory() as directory:
+            bytecode_path = Path(directory) / "module.pyc"
+            bytecode_path.write_bytes(b"# SPDX-License-Identifier: MIT\n")
+            data_path = Path(directory) / "values.dat"
+            data_path.write_bytes(b"# SPDX-License-Identifier: MIT\n")
+            generated_path = Path(directory) / "generated.py"
+            generated_path.write_bytes(
+                b"# @generated\n# SPDX-License-Identifier: MIT\n" + b"x = 1\n" * 10 + b"# SPDX-License-Identifier: Apache-2.0\n"
+            )
+            cache = ResultCache(directory=Path(directory) / "cache")
+
+            # 1) Skipped and metadata-only files do not run the license matching.
+            with mock.patch("scancode.api.get_licenses") as licenses_mock:
+                skipped = retrieval.run_on_file(path=bytecode_path, short_path="module.pyc", policy=scan_policy)
+                metadata = retrieval.run_on_file(path=data_path, short_path="values.dat", policy=scan_policy)
+            licenses_mock.assert_not_called()
+            self.assertEqual(("skip", "Bytecode", Licenses()), (skipped.policy_action, skipped.policy_reason, skipped.licenses))
+            self.assertEqual(("metadata", "Data", Licenses()), (metadata.policy_action, metadata.policy_reason, metadata.licenses))
+
+            # 2) Headers are analyzed partially and cached separately.
+            header = retrieval.run_on_file(path=generated_path, short_path="generated.py", policy=scan_policy, cache=cache)
+            self.assertEqual(("header", "Generated", TextWindow(line_count=5)), (header.policy_action, header.policy_reason, header.text_window))
+            self.assertTrue(header.partial)
+            self.assertEqual("MIT", cast(Licenses, header.licenses).detected_license_expression_spdx)
+            complete = retrieval.run_on_file(path=generated_path, short_path="generated.py", cache=cache)
+            self.assertEqual((None, None, None), (complete.policy_action, complete.policy_reason, complete.text_window))
+            self.assertFalse(complete.partial)
+            self.assertEqual("MIT AND Apache-2.0", cast(Licenses, complete.licenses).detected_license_expression_spdx)
+            self.assertEqual(2, cache.get_statistics().misses)
+            cached = retrieval.run_on_file(path=generated_path, short_path="generated.py", policy=scan_policy, cache=cache)
+            self.assertEqual((header.licenses, True), (cached.licenses, cached.partial))
+            self.assertEqual(1, cache.get_statistics().hits)
+
+            # 3) Files without a matching rule are analyzed completely.
+            regular = retrieval.run_on_file(path=SETUP_PATH, short_path="setup.py", policy=scan_policy)
+            self.assertEqual(("full", None), (regular.policy_action, regular.policy_reason))
+            self.assertEqual(SETUP_PY_LICENSES, regular.licenses)
+
+    def test_policy__comments_only(self) -> None:
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / "module.py"
+            path.write_bytes(b'# SPDX-License-Identifier: MIT\nLICENSE = "SPDX-License-Identifier: Apache-2.0"\n')
+            cache = ResultCache(directory=Path(directory) / "cache")
+
+            complete = retrieval.run_on_file(path=path, short_path="module.py", cache=cache)
+            self.assertEqual("MIT AND Apache-2.0", cast(Licenses, complete.licenses).detected_license_expression_spdx)
+            comments = retrieval.run_on_file(path=path, short_path="module.py", cache=cache, policy=ScanPolicy(comments_only=True))
+            self.assertEqual("MIT", cast(Licenses, comments.licenses).detected_license_expression_spdx)
+            self.assertTrue(comments.comments_only)
+            self.assertEqual(2, cache.get_statistics().misses)
+            cached = retrieval.run_on_file(path=path, short_path="module.py", cache=cache, policy=ScanPolicy(comments_only=True))
+            self.assertEqual((comments.licenses, True), (cached.licenses, cached.comments_only))
+
+    def test_policy__spdx_fast_path(self) -> None:
+        with TemporaryDirectory() as directory:
+            cache = ResultCache(directory=Path(directory) / "cache")
+
+            # 1) The tags are used instead of the matcher and cached separately.
+            with mock.patch("scancode.api.get_licenses") as licenses_mock:
+                tagged = retrieval.run_on_file(
+                    path=SETUP_PATH, short_path="setup.py", cache=cache, policy=ScanPolicy().with_spdx_fast_path(),
+                )
+            licenses_mock.assert_not_called()
+            self.assertEqual({"1-spdx-id"}, {match.matcher for detection in cast(Licenses, tagged.licenses).license_detections for match in detection.matches})
+            complete = retrieval.run_on_file(path=SETUP_PATH, short_path="setup.py", cache=cache)
+            self.assertEqual(SETUP_PY_LICENSES, complete.licenses)
+            self.assertEqual(2, cache.get_statistics().misses)
+
+            # 2) Verified results are the matcher results.
+            verified = retrieval.run_on_file(
+                path=SETUP_PATH, short_path="setup.py", cache=cache, policy=ScanPolicy().with_spdx_fast_path(verify=True),
+            )
+            self.assertEqual((SETUP_PY_LICENSES, True), (verified.licenses, verified.verify_spdx_tags))
+            self.assertEqual(1, cache.get_statistics().hits)
+            cache.close()
+
+    def test_previous_results__skip_extra_analyses(self) -> None:
+        ldd_data = "    libc.so.6 => /lib64/libc.so.6 (0x00007fbe48a09000)\n"
+        flags = RetrievalFlags.to_int(retrieve_ldd_data=True)
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / "library.so"
+            path.write_bytes(b"\x7fELF")
+            manifest = Manifest(path=Path(directory) / "manifest.sqlite3")
+            manifest.start()
+            journal = Journal(path=Path(directory) / "journal.sqlite3")
+
+            with mock.patch.object(linking_tools, "check_shared_objects", return_value=ldd_data) as check_mock:
+                first = retrieval.run_on_file(path=path, short_path="library.so", retrieval_flags=flags, manifest=manifest)
+            check_mock.assert_called_once_with(path=path)
+            self.assertEqual(ldd_data, first.linking_data)
+
+            # The recorded results are used before running the linking analysis again.
+            with mock.patch.object(linking_tools, "check_shared_objects") as check_mock:
+                second = retrieval.run_on_file(path=path, short_path="library.so", retrieval_flags=flags, manifest=manifest, journal=journal)
+                third = retrieval.run_on_file(path=path, short_path="library.so", retrieval_flags=flags, journal=journal)
+            check_mock.assert_not_called()
+            self.assertEqual([ldd_data, ldd_data], [second.linking_data, third.linking_data])
+            manifest.close()
+            journal.close()
+
+    def test_previous_results__hash_once(self) -> None:
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / "setup.py"
+            shutil.copy(SETUP_PATH, path)
+            cache = ResultCache(directory=Path(directory) / "cache")
+            manifest = Manifest(path=Path(directory) / "manifest.sqlite3")
+            manifest.start()
+            journal = Journal(path=Path(directory) / "journal.sqlite3")
+
+            with mock.patch.object(cache_utils, "get_file_hash", wraps=cache_utils.get_file_hash) as hash_mock:
+                results = retrieval.run_on_file(path=path, short_path="setup.py", cache=cache, manifest=manifest, journal=journal)
+            hash_mock.assert_called_once_with(path)
+            self.assertEqual(SETUP_PY_LICENSES, results.licenses)
+            cache.close()
+            manifest.close()
+            journal.close()
+
+
+class GetBatchesTestCase(TestCase):
+    def test_get_batches(self) -> None:
+        with TemporaryDirectory() as tempdir:
+            directory = Path(tempdir)
+            files: list[tuple[Path, str] | None] = []
+            for index, size in enumerate([10, 10, 10, 10, 10, 10, 10, 10, 50, 10, 10, 10]):
+                path = directory / f"file{index}.txt"
+                path.write_bytes(b"x" * size)
+                files.append((path, path.name))
+            files.insert(11, None)
+
+            batches = list(retrieval._get_batches(files, maximum_size=50, maximum_count=4))
+
+        self.assertEqual(
+            [[0], [1, 2], [3, 4, 5, 6], [7], [8], [9, 10], [11]],
+            [[index for index, _, _ in batch] for batch in batches]
+        )
+        self.assertEqual(("file11.txt", 11), (batches[-1][0][2], batches[-1][0][0]))
+
 
 class RunOnDirectoryTestCase(TestCase):
     def test_run_on_directory(self) -> None:
         file_results = [object()] * 5
-        file_results_iterable = iter(file_results)
         paths = [(Path(f"/tmp/file{i}.py"), f"file{i}.py") for i in range(1, 6)]
 
-        def run_on_file(path: Path, short_path: str, retrieval_flags: int = 0) -> Any:
-            return next(file_results_iterable)
-
         with mock.patch.object(
-            retrieval, "run_on_file", side_effect=run_on_file
+            retrieval, "run_on_file", side_effect=file_results
         ) as run_mock, mock.patch.object(
             retrieval, "get_files_from_directory", return_value=paths
         ) as get_mock:
@@ -388,7 +644,7 @@ class RunOnDirectoryTestCase(TestCase):
         run_mock.assert_has_calls(
             [
                 mock.call(
-                    path=current_path, short_path=current_short_path, retrieval_flags=42
+                    path=current_path, short_path=current_short_path, retrieval_flags=42, cache=None, manifest=None, journal=None, policy=None
                 )
                 for current_path, current_short_path in paths
             ],
@@ -397,6 +653,22 @@ class RunOnDirectoryTestCase(TestCase):
         self.assertEqual(len(paths), run_mock.call_count, run_mock.call_args_list)
         get_mock.assert_called_once_with("/tmp/dummy/directory", None)
 
+    def test_run_on_directory__streaming(self) -> None:
+        paths = [(Path(f"/tmp/file{i}.py"), f"file{i}.py") for i in range(1, 11)]
+
+        for ordered in [True, False]:
+            with self.subTest(ordered=ordered), mock.patch.object(
+                retrieval, "run_on_file", side_effect=_get_short_path
+            ) as run_mock, mock.patch.object(
+                retrieval, "get_files_from_directory", return_value=paths
+            ):
+                results = retrieval.run_on_directory("/tmp/dummy/directory", job_count=1, ordered=ordered)
+                self.assertEqual("file1.py", next(results))
+                # The first result is available before all files have been analyzed.
+                self.assertLess(run_mock.call_count, len(paths))
+                remaining = list(results)
+            self.assertEqual([short_path for _, short_path in paths[1:]], remaining)
+
     @classmethod
     def _generate_tar_bz2_archive(cls, directory: Path) -> Path:
         with TemporaryDirectory() as nested_directory:
@@ -419,7 +691,7 @@ class RunOnDirectoryTestCase(TestCase):
         run_mock.assert_has_calls(
             [
                 mock.call(
-                    path=current_path, short_path=current_short_path, retrieval_flags=42
+                    path=current_path, short_path=current_short_path, retrieval_flags=42, cache=None, manifest=None, journal=None, policy=None
                 )
                 for current_path, current_short_path in expected
             ],
@@ -435,11 +707,8 @@ class RunOnDirectoryTestCase(TestCase):
             directory.joinpath("nested_tar_bz2").write_text("Dummy")
             nested_path = self._generate_tar_bz2_archive(directory)
 
-            def run_on_file(path: Path, short_path: str, retrieval_flags: int = 0) -> Any:
-                return path
-
             with mock.patch.object(
-                retrieval, "run_on_file", side_effect=run_on_file
+                retrieval, "run_on_file", side_effect=_get_path
             ) as run_mock:
                 results = list(
                     retrieval.run_on_directory(
@@ -455,7 +724,8 @@ class RunOnDirectoryTestCase(TestCase):
         result_set: set[Path] = cast(set[Path], set(results))
         expected: list[tuple[Path, str]] = []
         self.assertEqual(4, len(results), results)
-        for name in ["directory/file.txt", "nested.tar.bz2", "nested_tar_bz2"]:
+        # The archive is scheduled last, as only its headers are analyzed.
+        for name in ["directory/file.txt", "nested_tar_bz2", "nested.tar.bz2"]:
             result_set.remove(directory / name)
             expected.append((directory / name, name))
         self._test_nested(
@@ -469,11 +739,8 @@ class RunOnDirectoryTestCase(TestCase):
             directory.joinpath("directory", "file.txt").write_text("MIT-0")
             nested_path = self._generate_tar_bz2_archive(directory)
 
-            def run_on_file(path: Path, short_path: str, retrieval_flags: int = 0) -> Any:
-                return path
-
             with mock.patch.object(
-                retrieval, "run_on_file", side_effect=run_on_file
+                retrieval, "run_on_file", side_effect=_get_path
             ) as run_mock:
                 results = list(
                     retrieval.run_on_directory(
@@ -496,6 +763,202 @@ class RunOnDirectoryTestCase(TestCase):
             result_set=result_set, directory=directory, nested_path=nested_path, expected=expected, run_mock=run_mock
         )
 
+    def test_nested__extraction_overlaps_scanning(self) -> None:
+        extracted = threading.Event()
+        extract = archive_utils.extract
+
+        def extract_and_notify(archive_path: Path, target_directory: Path) -> None:
+            extract(archive_path=archive_path, target_directory=target_directory)
+            extracted.set()
+
+        with TemporaryDirectory() as tempdir:
+            directory = Path(tempdir)
+            directory.joinpath("z_last.txt").write_text("MIT-0")
+            self._generate_tar_bz2_archive(directory)
+            during_scan: list[bool] = []
+
+            def run_on_file(path: Path, short_path: str, **kwargs: Any) -> Any:
+                if short_path == "z_last.txt":
+                    # The archive is being extracted while the parent directory is analyzed.
+                    during_scan.append(extracted.wait(timeout=10))
+                return short_path
+
+            with mock.patch.object(
+                retrieval, "run_on_file", side_effect=run_on_file
+            ), mock.patch.object(archive_utils, "extract", side_effect=extract_and_notify):
+                results = list(retrieval.run_on_directory(tempdir, job_count=1))
+
+        self.assertEqual([True], during_scan)
+        self.assertEqual(["nested.tar.bz2", "z_last.txt"], results[:2])
+        self.assertEqual(3, len(results), results)
+        self.assertTrue(cast(str, results[2]).endswith("/LICENSE"), results)
+
+    def test_nested__single_work_queue(self) -> None:
+        with TemporaryDirectory() as tempdir:
+            directory = Path(tempdir)
+            directory.joinpath("file.txt").write_text("MIT-0")
+            with TemporaryDirectory() as nested_directory:
+                nested_path = Path(nested_directory)
+                nested_path.joinpath("LICENSE").write_text("This is my license.")
+                for name in ["first", "second"]:
+                    with tarfile.open(directory / f"{name}.tar.bz2", "w:bz2") as tar:
+                        tar.add(nested_path, arcname=name)
+
+            results = []
+            with mock.patch.object(
+                retrieval, "run_on_file", side_effect=_get_path_and_short_path
+            ), mock.patch.object(retrieval, "Parallel", wraps=Parallel) as parallel_mock:
+                for path, short_path in cast(Iterator[tuple[Path, str]], retrieval.run_on_directory(tempdir, job_count=1)):
+                    results.append((short_path, path.exists()))
+                    if short_path.startswith("second_tar_bz2/"):
+                        # The first extracted directory has been removed.
+                        self.assertFalse(directory.joinpath("first_tar_bz2").exists())
+
+            self.assertSetEqual({"file.txt", "first.tar.bz2", "second.tar.bz2"}, {path.name for path in directory.glob("*")})
+
+        parallel_mock.assert_called_once()
+        self.assertEqual(
+            [
+                ("file.txt", True),
+                ("first.tar.bz2", True),
+                ("second.tar.bz2", True),
+                ("first_tar_bz2/first/LICENSE", True),
+                ("second_tar_bz2/second/LICENSE", True),
+            ],
+            results,
+        )
+
+    def test_cost_aware_scheduling(self) -> None:
+        with TemporaryDirectory() as tempdir:
+            directory = Path(tempdir)
+            for name, size in [("a.txt", 10), ("b.py", 1000), ("c.c", 100), ("d.py", 100)]:
+                directory.joinpath(name).write_text("x" * size)
+
+            for ordered in [True, False]:
+                with self.subTest(ordered=ordered), mock.patch.object(retrieval, "run_on_file", side_effect=_get_short_path) as run_mock:
+                    results = list(retrieval.run_on_directory(tempdir, job_count=1, ordered=ordered))
+                self.assertEqual(
+                    ["b.py", "c.c", "d.py", "a.txt"],
+                    [call.kwargs["short_path"] for call in run_mock.call_args_list]
+                )
+                self.assertEqual(["a.txt", "b.py", "c.c", "d.py"], sorted(results))
+                if ordered:
+                    self.assertEqual(["a.txt", "b.py", "c.c", "d.py"], results)
+
+            # Learned timings are considered.
+            with TemporaryDirectory() as cache_directory:
+                cache = ResultCache(directory=cache_directory)
+                cache.add_timing(suffix=".py", size=1000, duration=0.001)
+                cache.add_timing(suffix=".c", size=100, duration=1)
+                with mock.patch.object(retrieval, "run_on_file", side_effect=_get_short_path) as run_mock:
+                    results = list(retrieval.run_on_directory(tempdir, job_count=1, cache=cache))
+                cache.close()
+            self.assertEqual(
+                ["c.c", "a.txt", "b.py", "d.py"],
+                [call.kwargs["short_path"] for call in run_mock.call_args_list]
+            )
+            self.assertEqual(["a.txt", "b.py", "c.c", "d.py"], results)
+
+    def test_reuse_metadata(self) -> None:
+        with TemporaryDirectory() as tempdir:
+            directory = Path(tempdir)
+            directory.joinpath("REUSE.toml").write_text(
+                'version = 1\n'
+                '[[annotations]]\npath = "docs/**"\nSPDX-License-Identifier = "CC-BY-4.0"\n'
+                '[[annotations]]\npath = "data/*.csv"\nprecedence = "override"\nSPDX-License-Identifier = "CC0-1.0"\n'
+            )
+            for name in ["docs/index.rst", "data/values.csv", "main.py"]:
+                directory.joinpath(name).parent.mkdir(exist_ok=True)
+                directory.joinpath(name).write_text("x" * 10)
+
+            # 1) The declarations are recorded, but only the overriding ones replace the analysis.
+            for ordered in [True, False]:
+                with self.subTest(ordered=ordered), mock.patch.object(retrieval, "run_on_file", side_effect=_get_file_results) as run_mock:
+                    results = list(
+                        retrieval.run_on_directory(tempdir, job_count=1, ordered=ordered, policy=ScanPolicy().with_reuse_metadata())
+                    )
+                self.assertEqual(
+                    ["REUSE.toml", "docs/index.rst", "main.py"], sorted(call.kwargs["short_path"] for call in run_mock.call_args_list)
+                )
+                declarations = {
+                    result.short_path: result.declaration.license_expression if result.declaration else None for result in results
+                }
+                self.assertEqual(
+                    {"REUSE.toml": None, "data/values.csv": "CC0-1.0", "docs/index.rst": "CC-BY-4.0", "main.py": None}, declarations
+                )
+                if ordered:
+                    self.assertEqual(["REUSE.toml", "data/values.csv", "docs/index.rst", "main.py"], [result.short_path for result in results])
+                declared = [result for result in results if result.short_path == "data/values.csv"][0]
+                self.assertEqual("CC0-1.0", cast(Licenses, declared.licenses).detected_license_expression_spdx)
+
+            # 2) Trusting the metadata skips the analysis of all covered files.
+            with mock.patch.object(retrieval, "run_on_file", side_effect=_get_file_results) as run_mock:
+                results = list(
+                    retrieval.run_on_directory(tempdir, job_count=1, policy=ScanPolicy().with_reuse_metadata(trust=True))
+                )
+            self.assertEqual(["REUSE.toml", "main.py"], sorted(call.kwargs["short_path"] for call in run_mock.call_args_list))
+            self.assertEqual(
+                [None, "CC0-1.0", "CC-BY-4.0", None],
+                [result.licenses.detected_license_expression_spdx if result.licenses else None for result in results],
+            )
+
+            # 3) The metadata is ignored by default.
+            with mock.patch.object(retrieval, "run_on_file", side_effect=_get_file_results) as run_mock:
+                results = list(retrieval.run_on_directory(tempdir, job_count=1))
+            self.assertEqual(4, run_mock.call_count)
+            self.assertEqual([None] * 4, [result.declaration for result in results])
+
+    def test_manifest(self) -> None:
+        with TemporaryDirectory() as tempdir, TemporaryDirectory() as manifest_directory:
+            directory = Path(tempdir)
+            directory.joinpath("first.py").write_text("# SPDX-License-Identifier: MIT\n")
+            directory.joinpath("second.py").write_text("# SPDX-License-Identifier: Apache-2.0\n")
+            manifest = Manifest(path=Path(manifest_directory) / "manifest.sqlite3")
+            manifest.start()
+            first = list(retrieval.run_on_directory(tempdir, job_count=1, manifest=manifest))
+            self.assertEqual(
+                ["MIT", "Apache-2.0"], [cast(Licenses, result.licenses).detected_license_expression_spdx for result in first]
+            )
+
+            # Only the modified file is analyzed again.
+            directory.joinpath("second.py").write_text("# SPDX-License-Identifier: BSD-3-Clause\n")
+            with mock.patch.object(retrieval, "FileResults", wraps=FileResults) as results_mock:
+                second = list(retrieval.run_on_directory(tempdir, job_count=1, manifest=manifest))
+            manifest.close()
+            results_mock.assert_called_once()
+            self.assertEqual(directory / "second.py", results_mock.call_args.kwargs["path"])
+            self.assertEqual(first[0], second[0])
+            self.assertEqual("BSD-3-Clause", cast(Licenses, second[1].licenses).detected_license_expression_spdx)
+
+    def test_journal__resume(self) -> None:
+        with TemporaryDirectory() as tempdir, TemporaryDirectory() as journal_directory:
+            directory = Path(tempdir)
+            directory.joinpath("first.py").write_text("# SPDX-License-Identifier: MIT\n")
+            archive_directory = directory / "archive"
+            archive_directory.mkdir()
+            archive_directory.joinpath("second.py").write_text("# SPDX-License-Identifier: Apache-2.0\n")
+            with tarfile.open(directory / "nested.tar.bz2", "w:bz2") as tar:
+                tar.add(archive_directory, arcname="archive")
+            shutil.rmtree(archive_directory)
+
+            # Keep the extracted directory, as an interrupted run would do.
+            journal = Journal(path=Path(journal_directory) / "journal.sqlite3")
+            first = list(retrieval.run_on_directory(tempdir, job_count=1, journal=journal, delete_unpacked_archive_directories=False))
+            self.assertTrue(directory.joinpath("nested_tar_bz2").is_dir())
+
+            with mock.patch.object(retrieval, "FileResults", wraps=FileResults) as results_mock, \
+                    mock.patch.object(archive_utils, "extract", wraps=archive_utils.extract) as extract_mock:
+                second = list(retrieval.run_on_directory(tempdir, job_count=1, journal=journal))
+            journal.close()
+            # Only the header of the archive itself is being read again.
+            self.assertEqual([directory / "nested.tar.bz2"], [call.kwargs["path"] for call in results_mock.call_args_list])
+            extract_mock.assert_not_called()
+            self.assertEqual(first, second)
+            self.assertEqual(
+                ["MIT", None, "Apache-2.0"], [result.licenses.detected_license_expression_spdx if result.licenses else None for result in second]
+            )
+            self.assertFalse(directory.joinpath("nested_tar_bz2").exists())
+
     def test_nested_storage_variant(self) -> None:
         with TemporaryDirectory() as tempdir:
             directory = Path(tempdir)
@@ -503,10 +966,7 @@ class RunOnDirectoryTestCase(TestCase):
             directory.joinpath("directory", "file.txt").write_text("MIT-0")
             _ = self._generate_tar_bz2_archive(directory)
 
-            def run_on_file(path: Path, short_path: str, retrieval_flags: int = 0) -> Any:
-                return path
-
-            with mock.patch.object(retrieval, "run_on_file", side_effect=run_on_file):
+            with mock.patch.object(retrieval, "run_on_file", side_effect=_get_path):
                 list(
                     retrieval.run_on_directory(
                         tempdir, job_count=1, retrieval_flags=42,
@@ -520,7 +980,7 @@ class RunOnDirectoryTestCase(TestCase):
                 {path.name for path in directory.glob("*")}
             )
 
-            with mock.patch.object(retrieval, "run_on_file", side_effect=run_on_file):
+            with mock.patch.object(retrieval, "run_on_file", side_effect=_get_path):
                 with self.assertRaisesRegex(
                         expected_exception=FileExistsError,
                         expected_regex=fr"^\[Errno 17\] File exists: '{re.escape(str(directory / 'nested_tar_bz2'))}'$"
@@ -540,7 +1000,9 @@ class RunOnPackageArchiveFileTestCase(TestCase):
             directory_result = [object(), object(), object()]
 
             def run_on_directory(
-                directory: Path, job_count: int, retrieval_flags: int
+                directory: Path, job_count: int, retrieval_flags: int, cache: ResultCache | None = None, manifest: Manifest | None = None,
+                journal: Journal | None = None,
+                scanner: Scanner | None = None, ordered: bool = True, policy: ScanPolicy | None = None,
             ) -> Generator[Any, None, None]:
                 self.assertEqual(2, job_count)
                 self.assertEqual(42, retrieval_flags)
@@ -577,6 +1039,26 @@ class RunOnPackageArchiveFileTestCase(TestCase):
             download=TYPING_EXTENSIONS__4_8_0__SDIST, expected_files=TYPING_EXTENSION_4_8_0__SOURCE_FILES,
         )
 
+    def test_python_metadata(self) -> None:
+        with TemporaryDirectory() as tempdir:
+            archive_path = Path(tempdir) / "example-1.0-py3-none-any.whl"
+            with zipfile.ZipFile(archive_path, "w") as archive:
+                archive.writestr("example.py", "# SPDX-License-Identifier: MIT\n")
+                archive.writestr("example-1.0.dist-info/METADATA", "Metadata-Version: 2.1\nName: example\nVersion: 1.0\nLicense: MIT\n")
+
+            with mock.patch.object(pip_tools, "check_metadata", return_value="Name: example") as check_mock:
+                result = list(
+                    retrieval.run_on_package_archive_file(
+                        archive_path=archive_path, job_count=1, retrieval_flags=RetrievalFlags.to_int(retrieve_python_metadata=True)
+                    )
+                )
+        check_mock.assert_called_once()
+        self.assertEqual(
+            [("example-1.0.dist-info/METADATA", "Name: example"), ("example.py", None)],
+            [(entry.short_path, entry.python_metadata) for entry in result],
+        )
+        self.assertEqual("example-1.0.dist-info/METADATA\nName: example\n", retrieval._render_extra_data(result[0]))
+
     def test_rpm(self) -> None:
         self._check_call(
             download=LIBAIO1__0_3_109_1_25__RPM,
@@ -594,7 +1076,9 @@ class RunOnDownloadedArchiveFileTestCase(TestCase):
         directory_result = [object(), object(), object()]
 
         def run_on_package_archive_file(
-            archive_path: Path, job_count: int, retrieval_flags: int
+            archive_path: Path, job_count: int, retrieval_flags: int, cache: ResultCache | None = None, manifest: Manifest | None = None,
+            journal: Journal | None = None,
+            scanner: Scanner | None = None, ordered: bool = True, policy: ScanPolicy | None = None,
         ) -> Generator[Any, None, None]:
             self.assertEqual(2, job_count)
             self.assertEqual(42, retrieval_flags)
@@ -625,7 +1109,9 @@ class RunOnDownloadedPackageFileTestCase(TestCase):
         archive_result = [object(), object(), object()]
 
         def run_on_package_archive_file(
-            archive_path: Path, job_count: int, retrieval_flags: int, retrieve_python_metadata: bool = False
+            archive_path: Path, job_count: int, retrieval_flags: int, retrieve_python_metadata: bool = False,
+            cache: ResultCache | None = None, manifest: Manifest | None = None,
+            journal: Journal | None = None, scanner: Scanner | None = None, ordered: bool = True, policy: ScanPolicy | None = None,
         ) -> Generator[Any, None, None]:
             self.assertEqual("typing_extensions-4.8.0-py3-none-any.whl", archive_path.name)
             self.assertEqual(3, job_count)
@@ -652,7 +1138,9 @@ class RunOnDownloadedPackageFileTestCase(TestCase):
         archive_result = [object(), object(), object()]
 
         def run_on_package_archive_file(
-            archive_path: Path, job_count: int, retrieval_flags: int, retrieve_python_metadata: bool = False
+            archive_path: Path, job_count: int, retrieval_flags: int, retrieve_python_metadata: bool = False,
+            cache: ResultCache | None = None, manifest: Manifest | None = None,
+            journal: Journal | None = None, scanner: Scanner | None = None, ordered: bool = True, policy: ScanPolicy | None = None,
         ) -> Generator[Any, None, None]:
             self.assertEqual("typing_extensions-4.8.0.tar.gz", archive_path.name)
             self.assertEqual(3, job_count)
@@ -677,6 +1165,25 @@ class RunOnDownloadedPackageFileTestCase(TestCase):
             self.assertEqual(archive_result, result)
 
 
+class PrintResultsTestCase(TestCase):
+    def test_extra_data(self) -> None:
+        binary = FileResults(path=Path("/tmp/lib.so"), short_path="lib.so", licenses=Licenses(), linking_data="libc.so.6\n")
+        source = FileResults(
+            path=Path("/tmp/main.c"), short_path="main.c",
+            licenses=Licenses(detected_license_expression="mit", detected_license_expression_spdx="MIT"),
+        )
+        stdout = StringIO()
+        with redirect_stdout(stdout), mock.patch("shutil.get_terminal_size", return_value=os.terminal_size((10, 20))):
+            retrieval._print_results([binary, source])
+
+        # The results of the additional analyses are displayed before the licenses.
+        self.assertEqual(
+            "lib.so\nlibc.so.6\n\n" + "lib.so" + " " * 72 + "\n" + "main.c" + " " * 68 + "MIT \n\n"
+            + "=" * 10 + "\n\n" + " " * 67 + "MIT  1\n" + " " * 66 + "None  1\n",
+            stdout.getvalue(),
+        )
+
+
 class CheckThatExactlyOneValueIsSetTestCase(TestCase):
     def test_check_that_exactly_one_value_is_set(self) -> None:
         self.assertIs(
@@ -723,6 +1230,12 @@ class RunTestCase(TestCase):
             retrieval_flags=0,
             job_count=4,
             prefer_sdist=False,
+            cache=None,
+            manifest=None,
+            journal=None,
+            scanner=None,
+            ordered=True,
+            policy=None,
         )
         self.assertEqual(TYPING_EXTENSION_4_8_0__LICENSES, result)
         self.assertEqual(TYPING_EXTENSION_4_8_0__EXPECTED_OUTPUT, str(stdout))
@@ -736,15 +1249,20 @@ class RunTestCase(TestCase):
                 retrieve_python_metadata=True,
             )
 
+        self.assertEqual(
+            ["typing_extensions-4.8.0.dist-info/METADATA"], [entry.short_path for entry in result if entry.python_metadata]
+        )
         expected_result = copy.deepcopy(TYPING_EXTENSION_4_8_0__LICENSES)
         for entry in expected_result:
             entry.path = Path("dummy")
             entry.retrieve_licenses = True
         for entry in result:
             entry.path = Path("dummy")
+            entry.python_metadata = None
         self.assertEqual(expected_result, result)
 
-        expected_output = """               Name: typing-extensions
+        expected_output = """typing_extensions-4.8.0.dist-info/METADATA
+               Name: typing-extensions
             Version: 4.8.0
       License files: /tmp/dummy/typing_extensions-4.8.0.dist-info/LICENSE
              Author: "Guido van Rossum, Jukka Lehtosalo, Łukasz Langa, Michael Lee" <levkivskyi@gmail.com>
@@ -769,11 +1287,85 @@ License classifiers: Python Software Foundation License
                 ) as run_mock:
                     result = retrieval.run(directory=path, retrieve_ldd_data=True)
             run_mock.assert_called_once_with(
-                directory=directory, retrieval_flags=16, job_count=4
+                directory=directory, retrieval_flags=16, job_count=4, cache=None, manifest=None, journal=None, scanner=None, ordered=True, policy=None
             )
             self.assertEqual(TYPING_EXTENSION_4_8_0__LICENSES, result)
             self.assertEqual(TYPING_EXTENSION_4_8_0__EXPECTED_OUTPUT, str(stdout))
 
+    def test_directory__streaming(self) -> None:
+        with TemporaryDirectory() as directory:
+            with self.record_stdout() as stdout:
+                with mock.patch.object(
+                    retrieval,
+                    "run_on_directory",
+                    return_value=iter(TYPING_EXTENSION_4_8_0__LICENSES),
+                ) as run_mock:
+                    result = retrieval.run(directory=directory, streaming=True)
+            self.assertTrue(run_mock.call_args.kwargs["ordered"])
+        self.assertEqual([], result)
+
+        # The path column uses a fixed width.
+        path_length = max(len(entry.short_path) for entry in TYPING_EXTENSION_4_8_0__LICENSES)
+        lines = TYPING_EXTENSION_4_8_0__EXPECTED_OUTPUT.splitlines(keepends=True)
+        expected_output = "".join(
+            [line[:path_length].strip().rjust(retrieval.STREAMING_PATH_WIDTH) + line[path_length:] for line in lines[:5]] + lines[5:]
+        )
+        self.assertEqual(expected_output, str(stdout))
+
+    def test_directory__summary_only(self) -> None:
+        with TemporaryDirectory() as directory:
+            with self.record_stdout() as stdout:
+                with mock.patch.object(
+                    retrieval,
+                    "run_on_directory",
+                    return_value=iter(TYPING_EXTENSION_4_8_0__LICENSES),
+                ) as run_mock:
+                    result = retrieval.run(directory=directory, summary_only=True)
+            self.assertFalse(run_mock.call_args.kwargs["ordered"])
+        self.assertEqual([], result)
+        self.assertEqual("".join(TYPING_EXTENSION_4_8_0__EXPECTED_OUTPUT.splitlines(keepends=True)[-3:]), str(stdout))
+
+    def test_directory__jsonl(self) -> None:
+        with TemporaryDirectory() as directory, TemporaryDirectory() as output_directory:
+            jsonl_path = Path(output_directory) / "results.jsonl.gz"
+            with self.record_stdout():
+                with mock.patch.object(
+                    retrieval,
+                    "run_on_directory",
+                    return_value=iter(TYPING_EXTENSION_4_8_0__LICENSES),
+                ):
+                    result = retrieval.run(directory=directory, summary_only=True, jsonl_path=jsonl_path, jsonl_compression="gzip")
+            self.assertEqual([], result)
+            lines = gzip.decompress(jsonl_path.read_bytes()).decode("utf-8").splitlines()
+        self.assertEqual(
+            [entry.short_path for entry in TYPING_EXTENSION_4_8_0__LICENSES], [json.loads(line)["short_path"] for line in lines]
+        )
+        self.assertEqual("Python-2.0", json.loads(lines[1])["licenses"]["detected_license_expression_spdx"])
+
+    def test_directory__failure(self) -> None:
+        def get_results(*args: Any, **kwargs: Any) -> Generator[FileResults, None, None]:
+            yield TYPING_EXTENSION_4_8_0__LICENSES[0]
+            raise ValueError("Analysis failed")
+
+        with TemporaryDirectory() as directory, TemporaryDirectory() as output_directory:
+            output = Path(output_directory)
+            with mock.patch.object(retrieval, "run_on_directory", side_effect=get_results), \
+                    mock.patch.object(ResultCache, "close", autospec=True) as cache_mock, \
+                    mock.patch.object(Manifest, "close", autospec=True) as manifest_mock, \
+                    mock.patch.object(Journal, "close", autospec=True) as journal_mock, \
+                    self.record_stdout(), \
+                    self.assertRaisesRegex(expected_exception=ValueError, expected_regex=r"^Analysis failed$"):
+                retrieval.run(
+                    directory=directory, cache_directory=output / "cache", manifest_path=output / "manifest.sqlite3",
+                    journal_path=output / "journal.sqlite3", jsonl_path=output / "results.jsonl",
+                )
+            cache_mock.assert_called_once()
+            manifest_mock.assert_called_once()
+            journal_mock.assert_called_once()
+            # The results written before the failure are available.
+            lines = (output / "results.jsonl").read_text().splitlines()
+        self.assertEqual([TYPING_EXTENSION_4_8_0__LICENSES[0].short_path], [json.loads(line)["short_path"] for line in lines])
+
     def test_archive_path(self) -> None:
         with self.record_stdout() as stdout:
             with mock.patch.object(
@@ -790,6 +1382,12 @@ License classifiers: Python Software Foundation License
             archive_path=Path("/tmp/dummy/typing_extensions-4.8.0.tar.gz"),
             retrieval_flags=1,
             job_count=1,
+            cache=None,
+            manifest=None,
+            journal=None,
+            scanner=None,
+            ordered=True,
+            policy=None,
         )
         self.assertEqual(TYPING_EXTENSION_4_8_0__LICENSES, result)
         self.assertEqual(TYPING_EXTENSION_4_8_0__EXPECTED_OUTPUT, str(stdout))
@@ -810,6 +1408,12 @@ License classifiers: Python Software Foundation License
             download_url="https://example.org/archive.tar.gz",
             retrieval_flags=1,
             job_count=1,
+            cache=None,
+            manifest=None,
+            journal=None,
+            scanner=None,
+            ordered=True,
+            policy=None,
         )
         self.assertEqual(TYPING_EXTENSION_4_8_0__LICENSES, result)
         self.assertEqual(TYPING_EXTENSION_4_8_0__EXPECTED_OUTPUT, str(stdout))
@@ -871,3 +1475,150 @@ Apache-2.0 AND (LicenseRef-scancode-unknown-license-reference AND Apache-2.0)  1
 """,  # noqa: E501, W291
             str(stdout),
         )
+
+
+class RunBatchTestCase(TestCase):
+    @contextmanager
+    def _create_archives(self) -> Generator[Path, None, None]:
+        with TemporaryDirectory() as tempdir:
+            directory = Path(tempdir)
+            for name in ["local", "downloaded", "other"]:
+                with tarfile.open(directory / f"{name}-1.0.tar.gz", "w:gz") as tar:
+                    path = directory / f"{name}.txt"
+                    path.write_text(name)
+                    tar.add(path, arcname=path.name)
+            yield directory
+
+    def test_run_batch(self) -> None:
+        scanners = []
+        caches = []
+
+        def download_package(package_definition: str, download_directory: str, **kwargs: Any) -> None:
+            if package_definition == "invalid":
+                raise ValueError("Download failed.")
+            shutil.copy(directory / f"{package_definition}-1.0.tar.gz", download_directory)
+
+        def run_on_directory(
+            directory: str, retrieval_flags: int, cache: ResultCache | None = None, scanner: Scanner | None = None,
+            policy: ScanPolicy | None = None,
+        ) -> Generator[Any, None, None]:
+            scanners.append(scanner)
+            caches.append(cache)
+            self.assertEqual(1, retrieval_flags)
+            for path, short_path in get_files_from_directory(directory):
+                yield short_path, path.read_text()
+
+        with self._create_archives() as directory, TemporaryDirectory() as cache_directory:
+            archive_path = directory / "local-1.0.tar.gz"
+            requirements_path = directory / "requirements.txt"
+            requirements_path.write_text("downloaded\ninvalid\n")
+
+            with mock.patch.object(
+                retrieval, "download_package", side_effect=download_package
+            ) as download_mock, mock.patch.object(
+                retrieval, "run_on_directory", side_effect=run_on_directory
+            ), mock.patch.object(
+                retrieval, "_print_results"
+            ) as print_mock, redirect_stdout(StringIO()), self.assertLogs(retrieval.logger) as logs:
+                result = retrieval.run_batch(
+                    sources=[str(archive_path), "downloaded"],
+                    requirements_path=requirements_path,
+                    index_url="https://example.org/simple",
+                    retrieve_copyrights=True,
+                    cache_directory=cache_directory,
+                )
+
+        self.assertEqual({str(archive_path): [("local.txt", "local")], "downloaded": [("downloaded.txt", "downloaded")]}, result)
+        self.assertEqual(2, download_mock.call_count)
+        self.assertEqual("https://example.org/simple", download_mock.call_args.kwargs["index_url"])
+
+        # All packages share the worker pool and the cache.
+        self.assertEqual(2, len(scanners))
+        self.assertIs(scanners[0], scanners[1])
+        self.assertIsNone(cast(Scanner, scanners[0])._executor)
+        self.assertIs(caches[0], caches[1])
+        self.assertIsInstance(caches[0], ResultCache)
+
+        self.assertEqual([mock.call(result[str(archive_path)]), mock.call(result["downloaded"])], print_mock.call_args_list)
+        self.assertIn("Analyzing invalid failed.", logs.output[0])
+        self.assertIn("1 of 3 sources could not be analyzed.", logs.output[1])
+
+    def test_run_batch__overlaps_download_and_analysis(self) -> None:
+        downloaded = threading.Event()
+        events = []
+
+        def download_package(package_definition: str, download_directory: str, **kwargs: Any) -> None:
+            events.append(f"download {package_definition}")
+            shutil.copy(directory / f"{package_definition}-1.0.tar.gz", download_directory)
+            if package_definition == "other":
+                downloaded.set()
+
+        def run_on_directory(directory: str, **kwargs: Any) -> Generator[Any, None, None]:
+            name = next(get_files_from_directory(directory))[1]
+            events.append(f"analyze {name}")
+            # The next package is downloaded while analyzing the current one.
+            if name == "downloaded.txt":
+                self.assertTrue(downloaded.wait(timeout=10))
+            yield name
+
+        with self._create_archives() as directory:
+            with mock.patch.object(
+                retrieval, "download_package", side_effect=download_package
+            ), mock.patch.object(
+                retrieval, "run_on_directory", side_effect=run_on_directory
+            ), mock.patch.object(retrieval, "_print_results"), redirect_stdout(StringIO()):
+                result = retrieval.run_batch(sources=["downloaded", "other"], job_count=1, download_count=1)
+
+        self.assertEqual({"downloaded": ["downloaded.txt"], "other": ["other.txt"]}, result)
+        self.assertCountEqual(["download downloaded", "download other", "analyze downloaded.txt", "analyze other.txt"], events)
+        self.assertEqual("download downloaded", events[0])
+        self.assertEqual("analyze other.txt", events[-1])
+
+    def test_run_batch__concurrent_downloads(self) -> None:
+        # Both downloads have to run at the same time to pass the barrier.
+        barrier = threading.Barrier(2, timeout=10)
+        other_downloaded = threading.Event()
+
+        def download_package(package_definition: str, download_directory: str, **kwargs: Any) -> None:
+            if package_definition == "downloaded":
+                barrier.wait()
+                # Finish after the next package to check the order of the results.
+                self.assertTrue(other_downloaded.wait(timeout=10))
+            shutil.copy(directory / f"{package_definition}-1.0.tar.gz", download_directory)
+
+        def download_file(url: str, file_object: BinaryIO) -> None:
+            self.assertEqual("https://example.org/packages/other-1.0.tar.gz?download=1", url)
+            barrier.wait()
+            file_object.write(directory.joinpath("other-1.0.tar.gz").read_bytes())
+            other_downloaded.set()
+
+        def run_on_directory(directory: str, **kwargs: Any) -> Generator[Any, None, None]:
+            yield next(get_files_from_directory(directory))[1]
+
+        url = "https://example.org/packages/other-1.0.tar.gz?download=1"
+        with self._create_archives() as directory:
+            with mock.patch.object(
+                retrieval, "download_package", side_effect=download_package
+            ), mock.patch.object(
+                retrieval, "download_file", side_effect=download_file
+            ), mock.patch.object(
+                retrieval, "run_on_directory", side_effect=run_on_directory
+            ), mock.patch.object(retrieval, "_print_results") as print_mock, redirect_stdout(StringIO()):
+                result = retrieval.run_batch(sources=["downloaded", url], job_count=1, download_count=2)
+
+        self.assertEqual({"downloaded": ["downloaded.txt"], url: ["other.txt"]}, result)
+        self.assertEqual([mock.call(["downloaded.txt"]), mock.call(["other.txt"])], print_mock.call_args_list)
+
+    def test_run_batch__multiple_downloaded_files(self) -> None:
+        def download_package(package_definition: str, download_directory: str, **kwargs: Any) -> None:
+            Path(download_directory, "a.whl").touch()
+            Path(download_directory, "b.whl").touch()
+
+        with mock.patch.object(retrieval, "download_package", side_effect=download_package), redirect_stdout(StringIO()), self.assertLogs(
+            retrieval.logger
+        ) as logs:
+            result = retrieval.run_batch(sources=["package"], job_count=1)
+
+        self.assertEqual({}, result)
+        self.assertIn("Analyzing package failed.", logs.output[0])
+        self.assertIn("ValueError: Expected one downloaded file for package, got 2.", logs.output[0])
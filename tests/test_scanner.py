@@ -0,0 +1,214 @@
+# Copyright (c) stefan6419846. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+
+from __future__ import annotations
+
+import itertools
+import os
+import threading
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Any, Generator
+from unittest import mock, TestCase
+
+from joblib.externals.loky import get_reusable_executor  # type: ignore[import-untyped]
+
+from license_tools import retrieval, scanner
+from license_tools.scanner import Scanner
+from license_tools.tools import scancode_tools
+from license_tools.utils import resource_utils
+from license_tools.utils.resource_utils import MemoryController
+
+
+def _get_pid(value: int) -> tuple[int, int]:
+    return value, os.getpid()
+
+
+def _sleep(value: int) -> int:
+    time.sleep(value)
+    return value
+
+
+def _fail(value: int) -> None:
+    raise ValueError(f"Invalid value {value}")
+
+
+def _stop_joblib_workers() -> None:
+    # The process pool of joblib keeps running after earlier analysis runs, including its threads.
+    get_reusable_executor().shutdown(wait=True)
+
+
+class InitializeWorkerTestCase(TestCase):
+    def test_initialize_worker(self) -> None:
+        with mock.patch("atexit.register") as register_mock, mock.patch.object(scancode_tools, "load_index") as load_mock:
+            scanner.initialize_worker(preload_index=False)
+        register_mock.assert_called_once()
+        load_mock.assert_not_called()
+
+        with mock.patch("atexit.register"), mock.patch.object(scancode_tools, "load_index") as load_mock:
+            scanner.initialize_worker(preload_index=True)
+        load_mock.assert_called_once_with()
+
+        with mock.patch("atexit.register") as register_mock, mock.patch.object(scancode_tools, "load_index") as load_mock:
+            scanner.initialize_worker(preload_index=False, register_cleanup=False)
+        register_mock.assert_not_called()
+        load_mock.assert_not_called()
+
+
+class MeasureWorkerMemoryTestCase(TestCase):
+    def test_measure_worker_memory(self) -> None:
+        # The license index dominates the memory usage.
+        self.assertLess(100 * 1024 * 1024, scanner.measure_worker_memory() or 0)
+
+    def test_measure_worker_memory__failure(self) -> None:
+        with mock.patch.object(scanner, "ProcessPoolExecutor", side_effect=OSError("No processes left")), \
+                self.assertLogs(scanner.logger, level="WARNING") as logs:
+            self.assertIsNone(scanner.measure_worker_memory())
+        self.assertEqual(["WARNING:license_tools.scanner:Could not measure the memory usage of a worker: No processes left"], logs.output)
+
+
+class ScannerTestCase(TestCase):
+    def test_synchronous(self) -> None:
+        with Scanner(job_count=1) as instance:
+            results = list(instance.map(_get_pid, [dict(value=value) for value in range(5)]))
+            self.assertEqual([(value, os.getpid()) for value in range(5)], results)
+
+            future = instance.submit(_fail, 42)
+            with self.assertRaisesRegex(expected_exception=ValueError, expected_regex=r"^Invalid value 42$"):
+                future.result()
+        self.assertIsNone(instance._executor)
+
+    def test_map__lazy(self) -> None:
+        consumed = []
+
+        def get_arguments() -> Generator[dict[str, Any], None, None]:
+            for value in range(10):
+                consumed.append(value)
+                yield dict(value=value)
+
+        with Scanner(job_count=1) as instance:
+            results = instance.map(_get_pid, get_arguments())
+            self.assertEqual((0, os.getpid()), next(results))
+            self.assertEqual([0, 1], consumed)
+            self.assertEqual(list(range(1, 10)), [value for value, _ in results])
+        self.assertEqual(list(range(10)), consumed)
+
+    def test_parallel__reuses_workers(self) -> None:
+        with Scanner(job_count=2, preload_index=False) as instance:
+            first = list(instance.map(_get_pid, [dict(value=value) for value in range(10)]))
+            executor = instance.executor
+            second = list(instance.map(_get_pid, [dict(value=value) for value in range(10)]))
+            self.assertIs(executor, instance.executor)
+
+        self.assertEqual(list(range(10)), [value for value, _ in first])
+        self.assertEqual(list(range(10)), [value for value, _ in second])
+        first_pids = {pid for _, pid in first}
+        second_pids = {pid for _, pid in second}
+        self.assertNotIn(os.getpid(), first_pids | second_pids)
+        self.assertLessEqual(len(first_pids | second_pids), 2)
+        self.assertIsNone(instance._executor)
+
+    def test_parallel__unordered(self) -> None:
+        with Scanner(job_count=2, preload_index=False) as instance:
+            # Start the workers beforehand.
+            list(instance.map(_get_pid, [dict(value=value) for value in range(2)]))
+            ordered = list(instance.map(_sleep, [dict(value=2), dict(value=0)]))
+            unordered = list(instance.map(_sleep, [dict(value=2), dict(value=0)], ordered=False))
+        self.assertEqual([2, 0], ordered)
+        self.assertEqual([0, 2], unordered)
+
+    def test_parallel__fork(self) -> None:
+        _stop_joblib_workers()
+        with mock.patch.object(scancode_tools, "load_index") as load_mock, mock.patch("gc.freeze") as freeze_mock, \
+                mock.patch("gc.unfreeze") as unfreeze_mock:
+            with Scanner(job_count=2, start_method="fork") as instance:
+                results = list(instance.map(_get_pid, [dict(value=value) for value in range(10)]))
+                unfreeze_mock.assert_not_called()
+            # Closing the scanner undoes the freezing.
+            unfreeze_mock.assert_called_once_with()
+            instance.close()
+            unfreeze_mock.assert_called_once_with()
+        load_mock.assert_called_once_with()
+        freeze_mock.assert_called_once_with()
+        self.assertEqual(list(range(10)), [value for value, _ in results])
+        self.assertNotIn(os.getpid(), {pid for _, pid in results})
+
+    def test_parallel__fork__eager(self) -> None:
+        _stop_joblib_workers()
+        with Scanner(job_count=2, preload_index=False, start_method="fork") as instance:
+            # All workers are running before any task has been submitted.
+            self.assertEqual(2, len(instance._executor._processes))  # type: ignore[union-attr]
+
+    def test_parallel__fork__threads(self) -> None:
+        event = threading.Event()
+        thread = threading.Thread(target=event.wait)
+        thread.start()
+        try:
+            with self.assertRaisesRegex(expected_exception=RuntimeError, expected_regex=r"^Cannot fork the workers while other threads are running\.$"):
+                Scanner(job_count=2, preload_index=False, start_method="fork")
+        finally:
+            event.set()
+            thread.join()
+
+    def test_controller(self) -> None:
+        controller = MemoryController(maximum=4, memory_limit=1024 ** 4, interval=0)
+        scheduled = []
+        with Scanner(job_count=1, controller=controller) as instance:
+            submit = instance.submit
+
+            def record(*args: Any, **kwargs: Any) -> Any:
+                scheduled.append(args[2]["value"])
+                return submit(*args, **kwargs)
+
+            usages = iter([900] * 4 + [100] * 7)
+            with mock.patch.object(instance, "submit", side_effect=record), \
+                    mock.patch.object(resource_utils, "get_memory_usage", side_effect=lambda root: next(usages) * 1024 ** 3):
+                results = instance.map(_get_pid, [dict(value=value) for value in range(10)])
+                # Only as many calls as the controller allows are scheduled.
+                self.assertEqual((0, os.getpid()), next(results))
+                self.assertEqual([0, 1, 2], scheduled)
+                self.assertEqual(3, controller.job_count)
+                self.assertEqual(list(range(1, 10)), [value for value, _ in results])
+        self.assertEqual(list(range(10)), scheduled)
+        self.assertEqual(4, controller.job_count)
+        self.assertGreater(controller.worker_memory, 0)
+
+    def test_controller__resize(self) -> None:
+        controller = MemoryController(maximum=2, memory_limit=1024 ** 4, interval=0)
+        usages = itertools.chain([100], itertools.repeat(900))
+        with Scanner(job_count=2, preload_index=False, controller=controller) as instance, \
+                mock.patch.object(resource_utils, "get_memory_usage", side_effect=lambda root: next(usages) * 1024 ** 3):
+            results = list(instance.map(_get_pid, [dict(value=value) for value in range(6)]))
+            self.assertEqual(1, instance._worker_count)
+            self.assertEqual(1, instance.executor._max_workers)  # type: ignore[attr-defined]
+        self.assertEqual(list(range(6)), [value for value, _ in results])
+        # The first two calls are running in the initial pool, the others in the smaller one.
+        first_pids = {pid for _, pid in results[:2]}
+        later_pids = {pid for _, pid in results[2:]}
+        self.assertEqual(1, len(later_pids))
+        self.assertFalse(first_pids & later_pids)
+        self.assertEqual(2, instance._worker_count)
+
+    def test_invalid_start_method(self) -> None:
+        with self.assertRaisesRegex(expected_exception=ValueError, expected_regex=r"^Unsupported start method: forkserver$"):
+            Scanner(start_method="forkserver")  # type: ignore[arg-type]
+
+    def test_run_on_directory(self) -> None:
+        with TemporaryDirectory() as tempdir:
+            directory = Path(tempdir)
+            directory.joinpath("LICENSE").write_text("Apache-2.0")
+            directory.joinpath("README").write_text("CC-BY-2.0")
+
+            # Run inside the current process, as each worker would load its own copy of the license index.
+            with Scanner(job_count=1) as instance:
+                first = list(retrieval.run_on_directory(tempdir, scanner=instance))
+                second = list(retrieval.run_on_directory(tempdir, scanner=instance))
+
+        self.assertEqual(["LICENSE", "README"], [result.short_path for result in first])
+        self.assertEqual(
+            ["Apache-2.0", "CC-BY-2.0"],
+            [result.licenses.detected_license_expression_spdx for result in first if result.licenses]
+        )
+        self.assertEqual(first, second)
@@ -0,0 +1,137 @@
+# Copyright (c) stefan6419846. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+
+from __future__ import annotations
+
+import json
+import socket
+import threading
+from http.client import HTTPConnection, HTTPResponse
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Any, cast
+from unittest import mock, TestCase
+
+from license_tools import retrieval, server
+from license_tools.retrieval import RetrievalFlags
+from license_tools.server import JobError
+
+
+class _UnixHTTPConnection(HTTPConnection):
+    def __init__(self, path: str) -> None:
+        super().__init__("localhost")
+        self.path = path
+
+    def connect(self) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+
+
+class ParseJobTestCase(TestCase):
+    def test_valid(self) -> None:
+        self.assertEqual(
+            dict(directory="/tmp/source", retrieval_flags=RetrievalFlags.COPYRIGHTS | RetrievalFlags.URLS),
+            server.parse_job(b'{"directory": "/tmp/source", "retrieve_copyrights": true, "retrieve_urls": true, "retrieve_emails": false}'),
+        )
+        self.assertEqual(
+            dict(package_definition="django", index_url="https://example.org", prefer_sdist=True, retrieval_flags=RetrievalFlags.PYTHON_METADATA),
+            server.parse_job(
+                b'{"package_definition": "django", "index_url": "https://example.org", "prefer_sdist": true, "retrieve_python_metadata": true}'
+            ),
+        )
+        # Python metadata is only available for packages.
+        self.assertEqual(
+            dict(file_path="/tmp/file.py", retrieval_flags=0), server.parse_job(b'{"file_path": "/tmp/file.py", "retrieve_python_metadata": true}')
+        )
+
+    def test_invalid(self) -> None:
+        for data, message in [
+            (b"[", r"^Invalid JSON: "),
+            (b"[]", r"^The job has to be an object\.$"),
+            (b'{"directory": "/tmp", "retrieve_everything": true}', r"^Unknown keys: retrieve_everything$"),
+            (b"{}", r"^Exactly one source is required: "),
+            (b'{"directory": "/tmp", "file_path": "/tmp/file.py"}', r"^Exactly one source is required: "),
+            (b'{"directory": ["/tmp"]}', r"^directory has to be a string\.$"),
+            (b'{"directory": "/tmp", "retrieve_urls": 1}', r"^retrieve_urls has to be a boolean\.$"),
+        ]:
+            with self.subTest(data=data):
+                with self.assertRaisesRegex(expected_exception=JobError, expected_regex=message):
+                    server.parse_job(data)
+
+
+class ServerTestCase(TestCase):
+    def _start(self, address: str | tuple[str, int]) -> server.SERVER_TYPE:
+        # Run inside the current process, as each worker would load its own copy of the license index.
+        instance = server.create_server(address=address, job_count=1)
+        thread = threading.Thread(target=instance.serve_forever)
+        thread.start()
+
+        def stop() -> None:
+            instance.shutdown()
+            thread.join()
+            instance.server_close()
+            instance.scanner.close()
+
+        self.addCleanup(stop)
+        return instance
+
+    def _post(self, connection: HTTPConnection, job: dict[str, Any]) -> HTTPResponse:
+        connection.request("POST", "/scan", body=json.dumps(job), headers={"Content-Type": "application/json"})
+        return connection.getresponse()
+
+    def test_tcp(self) -> None:
+        instance = self._start(("127.0.0.1", 0))
+        host, port = cast(tuple[str, int], instance.server_address)
+
+        with TemporaryDirectory() as tempdir:
+            directory = Path(tempdir)
+            directory.joinpath("LICENSE").write_text("Apache-2.0")
+            directory.joinpath("README").write_text("CC-BY-2.0")
+
+            connection = HTTPConnection(str(host), int(port), timeout=120)
+            response = self._post(connection, {"directory": tempdir})
+            self.assertEqual(200, response.status)
+            self.assertEqual("application/x-ndjson", response.headers["Content-Type"])
+            results = [json.loads(line) for line in response]
+            connection.close()
+
+        self.assertEqual(["LICENSE", "README"], [result["short_path"] for result in results])
+        self.assertEqual(["Apache-2.0", "CC-BY-2.0"], [result["licenses"]["detected_license_expression_spdx"] for result in results])
+        self.assertEqual(str(directory / "LICENSE"), results[0]["path"])
+
+    def test_unix_socket(self) -> None:
+        with TemporaryDirectory() as tempdir:
+            path = str(Path(tempdir) / "server.sock")
+            self._start(path)
+
+            connection = _UnixHTTPConnection(path)
+            connection.request("GET", "/health")
+            response = connection.getresponse()
+            self.assertEqual(200, response.status)
+            self.assertEqual({"status": "ok"}, json.loads(response.read()))
+
+            response = self._post(connection, {"directory": tempdir, "retrieve_anything": True})
+            self.assertEqual(400, response.status)
+            self.assertEqual({"error": "Unknown keys: retrieve_anything"}, json.loads(response.read()))
+
+            connection.request("GET", "/unknown")
+            self.assertEqual(404, connection.getresponse().status)
+            connection.close()
+
+    def test_failure(self) -> None:
+        instance = self._start(("127.0.0.1", 0))
+        host, port = cast(tuple[str, int], instance.server_address)
+
+        def run_on_source(**kwargs: Any) -> Any:
+            yield retrieval._get_dummy_file_results(path=Path("/tmp/first.txt"), short_path="first.txt")
+            raise OSError("Disk failure")
+
+        connection = HTTPConnection(str(host), int(port), timeout=30)
+        with mock.patch.object(retrieval, "run_on_source", side_effect=run_on_source), self.assertLogs(server.logger, level="ERROR"):
+            response = self._post(connection, {"file_path": "/tmp/first.txt"})
+            lines = [json.loads(line) for line in response]
+        connection.close()
+
+        self.assertEqual("first.txt", lines[0]["short_path"])
+        self.assertEqual({"error": "OSError: Disk failure"}, lines[1])
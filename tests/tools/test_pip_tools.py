@@ -233,3 +233,25 @@ class DownloadPackageTestCase(TestCase):
             self.assertEqual(
                 2, subprocess_mock.call_count, subprocess_mock.call_args_list
             )
+
+
+class ReadRequirementsFileTestCase(TestCase):
+    def test_read_requirements_file(self) -> None:
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / "requirements.txt"
+            path.write_text(
+                """# Comment
+--index-url https://example.org/simple
+-r other.txt
+-e .
+
+requests==2.31.0  # Inline comment.
+typing_extensions==4.8.0 \\
+    --hash=sha256:8f92fc8806f9a6b641eaa5318da32b44d401efaac0f6678c9bc448ba3605faa0
+pypdf>=3 ; python_version >= "3.8"
+"""
+            )
+            self.assertEqual(
+                ["requests==2.31.0", "typing_extensions==4.8.0", 'pypdf>=3 ; python_version >= "3.8"'],
+                pip_tools.read_requirements_file(path),
+            )
@@ -5,10 +5,15 @@
 from __future__ import annotations
 
 import datetime
+import os
+from contextlib import contextmanager
 from pathlib import Path
 from tempfile import mkdtemp, NamedTemporaryFile
-from typing import cast, Dict
-from unittest import TestCase
+from typing import Any, cast, Dict, Generator
+from unittest import mock, TestCase
+
+from licensedcode import tokenize  # type: ignore[import-untyped]
+from textcode import analysis  # type: ignore[import-untyped]
 
 from license_tools.retrieval import RetrievalFlags
 from license_tools.tools import scancode_tools
@@ -20,7 +25,7 @@ from license_tools.tools.scancode_tools import (
     FileResults,
     Holder,
     LicenseDetection, LicenseMatch, Licenses,
-    PackageResults, Party, Url,
+    PackageResults, Party, TextWindow, Url,
     Urls,
 )
 from tests import get_from_url
@@ -39,6 +44,28 @@ class LicensesTestCase(TestCase):
         result = licenses.get_scores_of_detected_license_expression_spdx()
         self.assertEqual([100.0], result)
 
+    def test_from_spdx_tags(self) -> None:
+        # 1) The SPDX match is the same as reported by the matcher.
+        licenses = cast(Licenses, Licenses.from_spdx_tags(analysis.numbered_text_lines(str(SETUP_PATH))))
+        self.assertEqual(("apache-2.0", "Apache-2.0"), (licenses.detected_license_expression, licenses.detected_license_expression_spdx))
+        self.assertEqual(1, len(licenses.license_detections))
+        self.assertEqual(SETUP_PY_LICENSES.license_detections[0].matches[0], licenses.license_detections[0].matches[0])
+        self.assertLess(0, licenses.percentage_of_license_text)
+
+        # 2) Multiple tags are combined.
+        licenses = cast(Licenses, Licenses.from_spdx_tags([
+            (1, "// SPDX-License-Identifier: MIT\n"),
+            (2, "int x = 1;\n"),
+            (3, "/* SPDX-License-Identifier: GPL-2.0-or-later WITH Linux-syscall-note */\n"),
+        ]))
+        self.assertEqual("MIT AND GPL-2.0-or-later WITH Linux-syscall-note", licenses.detected_license_expression_spdx)
+        self.assertEqual([1, 3], [detection.matches[0].start_line for detection in licenses.license_detections])
+
+        # 3) Files without tags or with unknown identifiers require the matcher.
+        self.assertIsNone(Licenses.from_spdx_tags([(1, "# Licensed under the MIT license.\n")]))
+        self.assertIsNone(Licenses.from_spdx_tags([(1, "# SPDX-License-Identifier: MIT\n"), (2, "# SPDX-License-Identifier: LicenseRef-Custom\n")]))
+        self.assertIsNone(Licenses.from_spdx_tags([(1, 'TAG = "SPDX-License-Identifier:"\n')]))
+
 
 class FileResultsTestCase(TestCase):
     def assert_not_requested(
@@ -181,6 +208,196 @@ class FileResultsTestCase(TestCase):
         )
         self.assertEqual(expected, result.file_info)
 
+    def test_text_lines_are_extracted_once(self) -> None:
+        buffers = []
+        shared_text_lines = scancode_tools.shared_text_lines
+
+        @contextmanager
+        def record_buffer(**kwargs: Any) -> Generator[Any, None, None]:
+            with shared_text_lines(**kwargs) as buffer:
+                yield buffer
+                buffers.append(dict(buffer))
+
+        with mock.patch.object(scancode_tools, "shared_text_lines", side_effect=record_buffer):
+            result = FileResults(
+                path=SETUP_PATH, short_path="setup.py", retrieve_licenses=True,
+                retrieve_copyrights=True, retrieve_emails=True, retrieve_urls=True,
+            )
+        # All detectors share the same lines.
+        self.assertEqual(1, len(buffers))
+        self.assertEqual([(str(SETUP_PATH), False, False, 1, False)], list(buffers[0]))
+        self.assertEqual(list(analysis.numbered_text_lines(str(SETUP_PATH))), buffers[0][(str(SETUP_PATH), False, False, 1, False)])
+        self.assertEqual(SETUP_PY_LICENSES, result.licenses)
+        self.assertEqual(2, len(cast(Urls, result.urls).urls))
+        self.assertEqual(1, len(cast(Copyrights, result.copyrights).copyrights))
+        self.assertIsNone(scancode_tools._text_lines_cache.lines)
+
+    def test_text_window(self) -> None:
+        with NamedTemporaryFile(suffix=".py") as fd:
+            fd.write(b"# SPDX-License-Identifier: MIT\n" + b"x = 1\n" * 10 + b"# SPDX-License-Identifier: Apache-2.0\n")
+            fd.flush()
+            complete = FileResults(path=Path(fd.name), short_path="file.py", retrieve_licenses=True)
+            header = FileResults(path=Path(fd.name), short_path="file.py", retrieve_licenses=True, text_window=TextWindow(line_count=5))
+            footer = FileResults(
+                path=Path(fd.name), short_path="file.py", retrieve_licenses=True, retrieve_copyrights=True,
+                text_window=TextWindow(line_count=0, tail_line_count=1),
+            )
+            large = FileResults(path=Path(fd.name), short_path="file.py", retrieve_licenses=True, text_window=TextWindow(line_count=100))
+        self.assertEqual("MIT AND Apache-2.0", cast(Licenses, complete.licenses).detected_license_expression_spdx)
+        self.assertFalse(complete.partial)
+        self.assertEqual("MIT", cast(Licenses, header.licenses).detected_license_expression_spdx)
+        self.assertTrue(header.partial)
+        self.assertEqual("Apache-2.0", cast(Licenses, footer.licenses).detected_license_expression_spdx)
+        # The original line numbers are retained.
+        self.assertEqual(12, cast(Licenses, footer.licenses).license_detections[0].matches[0].start_line)
+        self.assertTrue(footer.partial)
+        self.assertEqual(complete.licenses, large.licenses)
+        self.assertFalse(large.partial)
+
+    def test_spdx_fast_path(self) -> None:
+        # 1) Tagged files do not run the matcher.
+        with mock.patch("scancode.api.get_licenses") as licenses_mock:
+            result = FileResults(path=SETUP_PATH, short_path="setup.py", retrieve_licenses=True, spdx_fast_path=True)
+        licenses_mock.assert_not_called()
+        self.assertEqual("Apache-2.0", cast(Licenses, result.licenses).detected_license_expression_spdx)
+
+        # 2) Files without tags run the matcher.
+        result = FileResults(path=LICENSE_PATH, short_path="LICENSE.txt", retrieve_licenses=True, spdx_fast_path=True)
+        self.assertEqual("Apache-2.0", cast(Licenses, result.licenses).detected_license_expression_spdx)
+        self.assertEqual({"1-hash"}, {match.matcher for detection in cast(Licenses, result.licenses).license_detections for match in detection.matches})
+
+        # 3) Verification reports the matcher results and warns about deviations.
+        with NamedTemporaryFile(suffix=".py") as fd:
+            fd.write(
+                b"# SPDX-License-Identifier: MIT\n#\n"
+                + b'# Licensed under the Apache License, Version 2.0 (the "License");\n'
+                + b"# you may not use this file except in compliance with the License.\n"
+            )
+            fd.flush()
+            with self.assertLogs(scancode_tools.logger, level="WARNING") as logs:
+                result = FileResults(path=Path(fd.name), short_path="file.py", retrieve_licenses=True, verify_spdx_tags=True)
+        self.assertEqual("MIT AND Apache-2.0", cast(Licenses, result.licenses).detected_license_expression_spdx)
+        self.assertEqual(
+            ["WARNING:license_tools.tools.scancode_tools:SPDX tags of file.py declare MIT, but the license matching found MIT AND Apache-2.0."],
+            logs.output,
+        )
+
+    def test_comments_only(self) -> None:
+        with NamedTemporaryFile(suffix=".c") as fd:
+            fd.write(
+                b"/*\n * SPDX-License-Identifier: MIT\n */\n"
+                + b"int x = 1;\n" * 10
+                + b'const char *license = "SPDX-License-Identifier: Apache-2.0";\n'
+                + b"int y = 2;  // SPDX-License-Identifier: BSD-3-Clause\n"
+                + b'const char *contact = "mail@license-tools.dev";\n'
+            )
+            fd.flush()
+            complete = FileResults(path=Path(fd.name), short_path="file.c", retrieve_licenses=True)
+            comments = FileResults(
+                path=Path(fd.name), short_path="file.c", retrieve_licenses=True, retrieve_emails=True, comments_only=True,
+            )
+            header = FileResults(
+                path=Path(fd.name), short_path="file.c", retrieve_licenses=True, comments_only=True,
+                text_window=TextWindow(line_count=3),
+            )
+        self.assertEqual("MIT AND (Apache-2.0 AND BSD-3-Clause)", cast(Licenses, complete.licenses).detected_license_expression_spdx)
+        self.assertEqual("MIT AND BSD-3-Clause", cast(Licenses, comments.licenses).detected_license_expression_spdx)
+        # The original line numbers are retained.
+        self.assertEqual(15, cast(Licenses, comments.licenses).license_detections[1].matches[0].start_line)
+        self.assertFalse(comments.partial)
+        # The other detectors analyze the code as well.
+        self.assertEqual(["mail@license-tools.dev"], [email.email for email in cast(Emails, comments.emails).emails])
+        # The window applies to the comment lines only.
+        self.assertEqual("MIT", cast(Licenses, header.licenses).detected_license_expression_spdx)
+        self.assertTrue(header.partial)
+
+
+class SharedTextLinesTestCase(TestCase):
+    def test_shared_text_lines(self) -> None:
+        original_functions = analysis.numbered_text_lines, tokenize.numbered_text_lines
+        first = list(analysis.numbered_text_lines(str(SETUP_PATH)))
+
+        # 1) Inside the context, the lines are extracted once and reused.
+        with mock.patch.object(
+                scancode_tools, "_numbered_text_lines", side_effect=scancode_tools._numbered_text_lines
+        ) as lines_mock:
+            with scancode_tools.shared_text_lines() as buffer:
+                third = list(analysis.numbered_text_lines(str(SETUP_PATH)))
+                fourth = list(tokenize.numbered_text_lines(str(SETUP_PATH)))
+                self.assertEqual({(str(SETUP_PATH), False, False, 1, False): first}, buffer)
+        self.assertEqual(first, third)
+        self.assertEqual(first, fourth)
+        lines_mock.assert_called_once()
+
+        # 2) Lists of lines are passed through.
+        with scancode_tools.shared_text_lines() as buffer:
+            self.assertEqual([(1, "a"), (2, "b")], list(analysis.numbered_text_lines(["a", "b"])))
+        self.assertEqual({}, buffer)
+
+        # 3) The ScanCode functions are only replaced while any thread is inside the context.
+        self.assertEqual(original_functions, (analysis.numbered_text_lines, tokenize.numbered_text_lines))
+        with scancode_tools.shared_text_lines():
+            with scancode_tools.shared_text_lines():
+                self.assertIs(scancode_tools._cached_numbered_text_lines, analysis.numbered_text_lines)
+            self.assertIs(scancode_tools._cached_numbered_text_lines, tokenize.numbered_text_lines)
+        self.assertEqual(original_functions, (analysis.numbered_text_lines, tokenize.numbered_text_lines))
+
+    def test_shared_text_lines__disabled(self) -> None:
+        original_functions = analysis.numbered_text_lines, tokenize.numbered_text_lines
+        with mock.patch.dict(os.environ, {"LICENSE_TOOLS_DISABLE_SHARED_TEXT_LINES": "true"}):
+            with scancode_tools.shared_text_lines() as buffer:
+                self.assertEqual(original_functions, (analysis.numbered_text_lines, tokenize.numbered_text_lines))
+            self.assertEqual({}, buffer)
+            result = FileResults(path=SETUP_PATH, short_path="setup.py", retrieve_licenses=True)
+            self.assertEqual(SETUP_PY_LICENSES, result.licenses)
+
+            with self.assertRaisesRegex(ValueError, r"^Text windows are not available with LICENSE_TOOLS_DISABLE_SHARED_TEXT_LINES=true\.$"):
+                FileResults(path=SETUP_PATH, short_path="setup.py", retrieve_licenses=True, text_window=TextWindow(line_count=3))
+            with self.assertRaisesRegex(ValueError, r"^The comment filter is not available with LICENSE_TOOLS_DISABLE_SHARED_TEXT_LINES=true\.$"):
+                FileResults(path=SETUP_PATH, short_path="setup.py", retrieve_licenses=True, comments_only=True)
+
+    def test_shared_text_lines__window(self) -> None:
+        first = list(analysis.numbered_text_lines(str(SETUP_PATH)))
+        with scancode_tools.shared_text_lines(window=TextWindow(line_count=3)):
+            self.assertEqual(first[:3], list(analysis.numbered_text_lines(str(SETUP_PATH))))
+            self.assertTrue(scancode_tools._text_lines_cache.partial)
+        self.assertIsNone(scancode_tools._text_lines_cache.window)
+        self.assertFalse(scancode_tools._text_lines_cache.partial)
+
+    def test_comment_lines_only(self) -> None:
+        first = list(analysis.numbered_text_lines(str(SETUP_PATH)))
+        with scancode_tools.shared_text_lines():
+            with scancode_tools.comment_lines_only():
+                comments = list(analysis.numbered_text_lines(str(SETUP_PATH)))
+            # The complete lines are still available outside of the nested context.
+            self.assertEqual(first, list(analysis.numbered_text_lines(str(SETUP_PATH))))
+        self.assertLess(len(comments), len(first))
+        self.assertEqual(first[0], comments[0])
+        self.assertTrue(all(line.lstrip().startswith("#") for _, line in comments))
+        self.assertFalse(scancode_tools._text_lines_cache.comments_only)
+
+
+class TextWindowTestCase(TestCase):
+    def test_apply(self) -> None:
+        lines = [(1, "a" * 10), (2, "b" * 10), (3, "c" * 10), (4, "d" * 10), (5, "e" * 10)]
+        for window, expected in [
+            (TextWindow(), (lines, False)),
+            (TextWindow(line_count=5), (lines, False)),
+            (TextWindow(line_count=2), (lines[:2], True)),
+            (TextWindow(size=25), ([(1, "a" * 10), (2, "b" * 10), (3, "c" * 5)], True)),
+            (TextWindow(size=20), (lines[:2], True)),
+            (TextWindow(size=50), (lines, False)),
+            (TextWindow(line_count=2, size=15), ([(1, "a" * 10), (2, "b" * 5)], True)),
+            (TextWindow(line_count=2, tail_line_count=2), (lines[:2] + lines[3:], True)),
+            (TextWindow(line_count=1, tail_line_count=10), (lines, True)),
+            (TextWindow(size=25, tail_line_count=1), ([(1, "a" * 10), (2, "b" * 10), (3, "c" * 5), (5, "e" * 10)], True)),
+            (TextWindow(size=45, tail_line_count=1), ([*lines[:4], (5, "e" * 5)], True)),
+            (TextWindow(line_count=0), ([], True)),
+        ]:
+            with self.subTest(window=window):
+                self.assertEqual(expected, window.apply(iter(lines)))
+        self.assertEqual(([], False), TextWindow(line_count=0).apply([]))
+
 
 class PackageResultsTestCase(TestCase):
     def test_rpm(self) -> None:
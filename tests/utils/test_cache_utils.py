@@ -0,0 +1,331 @@
+# Copyright (c) stefan6419846. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+
+from __future__ import annotations
+
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import mock, TestCase
+
+from license_tools.utils import cache_utils
+from license_tools.utils.cache_utils import CacheStatistics, Journal, Manifest, ResultCache
+
+
+def _store_and_load(cache: ResultCache, key: str) -> str | None:
+    cache.set(key, f"value of {key}")
+    value = cache.get(key)
+    cache.flush()
+    return value  # type: ignore[no-any-return]
+
+
+class GetFileHashTestCase(TestCase):
+    def test_get_file_hash(self) -> None:
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / "file.txt"
+            path.write_bytes(b"Hello World!\n")
+            self.assertEqual(
+                "03ba204e50d126e4674c005e04d82e84c21366780af1f43bd54a37816b6ab340",
+                cache_utils.get_file_hash(path),
+            )
+
+
+class DatabaseTestCase(TestCase):
+    def test_abstract(self) -> None:
+        with self.assertRaisesRegex(TypeError, r"abstract method '?_initialize"):
+            cache_utils._Database(path="database.sqlite3")  # type: ignore[abstract]
+
+
+class ResultCacheTestCase(TestCase):
+    def test_get_and_set(self) -> None:
+        with TemporaryDirectory() as directory:
+            cache = ResultCache(directory=Path(directory) / "cache")
+            self.assertIsNone(cache.get("key"))
+            cache.set("key", {"value": [1, 2, 3]})
+            self.assertEqual({"value": [1, 2, 3]}, cache.get("key"))
+            cache.set("key", "replaced")
+            self.assertEqual("replaced", cache.get("key"))
+            self.assertEqual(
+                CacheStatistics(hits=2, misses=1, entries=1, size=len(pickle.dumps("replaced", protocol=pickle.HIGHEST_PROTOCOL))),
+                cache.get_statistics(),
+            )
+
+            # The data is persistent.
+            cache.close()
+            cache = ResultCache(directory=Path(directory) / "cache")
+            self.assertEqual("replaced", cache.get("key"))
+            self.assertEqual(3, cache.get_statistics().hits)
+
+            cache.clear()
+            self.assertIsNone(cache.get("key"))
+            self.assertEqual(CacheStatistics(hits=0, misses=1, entries=0, size=0), cache.get_statistics())
+            cache.close()
+
+    def test_eviction(self) -> None:
+        value = "x" * 100
+        size = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        with TemporaryDirectory() as directory:
+            cache = ResultCache(directory=directory, maximum_size=3 * size)
+            cache.set("key1", value)
+            cache.set("key2", value)
+            cache.set("key3", value)
+            # Mark the first entry as recently used.
+            self.assertEqual(value, cache.get("key1"))
+
+            cache.set("key4", value)
+            self.assertIsNone(cache.get("key2"))
+            self.assertEqual(value, cache.get("key1"))
+            self.assertEqual(value, cache.get("key3"))
+            self.assertEqual(value, cache.get("key4"))
+            self.assertEqual(3, cache.get_statistics().entries)
+
+            # Too large values are not stored at all.
+            with self.assertLogs(cache_utils.logger, level="WARNING") as logs:
+                cache.set("key5", value * 4)
+            self.assertEqual(
+                [
+                    f"WARNING:license_tools.utils.cache_utils:Not caching key5 with {len(pickle.dumps(value * 4, protocol=pickle.HIGHEST_PROTOCOL))} "
+                    "bytes, as it exceeds the cache size."
+                ],
+                logs.output,
+            )
+            self.assertIsNone(cache.get("key5"))
+            self.assertEqual(3, cache.get_statistics().entries)
+            cache.close()
+
+    def test_eviction__chunks(self) -> None:
+        value = "x" * 100
+        size = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        with TemporaryDirectory() as directory:
+            cache = ResultCache(directory=directory, maximum_size=4 * size)
+            for index in range(4):
+                cache.set(f"key{index}", value)
+            # Three entries have to be removed to add the new one, retrieving one entry at once.
+            with mock.patch.object(cache_utils, "EVICTION_CHUNK_SIZE", 1):
+                cache.set("key4", value * 3)
+            self.assertEqual(
+                [None, None, None, value, value * 3], [cache.get(f"key{index}") for index in range(5)]
+            )
+            self.assertEqual(
+                cache.connection.execute("SELECT SUM(size) FROM entries").fetchone()[0], cache.get_statistics().size
+            )
+            cache.close()
+
+    def test_deferred_lookups(self) -> None:
+        with TemporaryDirectory() as directory:
+            cache = ResultCache(directory=directory)
+            other = ResultCache(directory=directory)
+            cache.set("key1", "value1")
+            cache.set("key2", "value2")
+            last_access = dict(cache.connection.execute("SELECT key, last_access FROM entries").fetchall())
+
+            # Lookups are not written immediately.
+            self.assertEqual("value1", cache.get("key1"))
+            self.assertIsNone(cache.get("key3"))
+            self.assertEqual(CacheStatistics(hits=0, misses=0, entries=2, size=other.get_statistics().size), other.get_statistics())
+            self.assertEqual(last_access, dict(other.connection.execute("SELECT key, last_access FROM entries").fetchall()))
+
+            cache.flush()
+            self.assertEqual((1, 1), (other.get_statistics().hits, other.get_statistics().misses))
+            self.assertLess(last_access["key1"], other.connection.execute("SELECT last_access FROM entries WHERE key = 'key1'").fetchone()[0])
+
+            # Old lookups are written by the next one.
+            self.assertEqual("value2", cache.get("key2"))
+            with mock.patch.object(time, "monotonic", return_value=time.monotonic() + cache_utils.FLUSH_INTERVAL):
+                self.assertIsNone(cache.get("key3"))
+            self.assertEqual((2, 2), (other.get_statistics().hits, other.get_statistics().misses))
+
+            # Pending lookups are written on close.
+            self.assertEqual("value2", cache.get("key2"))
+            cache.close()
+            self.assertEqual(3, other.get_statistics().hits)
+            other.close()
+
+    def test_size_counter(self) -> None:
+        value = "x" * 100
+        size = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        with TemporaryDirectory() as directory:
+            cache = ResultCache(directory=directory)
+            cache.set("key1", value)
+            cache.set("key2", value)
+            cache.set("key2", value * 2)
+            self.assertEqual(size + len(pickle.dumps(value * 2, protocol=pickle.HIGHEST_PROTOCOL)), cache.get_statistics().size)
+
+            # Databases without the counter determine it once.
+            with cache.connection:
+                cache.connection.execute("DELETE FROM counters WHERE name = 'size'")
+            cache.close()
+            cache = ResultCache(directory=directory, maximum_size=2 * size)
+            self.assertEqual(
+                cache.connection.execute("SELECT SUM(size) FROM entries").fetchone()[0], cache.get_statistics().size
+            )
+
+            # Both older entries have to be removed to add the new one.
+            cache.set("key3", value)
+            self.assertEqual(CacheStatistics(hits=0, misses=0, entries=1, size=size), cache.get_statistics())
+            self.assertEqual(value, cache.get("key3"))
+            cache.close()
+
+    def test_timings(self) -> None:
+        with TemporaryDirectory() as directory:
+            cache = ResultCache(directory=directory)
+            self.assertEqual({}, cache.get_timings())
+            cache.add_timing(suffix=".py", size=100, duration=1)
+            cache.add_timing(suffix=".py", size=300, duration=1)
+            cache.add_timing(suffix=".c", size=10, duration=0.5)
+            cache.add_timing(suffix=".h", size=0, duration=0.5)
+            self.assertEqual({".py": 0.005, ".c": 0.05}, cache.get_timings())
+
+            cache.clear()
+            self.assertEqual({}, cache.get_timings())
+            cache.close()
+
+    def test_multiple_processes(self) -> None:
+        with TemporaryDirectory() as directory:
+            cache = ResultCache(directory=directory)
+            self.assertIsNone(cache.get("key0"))
+            keys = [f"key{index}" for index in range(20)]
+            with ProcessPoolExecutor(max_workers=4) as executor:
+                results = list(executor.map(_store_and_load, [cache] * len(keys), keys))
+            self.assertEqual([f"value of {key}" for key in keys], results)
+            self.assertEqual("value of key0", cache.get("key0"))
+            self.assertEqual(CacheStatistics(hits=21, misses=1, entries=20, size=cache.get_statistics().size), cache.get_statistics())
+            cache.close()
+
+    def test_initialize_once(self) -> None:
+        with TemporaryDirectory() as directory:
+            cache = ResultCache(directory=directory)
+            with mock.patch.object(ResultCache, "_initialize", wraps=cache._initialize) as initialize_mock:
+                # Passing the cache to a worker creates the tables in the current process.
+                copy = pickle.loads(pickle.dumps(cache))
+                initialize_mock.assert_called_once()
+                copy.set("key", "value")
+                self.assertEqual("value", copy.get("key"))
+                copy.close()
+                initialize_mock.assert_called_once()
+            cache.close()
+
+
+class ManifestTestCase(TestCase):
+    def test_get_and_set(self) -> None:
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / "file.txt"
+            path.write_text("Hello World!")
+            # Avoid the verification of recently modified files.
+            os.utime(path, ns=(0, 0))
+
+            manifest = Manifest(path=Path(directory) / "manifest" / "manifest.sqlite3")
+            manifest.start()
+            self.assertIsNone(manifest.get(path=path, short_path="file.txt", flags=1))
+            manifest.set(path=path, short_path="file.txt", flags=1, value={"result": 42})
+            self.assertEqual({"result": 42}, manifest.get(path=path, short_path="file.txt", flags=1))
+            self.assertIsNone(manifest.get(path=path, short_path="file.txt", flags=2))
+            self.assertIsNone(manifest.get(path=path, short_path="other.txt", flags=1))
+
+            # Unchanged metadata does not require reading the file.
+            with mock.patch.object(cache_utils, "get_file_hash") as hash_mock:
+                self.assertEqual({"result": 42}, manifest.get(path=path, short_path="file.txt", flags=1))
+            hash_mock.assert_not_called()
+
+            # Changed metadata with the same content.
+            os.utime(path, ns=(10 ** 9, 10 ** 9))
+            self.assertEqual({"result": 42}, manifest.get(path=path, short_path="file.txt", flags=1))
+
+            # Changed content.
+            path.write_text("Hello World?")
+            os.utime(path, ns=(0, 0))
+            self.assertIsNone(manifest.get(path=path, short_path="file.txt", flags=1))
+            path.write_text("Hello World!!")
+            self.assertIsNone(manifest.get(path=path, short_path="file.txt", flags=1))
+            manifest.close()
+
+    def test_recently_modified(self) -> None:
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / "file.txt"
+            path.write_text("Hello World!")
+            manifest = Manifest(path=Path(directory) / "manifest.sqlite3")
+            manifest.set(path=path, short_path="file.txt", flags=0, value="value")
+
+            # Same size and modification time, but different content.
+            stat = path.stat()
+            path.write_text("Hello World?")
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+            self.assertIsNone(manifest.get(path=path, short_path="file.txt", flags=0))
+            manifest.close()
+
+    def test_remove_stale(self) -> None:
+        with TemporaryDirectory() as directory:
+            paths = []
+            for name in ["first.txt", "second.txt"]:
+                path = Path(directory) / name
+                path.write_text(name)
+                paths.append(path)
+
+            manifest = Manifest(path=Path(directory) / "manifest.sqlite3")
+            manifest.start()
+            for path in paths:
+                manifest.set(path=path, short_path=path.name, flags=0, value=path.name)
+            self.assertEqual(0, manifest.remove_stale())
+            manifest.close()
+
+            manifest = Manifest(path=Path(directory) / "manifest.sqlite3")
+            manifest.start()
+            self.assertEqual("first.txt", manifest.get(path=paths[0], short_path="first.txt", flags=0))
+            self.assertEqual(1, manifest.remove_stale())
+            self.assertIsNone(manifest.get(path=paths[1], short_path="second.txt", flags=0))
+            self.assertEqual("first.txt", manifest.get(path=paths[0], short_path="first.txt", flags=0))
+            manifest.close()
+
+
+class JournalTestCase(TestCase):
+    def test_results(self) -> None:
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / "file.txt"
+            path.write_text("Hello World!")
+
+            journal = Journal(path=Path(directory) / "journal" / "journal.sqlite3")
+            self.assertIsNone(journal.get(path=path, short_path="file.txt", flags=1))
+            journal.add(path=path, short_path="file.txt", flags=1, value={"result": 42})
+            self.assertEqual({"result": 42}, journal.get(path=path, short_path="file.txt", flags=1))
+            self.assertIsNone(journal.get(path=path, short_path="file.txt", flags=2))
+            self.assertIsNone(journal.get(path=path, short_path="other.txt", flags=1))
+            journal.close()
+
+            # The entries survive reopening the journal.
+            journal = Journal(path=Path(directory) / "journal" / "journal.sqlite3")
+            self.assertEqual({"result": 42}, journal.get(path=path, short_path="file.txt", flags=1))
+
+            # Changed content.
+            path.write_text("Hello World?")
+            self.assertIsNone(journal.get(path=path, short_path="file.txt", flags=1))
+
+            path.write_text("Hello World!")
+            journal.clear()
+            self.assertIsNone(journal.get(path=path, short_path="file.txt", flags=1))
+            journal.close()
+
+    def test_extractions(self) -> None:
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / "archive.zip"
+            path.write_bytes(b"archive")
+            target = Path(directory) / "archive_zip"
+            target.mkdir()
+
+            journal = Journal(path=Path(directory) / "journal.sqlite3")
+            self.assertIsNone(journal.get_extraction(path=path, short_path="archive.zip"))
+            journal.add_extraction(path=path, short_path="archive.zip", directory=target)
+            self.assertEqual(target, journal.get_extraction(path=path, short_path="archive.zip"))
+            self.assertIsNone(journal.get_extraction(path=path, short_path="other.zip"))
+
+            # The directory has been removed in the meantime.
+            target.rmdir()
+            self.assertIsNone(journal.get_extraction(path=path, short_path="archive.zip"))
+
+            target.mkdir()
+            journal.clear()
+            self.assertIsNone(journal.get_extraction(path=path, short_path="archive.zip"))
+            journal.close()
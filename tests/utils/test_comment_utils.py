@@ -0,0 +1,143 @@
+# Copyright (c) stefan6419846. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Iterator
+from unittest import TestCase
+
+from license_tools.utils import comment_utils
+from license_tools.utils.comment_utils import Language
+
+
+def _extract(text: str, language: Language) -> list[tuple[int, str]]:
+    return list(comment_utils.extract_comments(enumerate(text.splitlines(keepends=True), start=1), language))
+
+
+class GetLanguageTestCase(TestCase):
+    def test_get_language(self) -> None:
+        self.assertEqual(comment_utils.PYTHON, comment_utils.get_language(Path("setup.py")))
+        self.assertEqual(comment_utils.C, comment_utils.get_language("include/Header.HPP"))
+        self.assertEqual(comment_utils.RUST, comment_utils.get_language("src/lib.rs"))
+        self.assertEqual(comment_utils.JAVASCRIPT, comment_utils.get_language("index.tsx"))
+        self.assertEqual(comment_utils.JAVA, comment_utils.get_language("Main.java"))
+        self.assertEqual(comment_utils.SHELL, comment_utils.get_language("configure.sh"))
+        self.assertIsNone(comment_utils.get_language("README.md"))
+        self.assertIsNone(comment_utils.get_language("Makefile"))
+
+
+class ExtractCommentsTestCase(TestCase):
+    def test_python(self) -> None:
+        text = (
+            '#!/usr/bin/env python\n'
+            '"""\n'
+            'Licensed under the MIT license.\n'
+            '"""\n'
+            '\n'
+            'x = "# not a comment"  # trailing\n'
+            "y = '\\'' + '\"\"\"'\n"
+            'def f():\n'
+            "    '''Docstring.'''\n"
+        )
+        self.assertEqual(
+            [
+                (1, "#!/usr/bin/env python\n"),
+                (2, '"""\n'),
+                (3, "Licensed under the MIT license.\n"),
+                (4, '"""\n'),
+                (6, "# trailing\n"),
+                (9, "'''Docstring.'''\n"),
+            ],
+            _extract(text, comment_utils.PYTHON),
+        )
+
+    def test_c(self) -> None:
+        text = (
+            "/*\n"
+            " * Copyright (c) Someone\n"
+            " */\n"
+            'const char *s = "/* no */ // no"; char c = \'"\';\n'
+            "int x = 1; /* inline */ int y = 2; // trailing\n"
+            'const char *t = "unterminated\n'
+            "// after\n"
+        )
+        self.assertEqual(
+            [
+                (1, "/*\n"),
+                (2, " * Copyright (c) Someone\n"),
+                (3, " */\n"),
+                (5, "/* inline */ // trailing\n"),
+                (7, "// after\n"),
+            ],
+            _extract(text, comment_utils.C),
+        )
+
+    def test_rust(self) -> None:
+        text = (
+            "/* outer /* nested */ still outer\n"
+            "*/\n"
+            "fn f<'a>(x: &'a str) -> char { '\"' } // quote\n"
+            'let s = "multi\n'
+            "// inside the string\n"
+            '";\n'
+            "//! Crate documentation.\n"
+        )
+        self.assertEqual(
+            [
+                (1, "/* outer /* nested */ still outer\n"),
+                (2, "*/\n"),
+                (3, "// quote\n"),
+                (7, "//! Crate documentation.\n"),
+            ],
+            _extract(text, comment_utils.RUST),
+        )
+
+    def test_javascript(self) -> None:
+        text = (
+            "/** @license MIT */\n"
+            "const url = 'https://example.org';\n"
+            "const template = `\n"
+            "// inside the template\n"
+            "`;  // trailing\n"
+        )
+        self.assertEqual(
+            [(1, "/** @license MIT */\n"), (5, "// trailing\n")],
+            _extract(text, comment_utils.JAVASCRIPT),
+        )
+
+    def test_java(self) -> None:
+        text = (
+            "// SPDX-License-Identifier: Apache-2.0\n"
+            'String block = """\n'
+            "    /* inside the text block */\n"
+            '    """;\n'
+            "/** Javadoc. */\n"
+        )
+        self.assertEqual(
+            [(1, "// SPDX-License-Identifier: Apache-2.0\n"), (5, "/** Javadoc. */\n")],
+            _extract(text, comment_utils.JAVA),
+        )
+
+    def test_shell(self) -> None:
+        text = (
+            "#!/bin/sh\n"
+            "# Copyright (c) Someone\n"
+            'echo "# no" $# ${#values} # yes\n'
+            "x='C:\\'\n"
+            "y=\"a\n"
+            "# inside the string\n"
+            '"\n'
+        )
+        self.assertEqual(
+            [(1, "#!/bin/sh\n"), (2, "# Copyright (c) Someone\n"), (3, "# yes\n")],
+            _extract(text, comment_utils.SHELL),
+        )
+
+    def test_lazy(self) -> None:
+        def lines() -> Iterator[tuple[int, str]]:
+            yield 1, "# first\n"
+            raise AssertionError("Consumed too many lines.")
+
+        self.assertEqual((1, "# first\n"), next(comment_utils.extract_comments(lines(), comment_utils.PYTHON)))
@@ -0,0 +1,74 @@
+# Copyright (c) stefan6419846. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+
+from __future__ import annotations
+
+import zipfile
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import mock, TestCase
+
+from typecode import contenttype, magic2  # type: ignore[import-untyped]
+
+from license_tools.tools import image_tools, linking_tools
+from license_tools.utils import file_type_utils
+from license_tools.utils.file_type_utils import FileType
+from tests import get_file
+from tests.data import SETUP_PATH
+
+
+class GetFileTypeTestCase(TestCase):
+    def setUp(self) -> None:
+        file_type_utils.clear_cache()
+
+    def test_get_file_type(self) -> None:
+        self.assertEqual(
+            FileType(description="Python script, ASCII text executable", mime_type="text/x-script.python", is_archive=False, is_source=True),
+            file_type_utils.get_file_type(SETUP_PATH),
+        )
+        with get_file("croissant.jpg") as path:
+            file_type = file_type_utils.get_file_type(path)
+        self.assertEqual("image/jpeg", file_type.mime_type)
+        self.assertFalse(file_type.is_archive)
+        self.assertFalse(file_type.is_source)
+
+        with TemporaryDirectory() as tempdir:
+            path = Path(tempdir) / "archive.zip"
+            with zipfile.ZipFile(path, mode="w") as archive:
+                archive.writestr("LICENSE", "MIT")
+            file_type = file_type_utils.get_file_type(path)
+        self.assertTrue(file_type.description.startswith("Zip archive data"), file_type.description)
+        self.assertTrue(file_type.is_archive)
+
+    def test_single_sniff(self) -> None:
+        with TemporaryDirectory() as tempdir:
+            path = Path(tempdir) / "file.py"
+            path.write_bytes(SETUP_PATH.read_bytes())
+            with mock.patch.object(magic2, "file_type", wraps=magic2.file_type) as file_type_mock, \
+                    mock.patch.object(magic2, "mime_type", wraps=magic2.mime_type) as mime_type_mock:
+                self.assertFalse(file_type_utils.get_file_type(path).is_archive)
+                self.assertFalse(linking_tools.is_elf(path))
+                self.assertIsNone(linking_tools.get_elf_type(path))
+                self.assertFalse(image_tools.is_image(path))
+                self.assertEqual(1, file_type_mock.call_count)
+                self.assertEqual(1, mime_type_mock.call_count)
+
+            # Missing files.
+            self.assertEqual(FileType(description="", mime_type="", is_archive=False), file_type_utils.get_file_type(Path(tempdir) / "missing"))
+
+    def test_no_global_changes(self) -> None:
+        # Importing the module does not replace any ScanCode internals.
+        self.assertIsNone(getattr(magic2._detect, "__wrapped__", None))
+
+        with mock.patch.object(contenttype, "get_type", wraps=contenttype.get_type) as get_type_mock:
+            file_type_utils.get_file_type(SETUP_PATH)
+            # The archive detection of ExtractCode uses the public function as well.
+            call_count = get_type_mock.call_count
+            self.assertGreater(call_count, 0)
+            file_type_utils.get_file_type(SETUP_PATH)
+            self.assertEqual(call_count, get_type_mock.call_count)
+
+            file_type_utils.clear_cache()
+            file_type_utils.get_file_type(SETUP_PATH)
+            self.assertEqual(2 * call_count, get_type_mock.call_count)
@@ -0,0 +1,99 @@
+# Copyright (c) stefan6419846. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+
+from __future__ import annotations
+
+import gzip
+import importlib.util
+import json
+import sys
+import zlib
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import mock, skipUnless, TestCase
+
+from license_tools.tools.scancode_tools import FileResults, LicenseDetection, Licenses
+from license_tools.utils import jsonl_utils
+from license_tools.utils.jsonl_utils import JsonLinesWriter
+
+
+def _get_results(short_path: str) -> FileResults:
+    results = FileResults(path=Path("/tmp") / short_path, short_path=short_path)
+    results.licenses = Licenses(
+        detected_license_expression="mit",
+        detected_license_expression_spdx="MIT",
+        license_detections=[LicenseDetection(license_expression="mit", license_expression_spdx="MIT", identifier="mit-1")],
+    )
+    return results
+
+
+class ToJsonTestCase(TestCase):
+    def test_dataclass(self) -> None:
+        data = json.loads(jsonl_utils.to_json(_get_results("file.txt")))
+        self.assertEqual("/tmp/file.txt", data["path"])
+        self.assertEqual("file.txt", data["short_path"])
+        self.assertIsNone(data["copyrights"])
+        self.assertEqual("MIT", data["licenses"]["detected_license_expression_spdx"])
+        self.assertEqual("mit-1", data["licenses"]["license_detections"][0]["identifier"])
+
+    def test_other(self) -> None:
+        self.assertEqual('{"path":"/tmp/ä","values":[1,2]}', jsonl_utils.to_json({"path": Path("/tmp/ä"), "values": [1, 2]}))
+
+
+class JsonLinesWriterTestCase(TestCase):
+    def test_uncompressed(self) -> None:
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / "results.jsonl"
+            with JsonLinesWriter(path=path) as writer:
+                writer.write(_get_results("first.txt"))
+                # Each line is available directly.
+                self.assertEqual("first.txt", json.loads(path.read_text())["short_path"])
+                results = [_get_results("second.txt"), _get_results("third.txt")]
+                self.assertEqual(results, list(writer.write_each(results)))
+            self.assertEqual(3, writer.count)
+            lines = path.read_text().splitlines()
+        self.assertEqual(["first.txt", "second.txt", "third.txt"], [json.loads(line)["short_path"] for line in lines])
+
+    def test_flush_interval(self) -> None:
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / "results.jsonl"
+            with JsonLinesWriter(path=path, flush_interval=2) as writer:
+                writer.write({"value": 1})
+                self.assertEqual("", path.read_text())
+                writer.write({"value": 2})
+                self.assertEqual('{"value":1}\n{"value":2}\n', path.read_text())
+            writer.close()
+
+    def test_gzip(self) -> None:
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / "results.jsonl.gz"
+            with JsonLinesWriter(path=path, compression="gzip") as writer:
+                writer.write({"value": 1})
+                # The flushed data can be decompressed before closing the file.
+                partial = zlib.decompressobj(wbits=31).decompress(path.read_bytes())
+                self.assertEqual(b'{"value":1}\n', partial)
+                writer.write({"value": 2})
+            self.assertEqual(b'{"value":1}\n{"value":2}\n', gzip.decompress(path.read_bytes()))
+
+    @skipUnless(importlib.util.find_spec("zstandard"), "Requires zstandard")
+    def test_zstd(self) -> None:
+        import zstandard  # type: ignore[import-not-found,unused-ignore]
+
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / "results.jsonl.zst"
+            with JsonLinesWriter(path=path, compression="zstd") as writer:
+                writer.write({"value": 1})
+                writer.write({"value": 2})
+            with open(path, mode="rb") as fd:
+                self.assertEqual(b'{"value":1}\n{"value":2}\n', zstandard.ZstdDecompressor().stream_reader(fd).read())
+
+    def test_zstd__missing(self) -> None:
+        with TemporaryDirectory() as directory, mock.patch.dict(sys.modules, {"zstandard": None}):
+            with self.assertRaises(ImportError):
+                JsonLinesWriter(path=Path(directory) / "results.jsonl.zst", compression="zstd")
+
+    def test_invalid_compression(self) -> None:
+        with TemporaryDirectory() as directory:
+            with self.assertRaisesRegex(expected_exception=ValueError, expected_regex=r"^Unsupported compression: bz2$"):
+                JsonLinesWriter(path=Path(directory) / "results.jsonl", compression="bz2")  # type: ignore[arg-type]
@@ -72,6 +72,16 @@ class DirectoryWithFixedNameContextTestCase(TestCase):
                 self.assertTrue(target.is_dir())
                 self.assertNotEqual(target_name, target)
 
+    def test_reuse_existing(self) -> None:
+        with TemporaryDirectory() as tempdir:
+            target_name = Path(tempdir) / "foo"
+            target_name.mkdir()
+            target_name.joinpath("file.txt").write_text("content")
+            with DirectoryWithFixedNameContext(target_name, fallback_to_random_if_exists=False, reuse_existing=True) as target:
+                self.assertEqual(target_name, target)
+                self.assertEqual("content", target.joinpath("file.txt").read_text())
+            self.assertFalse(target.is_dir())
+
     def test_deleted_in_between(self) -> None:
         with TemporaryDirectory() as tempdir:
             target_name = Path(tempdir) / "foo"
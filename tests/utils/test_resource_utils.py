@@ -0,0 +1,140 @@
+# Copyright (c) stefan6419846. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import mock, TestCase
+
+from license_tools.utils import resource_utils
+from license_tools.utils.resource_utils import MemoryController
+
+
+GIB = 1024 * 1024 * 1024
+
+
+def _write_files(root: Path, files: dict[str, str]) -> None:
+    for name, content in files.items():
+        root.joinpath(name).parent.mkdir(parents=True, exist_ok=True)
+        root.joinpath(name).write_text(content + "\n")
+
+
+class CgroupTestCase(TestCase):
+    def test_v2(self) -> None:
+        with TemporaryDirectory() as tempdir:
+            root = Path(tempdir)
+            _write_files(root, {"cpu.max": "250000 100000", "memory.max": str(4 * GIB), "memory.current": str(GIB)})
+            self.assertEqual(2.5, resource_utils.get_cpu_limit(root=root))
+            self.assertEqual(4 * GIB, resource_utils.get_memory_limit(root=root))
+            self.assertEqual(GIB, resource_utils.get_memory_usage(root=root))
+
+            _write_files(root, {"cpu.max": "max 100000", "memory.max": "max"})
+            self.assertIsNone(resource_utils.get_cpu_limit(root=root))
+            with mock.patch.object(os, "sysconf", side_effect=[4096, 1024]):
+                self.assertEqual(4096 * 1024, resource_utils.get_memory_limit(root=root))
+
+    def test_v1(self) -> None:
+        with TemporaryDirectory() as tempdir:
+            root = Path(tempdir)
+            _write_files(
+                root,
+                {
+                    "cpu/cpu.cfs_quota_us": "400000", "cpu/cpu.cfs_period_us": "100000",
+                    "memory/memory.limit_in_bytes": str(2 * GIB), "memory/memory.usage_in_bytes": "1234",
+                }
+            )
+            self.assertEqual(4.0, resource_utils.get_cpu_limit(root=root))
+            self.assertEqual(2 * GIB, resource_utils.get_memory_limit(root=root))
+            self.assertEqual(1234, resource_utils.get_memory_usage(root=root))
+
+            _write_files(root, {"cpu/cpu.cfs_quota_us": "-1", "memory/memory.limit_in_bytes": str(2 ** 63 - 4096)})
+            self.assertIsNone(resource_utils.get_cpu_limit(root=root))
+            with mock.patch.object(os, "sysconf", side_effect=[4096, 1024]):
+                self.assertEqual(4096 * 1024, resource_utils.get_memory_limit(root=root))
+
+    def test_unavailable(self) -> None:
+        with TemporaryDirectory() as tempdir:
+            root = Path(tempdir)
+            self.assertIsNone(resource_utils.get_cpu_limit(root=root))
+            self.assertIsNone(resource_utils.get_memory_usage(root=root))
+
+
+class GetCpuCountTestCase(TestCase):
+    def test_get_cpu_count(self) -> None:
+        with mock.patch.object(os, "sched_getaffinity", return_value=set(range(16)), create=True):
+            with mock.patch.object(resource_utils, "get_cpu_limit", return_value=None):
+                self.assertEqual(16, resource_utils.get_cpu_count())
+            with mock.patch.object(resource_utils, "get_cpu_limit", return_value=2.5):
+                self.assertEqual(3, resource_utils.get_cpu_count())
+            with mock.patch.object(resource_utils, "get_cpu_limit", return_value=0.1):
+                self.assertEqual(1, resource_utils.get_cpu_count())
+
+
+class GetAutoJobCountTestCase(TestCase):
+    def test_get_auto_job_count(self) -> None:
+        for cpu_count, memory_limit, expected in [
+            (16, 64 * GIB, 16),
+            (16, 8 * GIB, 5),
+            (4, 2 * GIB, 1),
+            (2, None, 2),
+        ]:
+            with self.subTest(cpu_count=cpu_count, memory_limit=memory_limit):
+                with mock.patch.object(resource_utils, "get_cpu_count", return_value=cpu_count), \
+                        mock.patch.object(resource_utils, "get_memory_limit", return_value=memory_limit):
+                    self.assertEqual(expected, resource_utils.get_auto_job_count())
+
+        with mock.patch.object(resource_utils, "get_cpu_count", return_value=16), \
+                mock.patch.object(resource_utils, "get_memory_limit", return_value=8 * GIB):
+            self.assertEqual(7, resource_utils.get_auto_job_count(worker_memory=GIB))
+            # Fall back to the default if the memory usage could not be measured.
+            self.assertEqual(5, resource_utils.get_auto_job_count(worker_memory=None))
+
+
+class GetPeakMemoryTestCase(TestCase):
+    def test_get_peak_memory(self) -> None:
+        value = resource_utils.get_peak_memory()
+        assert value is not None
+        self.assertGreater(value, 1024 * 1024)
+
+
+class MemoryControllerTestCase(TestCase):
+    def test_update(self) -> None:
+        controller = MemoryController(maximum=4, memory_limit=10 * GIB, interval=0)
+        with mock.patch.object(resource_utils, "get_memory_usage", return_value=9 * GIB):
+            self.assertEqual(3, controller.update())
+            self.assertEqual(2, controller.update())
+            self.assertEqual(1, controller.update())
+            self.assertEqual(1, controller.update())
+        with mock.patch.object(resource_utils, "get_memory_usage", return_value=8 * GIB):
+            # Between the thresholds.
+            self.assertEqual(1, controller.update())
+        controller.add_worker_memory(2 * GIB)
+        controller.add_worker_memory(None)
+        controller.add_worker_memory(GIB)
+        self.assertEqual(2 * GIB, controller.worker_memory)
+        with mock.patch.object(resource_utils, "get_memory_usage", return_value=int(6.6 * GIB)):
+            # Another worker would exceed the upper threshold.
+            self.assertEqual(1, controller.update())
+        with mock.patch.object(resource_utils, "get_memory_usage", return_value=5 * GIB):
+            self.assertEqual(2, controller.update())
+            self.assertEqual(3, controller.update())
+            self.assertEqual(4, controller.update())
+            self.assertEqual(4, controller.update())
+        with mock.patch.object(resource_utils, "get_memory_usage", return_value=None):
+            self.assertEqual(4, controller.update())
+
+    def test_interval(self) -> None:
+        controller = MemoryController(maximum=4, memory_limit=10 * GIB, interval=3600)
+        with mock.patch.object(resource_utils, "get_memory_usage", return_value=9 * GIB):
+            self.assertEqual(3, controller.update())
+            self.assertEqual(3, controller.update())
+
+        # The first call is evaluated even if the monotonic clock is below the interval, like shortly after booting.
+        controller = MemoryController(maximum=4, memory_limit=10 * GIB, interval=3600)
+        with mock.patch.object(resource_utils, "get_memory_usage", return_value=9 * GIB), \
+                mock.patch("time.monotonic", return_value=5.0):
+            self.assertEqual(3, controller.update())
+            self.assertEqual(3, controller.update())
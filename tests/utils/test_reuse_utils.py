@@ -0,0 +1,208 @@
+# Copyright (c) stefan6419846. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+
+from __future__ import annotations
+
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import cast
+from unittest import TestCase
+
+from license_tools.utils import reuse_utils
+from license_tools.utils.reuse_utils import BulkLicenses, LicenseDeclaration, LicenseMetadata
+
+
+REUSE_TOML = """
+version = 1
+
+[[annotations]]
+path = ["docs/**", "*.md"]
+SPDX-FileCopyrightText = "2024 Jane Doe"
+SPDX-License-Identifier = "CC-BY-4.0"
+
+[[annotations]]
+path = "docs/images/*.png"
+precedence = "override"
+SPDX-FileCopyrightText = ["2023 John Doe", "2024 Jane Doe"]
+SPDX-License-Identifier = ["CC0-1.0", "MIT OR Apache-2.0"]
+
+[[annotations]]
+path = "literal\\\\*.txt"
+SPDX-License-Identifier = "MIT"
+"""
+
+DEP5 = """Format: https://www.debian.org/doc/packaging-manuals/copyright-format/1.0/
+Upstream-Name: example
+# Comment.
+
+Files: *
+Copyright: 2020 Jane Doe
+ 2021 John Doe
+License: GPL-2+ or Apache-2.0
+
+Files: src/vendor/*
+ third_party/??.c
+Copyright: 2019 Vendor
+License: BSD-3-clause
+ Redistribution and use in source and binary forms ...
+ .
+ THIS SOFTWARE IS PROVIDED ...
+
+License: GPL-2+
+ This program is free software ...
+"""
+
+
+class CompilePatternTestCase(TestCase):
+    def test_compile_pattern(self) -> None:
+        pattern = reuse_utils._compile_pattern("src/*.py", star_matches_slash=False)
+        self.assertTrue(pattern.fullmatch("src/main.py"))
+        self.assertFalse(pattern.fullmatch("src/nested/main.py"))
+        self.assertFalse(pattern.fullmatch("other/src/main.py"))
+
+        pattern = reuse_utils._compile_pattern("src/**", star_matches_slash=False)
+        self.assertTrue(pattern.fullmatch("src/nested/main.py"))
+
+        pattern = reuse_utils._compile_pattern("src/*.py", star_matches_slash=True)
+        self.assertTrue(pattern.fullmatch("src/nested/main.py"))
+
+        pattern = reuse_utils._compile_pattern("file?.c", star_matches_slash=True)
+        self.assertTrue(pattern.fullmatch("file1.c"))
+        self.assertFalse(pattern.fullmatch("file12.c"))
+        self.assertFalse(reuse_utils._compile_pattern("file?.c", star_matches_slash=False).fullmatch("file1.c"))
+
+        pattern = reuse_utils._compile_pattern("a\\*.txt", star_matches_slash=False)
+        self.assertTrue(pattern.fullmatch("a*.txt"))
+        self.assertFalse(pattern.fullmatch("ab.txt"))
+
+
+class BulkLicensesTestCase(TestCase):
+    def test_from_reuse_toml(self) -> None:
+        base = Path("/tmp/project")
+        licenses = BulkLicenses.from_reuse_toml(REUSE_TOML, base_directory=base, source="REUSE.toml")
+
+        self.assertEqual(
+            LicenseDeclaration(license_expression="CC-BY-4.0", copyrights=("2024 Jane Doe",), source="REUSE.toml"),
+            licenses.get(base / "docs/nested/index.rst"),
+        )
+        self.assertEqual("CC-BY-4.0", licenses.get(base / "README.md").license_expression)  # type: ignore[union-attr]
+        self.assertIsNone(licenses.get(base / "src/README.md"))
+        self.assertIsNone(licenses.get(Path("/tmp/other/README.md")))
+        self.assertEqual("MIT", licenses.get(base / "literal*.txt").license_expression)  # type: ignore[union-attr]
+
+        # The last matching annotation applies.
+        self.assertEqual(
+            LicenseDeclaration(
+                license_expression="CC0-1.0 AND (MIT OR Apache-2.0)",
+                copyrights=("2023 John Doe", "2024 Jane Doe"),
+                precedence="override",
+                source="REUSE.toml",
+            ),
+            licenses.get(base / "docs/images/logo.png"),
+        )
+
+    def test_from_reuse_toml__invalid(self) -> None:
+        with self.assertRaisesRegex(ValueError, r"^Unsupported REUSE\.toml version: 2$"):
+            BulkLicenses.from_reuse_toml("version = 2\n", base_directory=Path("/tmp"))
+        with self.assertRaisesRegex(ValueError, r"^Unsupported REUSE\.toml precedence: first$"):
+            BulkLicenses.from_reuse_toml(
+                'version = 1\n[[annotations]]\npath = "*"\nprecedence = "first"\n', base_directory=Path("/tmp")
+            )
+
+    def test_from_dep5(self) -> None:
+        base = Path("/tmp/project")
+        licenses = BulkLicenses.from_dep5(DEP5, base_directory=base)
+
+        self.assertEqual(2, len(licenses.rules))
+        self.assertEqual(
+            LicenseDeclaration(
+                license_expression="GPL-2+ OR Apache-2.0",
+                copyrights=("2020 Jane Doe", "2021 John Doe"),
+                precedence="aggregate",
+                source="debian/copyright",
+            ),
+            licenses.get(base / "src/main.c"),
+        )
+        self.assertEqual("BSD-3-clause", licenses.get(base / "src/vendor/nested/lib.c").license_expression)  # type: ignore[union-attr]
+        self.assertEqual("BSD-3-clause", licenses.get(base / "third_party/ab.c").license_expression)  # type: ignore[union-attr]
+        self.assertEqual("GPL-2+ OR Apache-2.0", licenses.get(base / "third_party/abc.c").license_expression)  # type: ignore[union-attr]
+
+    def test_from_dep5__not_machine_readable(self) -> None:
+        with self.assertRaisesRegex(ValueError, r"^Not a machine-readable Debian copyright file\.$"):
+            BulkLicenses.from_dep5("This package was debianized by ...\n", base_directory=Path("/tmp"))
+
+
+class LicenseMetadataTestCase(TestCase):
+    def test_is_metadata_file(self) -> None:
+        directory = Path("/tmp/project")
+        self.assertTrue(reuse_utils.is_metadata_file(directory / "REUSE.toml", directory))
+        self.assertTrue(reuse_utils.is_metadata_file(directory / "sub/REUSE.toml", directory))
+        self.assertTrue(reuse_utils.is_metadata_file(directory / ".reuse/dep5", directory))
+        self.assertTrue(reuse_utils.is_metadata_file(directory / "debian/copyright", directory))
+        self.assertFalse(reuse_utils.is_metadata_file(directory / "copyright", directory))
+        self.assertFalse(reuse_utils.is_metadata_file(directory / "dep5", directory))
+
+    def test_from_files(self) -> None:
+        with TemporaryDirectory() as tempdir:
+            directory = Path(tempdir)
+            directory.joinpath(".reuse").mkdir()
+            directory.joinpath(".reuse", "dep5").write_text(DEP5)
+            directory.joinpath("docs").mkdir()
+            directory.joinpath("docs", "REUSE.toml").write_text(
+                'version = 1\n[[annotations]]\npath = "*.rst"\nSPDX-License-Identifier = "CC-BY-4.0"\n'
+            )
+            directory.joinpath("debian").mkdir()
+            directory.joinpath("debian", "copyright").write_text("This package was debianized by ...\n")
+            files = [
+                (directory / short_path, short_path)
+                for short_path in [".reuse/dep5", "debian/copyright", "docs/REUSE.toml", "docs/index.rst", "main.c"]
+            ]
+
+            with self.assertLogs(reuse_utils.logger, level="WARNING") as logs:
+                metadata = LicenseMetadata.from_files(files=files, directory=directory)
+            self.assertEqual(
+                [
+                    "WARNING:license_tools.utils.reuse_utils:Ignoring license metadata of debian/copyright: "
+                    "Not a machine-readable Debian copyright file."
+                ],
+                logs.output,
+            )
+
+        self.assertTrue(metadata)
+        # The closest metadata takes precedence if it covers the file.
+        declaration = metadata.get(directory / "docs/index.rst")
+        self.assertEqual(("CC-BY-4.0", "docs/REUSE.toml"), (declaration.license_expression, declaration.source))  # type: ignore[union-attr]
+        declaration = metadata.get(directory / "docs/conf.py")
+        self.assertEqual(("GPL-2+ OR Apache-2.0", ".reuse/dep5"), (declaration.license_expression, declaration.source))  # type: ignore[union-attr]
+
+        self.assertFalse(LicenseMetadata.from_files(files=files[3:], directory=directory))
+
+    def test_from_files__outer_override(self) -> None:
+        with TemporaryDirectory() as tempdir:
+            directory = Path(tempdir)
+            directory.joinpath("REUSE.toml").write_text(
+                'version = 1\n'
+                '[[annotations]]\npath = "vendor/**"\nprecedence = "override"\nSPDX-License-Identifier = "MIT"\n'
+                '[[annotations]]\npath = "**"\nSPDX-License-Identifier = "Apache-2.0"\n'
+            )
+            directory.joinpath("vendor").mkdir()
+            directory.joinpath("vendor", "REUSE.toml").write_text(
+                'version = 1\n'
+                '[[annotations]]\npath = "**"\nprecedence = "override"\nSPDX-License-Identifier = "GPL-2.0-only"\n'
+            )
+            directory.joinpath("docs").mkdir()
+            directory.joinpath("docs", "REUSE.toml").write_text(
+                'version = 1\n[[annotations]]\npath = "*.rst"\nSPDX-License-Identifier = "CC-BY-4.0"\n'
+            )
+            files = [(directory / short_path, short_path) for short_path in ["REUSE.toml", "docs/REUSE.toml", "vendor/REUSE.toml"]]
+            metadata = LicenseMetadata.from_files(files=files, directory=directory)
+
+        # The outer override wins over the nested file, even if that one overrides as well.
+        declaration = cast(LicenseDeclaration, metadata.get(directory / "vendor/lib.c"))
+        self.assertEqual(("MIT", "REUSE.toml", "override"), (declaration.license_expression, declaration.source, declaration.precedence))
+        # Without an outer override, the closest metadata wins.
+        declaration = cast(LicenseDeclaration, metadata.get(directory / "docs/index.rst"))
+        self.assertEqual(("CC-BY-4.0", "docs/REUSE.toml"), (declaration.license_expression, declaration.source))
+        declaration = cast(LicenseDeclaration, metadata.get(directory / "docs/conf.py"))
+        self.assertEqual(("Apache-2.0", "REUSE.toml"), (declaration.license_expression, declaration.source))